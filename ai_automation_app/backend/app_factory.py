@@ -0,0 +1,139 @@
+"""
+FastAPI app factory with lazily mounted service routers
+
+Importing a service router also runs its start-up work (mock data, sample
+records, welcome messages, SDK imports). Under Mangum all of that lands on
+the Lambda cold start even when the invocation only needs one service. The
+factory below mounts nothing up front: a service's router is imported and
+included the first time a request arrives under its URL prefix.
+
+Deployments pick their services with environment variables:
+    THERASTACK_ROUTERS       comma-separated service names, or "all" (default)
+    THERASTACK_LAZY_ROUTERS  "false" to import every router at start-up
+"""
+
+import importlib
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import FastAPI
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ServiceRouter:
+    """Where a service's router lives and which URL prefix it serves"""
+    module: str
+    prefix: str
+    attribute: str = "router"
+
+
+# Every service the API can mount, keyed by the name used in THERASTACK_ROUTERS
+SERVICE_ROUTERS: Dict[str, ServiceRouter] = {
+    "calendar": ServiceRouter("services.calendar_dynamodb.calendar_api", "/calendar"),
+    "messages": ServiceRouter("services.messages_dynamodb.message_api", "/messages"),
+    "call_manager": ServiceRouter("services.call_manager.call_manager_api", "/api/call-manager"),
+    "financial": ServiceRouter("services.financial.financial_api", "/api/financial"),
+    "ai_assistant": ServiceRouter("services.ai_assistant.ai_assistant_api", "/api/ai-assistant"),
+}
+
+# Paths that describe the whole API and therefore need every router mounted
+SCHEMA_PATHS = ("/openapi.json", "/docs", "/redoc")
+
+
+def routers_from_env() -> List[str]:
+    """Service names selected by THERASTACK_ROUTERS"""
+    selected = os.environ.get("THERASTACK_ROUTERS", "all").strip()
+    if selected in ("", "all"):
+        return list(SERVICE_ROUTERS)
+    return [name.strip() for name in selected.split(",") if name.strip()]
+
+
+class LazyRouterLoader:
+    """Imports and includes service routers on demand"""
+
+    def __init__(self, app: FastAPI, services: Iterable[str]):
+        unknown = [name for name in services if name not in SERVICE_ROUTERS]
+        if unknown:
+            raise ValueError(f"Unknown service routers: {', '.join(unknown)}")
+
+        self.app = app
+        self._pending = {name: SERVICE_ROUTERS[name] for name in services}
+        self.loaded: List[str] = []
+        self._lock = threading.Lock()
+
+    def load(self, name: str) -> None:
+        """Import a service and mount its router, once"""
+        with self._lock:
+            spec = self._pending.get(name)
+            if spec is None:
+                return
+            module = importlib.import_module(spec.module)
+            self.app.include_router(getattr(module, spec.attribute))
+            # Regenerate the OpenAPI schema with the new routes
+            self.app.openapi_schema = None
+            del self._pending[name]
+            self.loaded.append(name)
+            logger.info(f"Mounted {name} router")
+
+    def load_all(self) -> None:
+        for name in list(self._pending):
+            self.load(name)
+
+    def load_for_path(self, path: str) -> None:
+        """Mount whichever pending service owns this request path"""
+        if not self._pending:
+            return
+        if path in SCHEMA_PATHS:
+            self.load_all()
+            return
+        for name, spec in list(self._pending.items()):
+            if path == spec.prefix or path.startswith(spec.prefix + "/"):
+                self.load(name)
+
+
+class LazyRouterMiddleware:
+    """ASGI middleware that mounts a service's router before routing its first request"""
+
+    def __init__(self, app, loader: LazyRouterLoader):
+        self.app = app
+        self.loader = loader
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket"):
+            self.loader.load_for_path(scope["path"])
+        await self.app(scope, receive, send)
+
+
+def create_app(routers: Optional[Iterable[str]] = None, lazy: Optional[bool] = None, **kwargs) -> FastAPI:
+    """
+    Build the FastAPI app with a chosen set of service routers
+
+    Args:
+        routers: Service names from SERVICE_ROUTERS; defaults to THERASTACK_ROUTERS
+        lazy: Defer each router's import until its first request; defaults to
+            THERASTACK_LAZY_ROUTERS
+        **kwargs: Passed through to FastAPI()
+
+    Returns:
+        The app, with its LazyRouterLoader available as ``app.state.router_loader``
+    """
+    if routers is None:
+        routers = routers_from_env()
+    if lazy is None:
+        lazy = os.environ.get("THERASTACK_LAZY_ROUTERS", "true").lower() not in ("0", "false", "no")
+
+    app = FastAPI(**kwargs)
+    loader = LazyRouterLoader(app, list(routers))
+    app.state.router_loader = loader
+
+    if lazy:
+        app.add_middleware(LazyRouterMiddleware, loader=loader)
+    else:
+        loader.load_all()
+
+    return app
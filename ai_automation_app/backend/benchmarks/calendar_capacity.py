@@ -0,0 +1,290 @@
+"""
+Calendar workload benchmark: latency percentiles and DynamoDB capacity per request
+
+Seeds a local DynamoDB with a practice's worth of appointments, then replays
+a calendar workload mix through the calendar router (lookups, therapist and
+patient week views, grid views, bookings, status changes, batch lookups and
+availability searches) and reports, per route:
+
+    requests, p50/p95/p99 latency, read and write capacity units per request
+
+Capacity comes from the service's own ReturnConsumedCapacity metrics (see
+services/calendar_dynamodb/capacity.py), so the numbers are what the routes
+would be billed for, as far as the local DynamoDB reports them. DynamoDB
+Local estimates units from item sizes; moto reports fixed nominal units per
+call, which still shows how many calls each route makes.
+
+Runs against DynamoDB Local when --endpoint-url is given, otherwise against
+an in-process moto server (pip install "moto[server]"). Tables get a unique
+suffix and are deleted afterwards unless --keep-tables is given.
+
+Usage (from the backend directory):
+    python -m benchmarks.calendar_capacity [--endpoint-url http://localhost:8000]
+        [--requests 2000] [--concurrency 20] [--no-cache]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from fastapi import FastAPI
+
+# Share of requests per workload operation
+WORKLOAD = {
+    "get": 30,
+    "therapist_week": 20,
+    "patient_week": 10,
+    "create": 12,
+    "status": 10,
+    "therapist_grid": 8,
+    "batch_get": 5,
+    "availability": 5,
+}
+# Route template each operation is served by, as recorded in the capacity metrics
+ROUTES = {
+    "get": "GET /calendar/{appointment_id}",
+    "therapist_week": "GET /calendar/therapist/{therapist_id}",
+    "therapist_grid": "GET /calendar/therapist/{therapist_id}",
+    "patient_week": "GET /calendar/patient/{patient_id}",
+    "create": "POST /calendar/create",
+    "status": "PATCH /calendar/{appointment_id}/status",
+    "batch_get": "POST /calendar/batch-get",
+    "availability": "GET /calendar/availability",
+}
+SESSION = timedelta(minutes=50)
+FIRST_DAY = datetime(2026, 3, 2)  # a Monday
+
+
+def percentile(values, fraction: float) -> float:
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))]
+
+
+def start_moto():
+    try:
+        from moto.server import ThreadedMotoServer
+    except ImportError:
+        raise SystemExit('moto is not installed; pip install "moto[server]" or pass --endpoint-url for DynamoDB Local')
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    return server, f"http://{host}:{port}"
+
+
+def create_tables(client, appointments_table: str, series_table: str, guard_table: str) -> None:
+    def index(name, hash_key, sort_key=None):
+        schema = [{'AttributeName': hash_key, 'KeyType': 'HASH'}]
+        if sort_key:
+            schema.append({'AttributeName': sort_key, 'KeyType': 'RANGE'})
+        return {'IndexName': name, 'KeySchema': schema, 'Projection': {'ProjectionType': 'ALL'}}
+
+    client.create_table(
+        TableName=appointments_table,
+        BillingMode='PAY_PER_REQUEST',
+        AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'}
+                              for name in ('appointment_id', 'therapist_id', 'patient_id', 'start_time')],
+        KeySchema=[{'AttributeName': 'appointment_id', 'KeyType': 'HASH'}],
+        GlobalSecondaryIndexes=[index('TherapistIndex', 'therapist_id', 'start_time'),
+                                index('PatientIndex', 'patient_id', 'start_time')]
+    )
+    client.create_table(
+        TableName=series_table,
+        BillingMode='PAY_PER_REQUEST',
+        AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'}
+                              for name in ('series_id', 'therapist_id', 'patient_id')],
+        KeySchema=[{'AttributeName': 'series_id', 'KeyType': 'HASH'}],
+        GlobalSecondaryIndexes=[index('TherapistIndex', 'therapist_id'), index('PatientIndex', 'patient_id')]
+    )
+    client.create_table(
+        TableName=guard_table,
+        BillingMode='PAY_PER_REQUEST',
+        AttributeDefinitions=[{'AttributeName': 'therapist_id', 'AttributeType': 'S'}],
+        KeySchema=[{'AttributeName': 'therapist_id', 'KeyType': 'HASH'}]
+    )
+    for table in (appointments_table, series_table, guard_table):
+        client.get_waiter('table_exists').wait(TableName=table)
+
+
+class Workload:
+    """Generates requests against a seeded practice"""
+
+    def __init__(self, therapists: int, patients: int, days: int, rng: random.Random):
+        self.rng = rng
+        self.days = days
+        self.therapists = [f"bench-t{i:03d}" for i in range(therapists)]
+        self.patients = [f"bench-p{i:04d}" for i in range(patients)]
+        self.appointment_ids = []
+        self.next_id = 0
+
+    def appointment(self, day: int, hour: int, therapist: str) -> dict:
+        self.next_id += 1
+        start = FIRST_DAY + timedelta(days=day, hours=hour)
+        return {
+            "appointment_id": f"bench-{self.next_id:06d}",
+            "therapist_id": therapist,
+            "patient_id": self.rng.choice(self.patients),
+            "patient_name": "Benchmark Patient",
+            "therapist_name": "Benchmark Therapist",
+            "start_time": start.isoformat(),
+            "end_time": (start + SESSION).isoformat(),
+            "notes": "Session notes " * self.rng.randint(5, 40),
+        }
+
+    def seed_appointments(self):
+        """Six weekday sessions a day per therapist"""
+        for day in range(self.days):
+            if (FIRST_DAY + timedelta(days=day)).weekday() >= 5:
+                continue
+            for therapist in self.therapists:
+                for hour in self.rng.sample(range(9, 17), 6):
+                    yield self.appointment(day, hour, therapist)
+
+    def _week(self):
+        start = FIRST_DAY + timedelta(days=self.rng.randrange(max(1, self.days - 7)))
+        return {"start": start.isoformat(), "end": (start + timedelta(days=7)).isoformat()}
+
+    def request(self, operation: str):
+        """(method, path, params, json) for one operation"""
+        rng = self.rng
+        if operation == "get":
+            return "GET", f"/calendar/{rng.choice(self.appointment_ids)}", None, None
+        if operation == "therapist_week":
+            return "GET", f"/calendar/therapist/{rng.choice(self.therapists)}", self._week(), None
+        if operation == "therapist_grid":
+            return "GET", f"/calendar/therapist/{rng.choice(self.therapists)}", {**self._week(), "fields": "grid"}, None
+        if operation == "patient_week":
+            return "GET", f"/calendar/patient/{rng.choice(self.patients)}", self._week(), None
+        if operation == "create":
+            appt = self.appointment(rng.randrange(self.days), rng.randrange(8, 18), rng.choice(self.therapists))
+            return "POST", "/calendar/create", None, appt
+        if operation == "status":
+            status = rng.choice(["confirmed", "checked-in", "completed", "cancelled"])
+            return "PATCH", f"/calendar/{rng.choice(self.appointment_ids)}/status", None, {"status": status}
+        if operation == "batch_get":
+            return "POST", "/calendar/batch-get", None, {"appointment_ids": rng.sample(self.appointment_ids, 20)}
+        if operation == "availability":
+            return "GET", "/calendar/availability", {
+                "therapist_ids": rng.sample(self.therapists, 3), **self._week(), "duration": 50
+            }, None
+        raise ValueError(operation)
+
+
+async def run(args) -> None:
+    server = None
+    endpoint_url = args.endpoint_url
+    if not endpoint_url:
+        server, endpoint_url = start_moto()
+
+    suffix = f"{int(time.time())}-{os.getpid()}"
+    os.environ["DYNAMODB_ENDPOINT_URL"] = endpoint_url
+    os.environ.setdefault("AWS_REGION", "us-east-2")
+    os.environ.setdefault("AWS_DEFAULT_REGION", os.environ["AWS_REGION"])
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+    os.environ["APPOINTMENTS_TABLE_NAME"] = f"bench-appointments-{suffix}"
+    os.environ["APPOINTMENT_SERIES_TABLE_NAME"] = f"bench-series-{suffix}"
+    os.environ["SCHEDULE_GUARD_TABLE_NAME"] = f"bench-guards-{suffix}"
+    os.environ["THERAPIST_INDEX_NAME"] = "TherapistIndex"
+    os.environ["PATIENT_INDEX_NAME"] = "PatientIndex"
+    os.environ["CALENDAR_INDEX_SORT_KEY"] = "start_time"  # create_tables sorts the indexes
+    if args.no_cache:
+        os.environ["CALENDAR_CACHE_MAX_BYTES"] = "0"
+
+    # Imported after the environment is set: the service reads it at import
+    from services.calendar_dynamodb import capacity
+    from services.calendar_dynamodb.calendar_api import router
+    from utils import aws_clients
+
+    sync_client = aws_clients.get_client('dynamodb')
+    create_tables(sync_client, os.environ["APPOINTMENTS_TABLE_NAME"], os.environ["APPOINTMENT_SERIES_TABLE_NAME"],
+                  os.environ["SCHEDULE_GUARD_TABLE_NAME"])
+
+    app = FastAPI()
+    app.include_router(router)
+    rng = random.Random(args.seed)
+    workload = Workload(args.therapists, args.patients, args.days, rng)
+    latencies = {}
+    statuses = {}
+
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+            seed = list(workload.seed_appointments())
+            for i in range(0, len(seed), 500):
+                response = await client.post("/calendar/bulk/create", json=seed[i:i + 500])
+                response.raise_for_status()
+            workload.appointment_ids = [appt["appointment_id"] for appt in seed]
+            print(f"seeded {len(seed)} appointments for {args.therapists} therapists over {args.days} days")
+            capacity.metrics.reset()
+
+            operations = rng.choices(list(WORKLOAD), weights=list(WORKLOAD.values()), k=args.requests)
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def one(operation: str):
+                method, path, params, body = workload.request(operation)
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.request(method, path, params=params, json=body)
+                    elapsed = time.perf_counter() - started
+                if operation == "create" and response.status_code == 200:
+                    workload.appointment_ids.append(body["appointment_id"])
+                latencies.setdefault(operation, []).append(elapsed)
+                statuses.setdefault(operation, {}).setdefault(response.status_code, 0)
+                statuses[operation][response.status_code] += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one(operation) for operation in operations))
+            elapsed = time.perf_counter() - started
+    finally:
+        await aws_clients.close_async_clients()
+        if not args.keep_tables:
+            for table in (os.environ["APPOINTMENTS_TABLE_NAME"], os.environ["APPOINTMENT_SERIES_TABLE_NAME"],
+                          os.environ["SCHEDULE_GUARD_TABLE_NAME"]):
+                sync_client.delete_table(TableName=table)
+        if server:
+            server.stop()
+
+    usage = capacity.metrics.snapshot()
+    print(f"{args.requests} requests in {elapsed:.1f} s ({args.requests / elapsed:.0f} req/s), "
+          f"concurrency {args.concurrency}, cache {'off' if args.no_cache else 'on'}")
+    print(f"{'operation':<16}{'requests':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'RCU/req':>9}{'WCU/req':>9}  statuses")
+    for operation in WORKLOAD:
+        if operation not in latencies:
+            continue
+        values = sorted(latencies[operation])
+        route = ROUTES[operation]
+        used = usage.get(route, {})
+        # Operations sharing a route (week and grid views) share its capacity totals
+        share = len(values) / sum(len(latencies[op]) for op, r in ROUTES.items() if r == route and op in latencies)
+        rcu = used.get('read_units', 0.0) * share / len(values)
+        wcu = used.get('write_units', 0.0) * share / len(values)
+        print(f"{operation:<16}{len(values):>9}{percentile(values, 0.50) * 1000:>9.1f}"
+              f"{percentile(values, 0.95) * 1000:>9.1f}{percentile(values, 0.99) * 1000:>9.1f}"
+              f"{rcu:>9.2f}{wcu:>9.2f}  {dict(sorted(statuses[operation].items()))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--endpoint-url", help="DynamoDB Local endpoint; defaults to an in-process moto server")
+    parser.add_argument("--requests", type=int, default=2000, help="workload requests to replay")
+    parser.add_argument("--concurrency", type=int, default=20, help="requests in flight")
+    parser.add_argument("--therapists", type=int, default=20)
+    parser.add_argument("--patients", type=int, default=300)
+    parser.add_argument("--days", type=int, default=28, help="days of seeded history")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the workload")
+    parser.add_argument("--no-cache", action="store_true", help="disable the appointment cache")
+    parser.add_argument("--keep-tables", action="store_true", help="leave the benchmark tables in place")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Concurrency benchmark: async calendar routes vs the threadpool baseline
+
+Serves ``GET /calendar/{id}`` two ways against a local DynamoDB stand-in
+with a fixed per-call latency:
+
+  sync   a plain ``def`` route doing a blocking boto3 ``get_item`` (the
+         previous implementation); Starlette runs it on its threadpool,
+         so at most 40 requests are in flight
+  async  the calendar service route awaiting the aiobotocore data layer
+
+and reports throughput and latency as client concurrency grows. The sync
+route levels off at threadpool size / latency; the async route keeps
+scaling until the connection pool (AWS_MAX_POOL_CONNECTIONS) or the
+process's own CPU (request parsing, botocore serialization) is the limit.
+The default latency is deliberately high so the run is I/O bound even on a
+single core. The appointment cache is turned off, since cached reads would
+never reach the stand-in.
+
+Usage (from the backend directory):
+    python -m benchmarks.calendar_concurrency [--latency 0.2] [--requests 1000]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+from fastapi import APIRouter, FastAPI, HTTPException
+
+from benchmarks.dynamodb_standin import DynamoDBStandIn
+
+CONCURRENCY_LEVELS = (10, 40, 80, 160, 320)
+APPOINTMENT_IDS = [f"bench-{i:04d}" for i in range(200)]
+
+
+def build_app() -> FastAPI:
+    from services.calendar_dynamodb import calendar_db
+    from services.calendar_dynamodb.calendar_api import router as calendar_router
+    from utils import aws_clients
+
+    # Blocking baseline equivalent to the old calendar_db.get_appointment
+    baseline = APIRouter(prefix="/sync/calendar")
+
+    @baseline.get("/{appointment_id}")
+    def read_appointment_sync(appointment_id: str):
+        client = aws_clients.get_client('dynamodb')
+        response = client.get_item(
+            TableName=calendar_db.TABLE_NAME,
+            Key={'appointment_id': {'S': appointment_id}}
+        )
+        if 'Item' not in response:
+            raise HTTPException(status_code=404, detail="Appointment not found")
+        return calendar_db.deserialize_item(response['Item'])
+
+    app = FastAPI()
+    app.include_router(calendar_router)
+    app.include_router(baseline)
+    return app
+
+
+def seed_items() -> dict:
+    return {
+        appointment_id: {
+            "appointment_id": {"S": appointment_id},
+            "patient_id": {"S": "patient1"},
+            "therapist_id": {"S": "doctor1"},
+            "start_time": {"S": "2026-01-05T10:00:00"},
+            "end_time": {"S": "2026-01-05T10:50:00"},
+            "status": {"S": "scheduled"},
+        }
+        for appointment_id in APPOINTMENT_IDS
+    }
+
+
+async def run_level(client: httpx.AsyncClient, prefix: str, concurrency: int, total: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(f"{prefix}/{APPOINTMENT_IDS[i % len(APPOINTMENT_IDS)]}")
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "throughput": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def run(latency: float, total: int) -> None:
+    standin = DynamoDBStandIn(seed_items(), latency=latency).start()
+    os.environ["DYNAMODB_ENDPOINT_URL"] = standin.endpoint_url
+    os.environ.setdefault("AWS_REGION", "us-east-2")
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+    os.environ.setdefault("AWS_MAX_POOL_CONNECTIONS", str(max(CONCURRENCY_LEVELS)))
+    # Every async read has to reach the stand-in, not the appointment cache
+    os.environ["CALENDAR_CACHE_MAX_BYTES"] = "0"
+
+    app = build_app()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        # Warm both paths so client creation is not measured
+        await client.get(f"/calendar/{APPOINTMENT_IDS[0]}")
+        await client.get(f"/sync/calendar/{APPOINTMENT_IDS[0]}")
+
+        print(f"stand-in latency {latency * 1000:.0f} ms, {total} requests per level")
+        print(f"{'concurrency':>11}  {'mode':<6}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        for concurrency in CONCURRENCY_LEVELS:
+            for mode, prefix in (("sync", "/sync/calendar"), ("async", "/calendar")):
+                row = await run_level(client, prefix, concurrency, total)
+                print(f"{concurrency:>11}  {mode:<6}{row['throughput']:>10.0f}"
+                      f"{row['p50_ms']:>10.1f}{row['p99_ms']:>10.1f}")
+
+    from utils import aws_clients
+    await aws_clients.close_async_clients()
+    standin.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.2, help="stand-in latency per call, seconds")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per concurrency level")
+    args = parser.parse_args()
+    asyncio.run(run(args.latency, args.requests))
+
+
+if __name__ == "__main__":
+    main()
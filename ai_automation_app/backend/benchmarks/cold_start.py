@@ -0,0 +1,113 @@
+"""
+Cold-start benchmark for the Lambda entry point
+
+Each sample runs in a fresh interpreter, the way a new Lambda container
+does: it imports ``main`` with a given router set, sends one request
+through the Mangum ``handler`` and reports the time from the start of the
+import to the first response.
+
+Usage (from the backend directory):
+    python -m benchmarks.cold_start [--runs 5] [--sets "all;calendar;calendar,messages"]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from app_factory import SERVICE_ROUTERS
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A request per service that is answered without touching AWS
+PROBES = {
+    "calendar": ("POST", "/calendar/create", "", "{}"),
+    "messages": ("GET", "/messages/conversations", "", None),
+    "call_manager": ("GET", "/api/call-manager/active-calls", "", None),
+    "financial": ("GET", "/api/financial/cpt-codes", "", None),
+    "ai_assistant": ("GET", "/api/ai-assistant/messages", "user_id=patient1", None),
+}
+HEALTH_PROBE = ("GET", "/api/health", "", None)
+
+# Runs inside the child interpreter; prints one JSON line of timings
+CHILD_SCRIPT = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import main
+t_import = time.perf_counter()
+
+method, path, query, body = json.loads(sys.argv[1])
+event = {
+    "version": "2.0",
+    "routeKey": "$default",
+    "rawPath": path,
+    "rawQueryString": query,
+    "headers": {"host": "localhost", "content-type": "application/json"},
+    "requestContext": {
+        "http": {"method": method, "path": path, "protocol": "HTTP/1.1",
+                 "sourceIp": "127.0.0.1", "userAgent": "cold-start-benchmark"},
+        "stage": "$default",
+        "requestId": "benchmark",
+    },
+    "body": body,
+    "isBase64Encoded": False,
+}
+response = main.handler(event, None)
+t_response = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t_import - t0) * 1000,
+    "first_response_ms": (t_response - t0) * 1000,
+    "status": response["statusCode"],
+}))
+"""
+
+
+def run_once(routers: str, lazy: bool, probe) -> dict:
+    env = dict(os.environ)
+    env["THERASTACK_ROUTERS"] = routers
+    env["THERASTACK_LAZY_ROUTERS"] = "true" if lazy else "false"
+    env.setdefault("AWS_REGION", "us-east-2")
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT, json.dumps(list(probe))],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Cold start failed for routers={routers}:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def benchmark(router_set: str, lazy: bool, runs: int) -> dict:
+    names = list(SERVICE_ROUTERS) if router_set == "all" else router_set.split(",")
+    # Probe the first selected service so its router is part of the measurement
+    probe = PROBES.get(names[0], HEALTH_PROBE)
+    samples = [run_once(router_set, lazy, probe) for _ in range(runs)]
+    return {
+        "routers": router_set,
+        "mode": "lazy" if lazy else "eager",
+        "probe": f"{probe[0]} {probe[1]}",
+        "status": samples[-1]["status"],
+        "import_ms": statistics.median(s["import_ms"] for s in samples),
+        "first_response_ms": statistics.median(s["first_response_ms"] for s in samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per configuration")
+    parser.add_argument("--sets", default=";".join(["all"] + list(SERVICE_ROUTERS)),
+                        help="';'-separated router sets, each 'all' or comma-separated service names")
+    args = parser.parse_args()
+
+    router_sets = [router_set.strip() for router_set in args.sets.split(";") if router_set.strip()]
+    print(f"{'routers':<28}{'mode':<7}{'probe':<36}{'status':>7}{'import ms':>11}{'first resp ms':>15}")
+    for router_set in router_sets:
+        for lazy in (False, True):
+            row = benchmark(router_set, lazy, args.runs)
+            print(f"{row['routers']:<28}{row['mode']:<7}{row['probe']:<36}{row['status']:>7}"
+                  f"{row['import_ms']:>11.1f}{row['first_response_ms']:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Minimal in-memory DynamoDB stand-in for benchmarks
+
+Speaks enough of the DynamoDB JSON protocol (GetItem, PutItem, UpdateItem
+with a plain SET, Query on an equality key condition, segmented Scan) to
+serve the calendar service, and sleeps for a fixed latency on every call to
+model the network round-trip to the real service. It runs in a child process so its
+CPU time never competes with the code being measured.
+
+For functional testing against the full API use DynamoDB Local or moto.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import re
+from typing import Dict, Optional
+
+from aiohttp import web
+
+_CONDITION = re.compile(r"^\s*(#?\w+)\s*=\s*(:\w+)\s*$")
+
+
+def _resolve(name: str, names: Optional[Dict[str, str]]) -> str:
+    return (names or {}).get(name, name)
+
+
+class DynamoDBStandIn:
+    """A single-table DynamoDB emulator with injected latency"""
+
+    def __init__(self, items: Optional[Dict[str, dict]] = None, hash_key: str = "appointment_id",
+                 latency: float = 0.02, host: str = "127.0.0.1", port: int = 0):
+        """
+        Args:
+            items: Initial table contents, hash key value -> typed attribute map
+            hash_key: Name of the table's partition key
+            latency: Seconds to sleep before answering each call
+        """
+        self.items: Dict[str, dict] = dict(items or {})
+        self.hash_key = hash_key
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self._process = None
+
+    @property
+    def endpoint_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    # Operations
+
+    def _get_item(self, body):
+        item = self.items.get(body["Key"][self.hash_key]["S"])
+        return {"Item": item} if item else {}
+
+    def _put_item(self, body):
+        self.items[body["Item"][self.hash_key]["S"]] = body["Item"]
+        return {}
+
+    def _update_item(self, body):
+        key = body["Key"][self.hash_key]["S"]
+        item = self.items.setdefault(key, dict(body["Key"]))
+        names = body.get("ExpressionAttributeNames")
+        values = body.get("ExpressionAttributeValues", {})
+        updated = {}
+        assignments = re.sub(r"^\s*set\s+", "", body["UpdateExpression"], flags=re.IGNORECASE)
+        for assignment in assignments.split(","):
+            name, value = _CONDITION.match(assignment).groups()
+            item[_resolve(name, names)] = updated[_resolve(name, names)] = values[value]
+        return {"Attributes": updated if body.get("ReturnValues") == "UPDATED_NEW" else item}
+
+    def _query(self, body):
+        name, value = _CONDITION.match(body["KeyConditionExpression"]).groups()
+        name = _resolve(name, body.get("ExpressionAttributeNames"))
+        value = body["ExpressionAttributeValues"][value]
+        items = [item for item in self.items.values() if item.get(name) == value]
+        return {"Items": items, "Count": len(items), "ScannedCount": len(items)}
+
+    def _scan(self, body):
+        items = list(self.items.values())
+        if "TotalSegments" in body:
+            items = [item for key, item in self.items.items()
+                     if hash(key) % body["TotalSegments"] == body["Segment"]]
+        return {"Items": items, "Count": len(items), "ScannedCount": len(items)}
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        operation = request.headers["X-Amz-Target"].split(".", 1)[1]
+        body = json.loads(await request.read() or b"{}")
+        await asyncio.sleep(self.latency)
+        handler = {
+            "GetItem": self._get_item,
+            "PutItem": self._put_item,
+            "UpdateItem": self._update_item,
+            "Query": self._query,
+            "Scan": self._scan,
+        }.get(operation)
+        if handler is None:
+            error = {"__type": "com.amazonaws.dynamodb.v20120810#UnknownOperationException",
+                     "message": f"{operation} is not supported by the stand-in"}
+            return web.json_response(error, status=400, content_type="application/x-amz-json-1.0")
+        return web.json_response(handler(body), content_type="application/x-amz-json-1.0")
+
+    # Lifecycle
+
+    def _serve(self, port_pipe) -> None:
+        async def serve():
+            app = web.Application()
+            app.router.add_post("/", self._handle)
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            site = web.TCPSite(runner, self.host, self.port, backlog=4096)
+            await site.start()
+            port_pipe.send(runner.addresses[0][1])
+            await asyncio.Event().wait()
+
+        asyncio.run(serve())
+
+    def start(self) -> "DynamoDBStandIn":
+        """Serve from a child process; returns once it is listening"""
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self._process = multiprocessing.Process(target=self._serve, args=(sender,), daemon=True)
+        self._process.start()
+        self.port = receiver.recv()
+        return self
+
+    def stop(self) -> None:
+        if self._process:
+            self._process.terminate()
+            self._process.join()
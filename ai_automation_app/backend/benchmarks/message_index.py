@@ -0,0 +1,74 @@
+"""
+Message index benchmark: reading one conversation as the store grows
+
+Grows the in-memory message store to millions of messages spread over
+many conversations and, at each size, times ``get_messages_for_conversation``
+on one conversation of a fixed length, next to the previous implementation
+(scan every message, then sort the matches). The indexed read should stay
+flat while the scan grows with the total message count.
+
+Usage (from the backend directory):
+    python -m benchmarks.message_index [--sizes 10000,100000,1000000] [--conversation-length 50]
+"""
+
+import argparse
+import random
+import time
+
+from services.messages_dynamodb import message_db
+
+
+def scan_messages_for_conversation(conversation_id: str):
+    """The previous get_messages_for_conversation: a full scan and a sort per call"""
+    messages = [msg for msg in message_db._messages_db.values()
+                if msg["conversation_id"] == conversation_id and not msg["is_deleted"]]
+    messages.sort(key=lambda x: x["created_at"])
+    return messages
+
+
+def time_per_call(read, conversation_id: str, budget: float = 0.5) -> float:
+    """Mean seconds per call, repeating for about ``budget`` seconds"""
+    calls, started = 0, time.perf_counter()
+    while True:
+        read(conversation_id)
+        calls += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= budget:
+            return elapsed / calls
+
+
+def run(args) -> None:
+    rng = random.Random(args.seed)
+    message_db._messages_db.clear()
+    message_db._conversation_messages.clear()
+    message_db._conversations_db.clear()
+
+    target = "bench-target"
+    for i in range(args.conversation_length):
+        message_db.create_message(target, "sender", "Sender", "doctor", f"message {i}")
+
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    print(f"conversation of {args.conversation_length} messages among {args.conversations} conversations")
+    print(f"{'messages':>10}{'indexed us':>13}{'scan us':>13}{'speedup':>10}")
+    for size in sizes:
+        while len(message_db._messages_db) < size:
+            conversation_id = f"bench-{rng.randrange(args.conversations)}"
+            message_db.create_message(conversation_id, "sender", "Sender", "patient", "hello")
+
+        indexed = time_per_call(message_db.get_messages_for_conversation, target)
+        scanned = time_per_call(scan_messages_for_conversation, target)
+        assert message_db.get_messages_for_conversation(target) == scan_messages_for_conversation(target)
+        print(f"{size:>10}{indexed * 1e6:>13.1f}{scanned * 1e6:>13.1f}{scanned / indexed:>9.0f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="total message counts to measure at")
+    parser.add_argument("--conversation-length", type=int, default=50, help="messages in the conversation read")
+    parser.add_argument("--conversations", type=int, default=10000, help="conversations the other messages go to")
+    parser.add_argument("--seed", type=int, default=1)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,25 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-import boto3
 import json
 import logging
 import os
 import time
 from jose import jwt, JWTError
 from mangum import Mangum
-import uvicorn
 
-# Import AWS SDK for Cognito
-from botocore.exceptions import ClientError
+from utils import aws_clients
+from utils.cognito_jwks import JWKSCache, UnknownKeyError, verify_cognito_token
 
-# Import service routers
-from services.calendar_dynamodb.calendar_api import router as calendar_router
-from services.messages_dynamodb.message_api import router as message_router
-from services.call_manager.call_manager_api import router as call_manager_router
-from services.billing.billing_api import router as billing_router
-from services.payments.payments_api import router as payments_router
-from services.ai_assistant.ai_assistant_api import router as ai_assistant_router
+# Service routers are mounted by the app factory, lazily by default
+from app_factory import create_app
 
 # Set up logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize FastAPI
-app = FastAPI(
+# Initialize FastAPI with the routers selected by THERASTACK_ROUTERS
+app = create_app(
     title="TheraStack API",
     description="Backend API for the TheraStack healthcare platform",
     version="0.1.0"
@@ -37,6 +30,10 @@ STAGE = os.environ.get('STAGE', 'dev')
 REGION = os.environ.get('AWS_REGION', 'us-east-2')
 USER_POOL_ID = os.environ.get('COGNITO_USER_POOL_ID')
 APP_CLIENT_ID = os.environ.get('COGNITO_APP_CLIENT_ID')
+# 'jwks' verifies tokens locally against the user pool's signing keys,
+# 'remote' asks Cognito about every token
+TOKEN_VERIFICATION = os.environ.get('COGNITO_TOKEN_VERIFICATION', 'jwks')
+JWKS_TTL = int(os.environ.get('COGNITO_JWKS_TTL', '3600'))
 
 # Define allowed origins based on environment
 FRONTEND_DOMAIN = os.environ.get('FRONTEND_DOMAIN', 'app.therastack.com')
@@ -67,6 +64,48 @@ app.add_middleware(
 # Security setup
 security = HTTPBearer()
 
+# Signing keys for the user pool, downloaded on first use
+_jwks_cache = None
+
+def get_jwks_cache():
+    """Get the process-wide JWKS cache for the configured user pool"""
+    global _jwks_cache
+    if _jwks_cache is None:
+        _jwks_cache = JWKSCache(REGION, USER_POOL_ID, ttl=JWKS_TTL)
+    return _jwks_cache
+
+def validate_with_cognito(token: str):
+    """Validates an access token by calling Cognito"""
+    # botocore is imported on first use so it stays out of the cold start
+    from botocore.exceptions import ClientError
+
+    # Shared Cognito client from the pooled registry
+    cognito = aws_clients.get_client('cognito-idp', region_name=REGION)
+    
+    try:
+        # Validate token with Cognito
+        response = cognito.get_user(AccessToken=token)
+        username = response['Username']
+        
+        # Get user's groups (roles)
+        user_groups = []
+        try:
+            group_response = cognito.admin_list_groups_for_user(
+                Username=username,
+                UserPoolId=USER_POOL_ID
+            )
+            user_groups = [group['GroupName'] for group in group_response.get('Groups', [])]
+        except ClientError as e:
+            logger.warning(f"Could not get user groups: {str(e)}")
+        
+        return {"sub": username, "groups": user_groups}
+    except ClientError as e:
+        logger.error(f"Token validation error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token or expired token"
+        )
+
 # JWT validation function
 async def validate_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Validates the JWT token from Cognito"""
@@ -75,32 +114,21 @@ async def validate_token(credentials: HTTPAuthorizationCredentials = Depends(sec
         
         # In production environment, validate with Cognito
         if STAGE != 'local' and USER_POOL_ID:
-            # Initialize Cognito client
-            cognito = boto3.client('cognito-idp', region_name=REGION)
-            
-            try:
-                # Validate token with Cognito
-                response = cognito.get_user(AccessToken=token)
-                username = response['Username']
-                
-                # Get user's groups (roles)
-                user_groups = []
+            if TOKEN_VERIFICATION == 'jwks':
                 try:
-                    group_response = cognito.admin_list_groups_for_user(
-                        Username=username,
-                        UserPoolId=USER_POOL_ID
+                    # Verify signature and claims locally; groups come from the token
+                    return await verify_cognito_token(token, get_jwks_cache(), APP_CLIENT_ID)
+                except UnknownKeyError as e:
+                    # Key not published in the JWKS - let Cognito decide
+                    logger.warning(f"{str(e)}, falling back to Cognito")
+                except JWTError as e:
+                    logger.error(f"Token validation error: {str(e)}")
+                    raise HTTPException(
+                        status_code=status.HTTP_401_UNAUTHORIZED,
+                        detail="Invalid token or expired token"
                     )
-                    user_groups = [group['GroupName'] for group in group_response.get('Groups', [])]
-                except ClientError as e:
-                    logger.warning(f"Could not get user groups: {str(e)}")
-                
-                return {"sub": username, "groups": user_groups}
-            except ClientError as e:
-                logger.error(f"Token validation error: {str(e)}")
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid token or expired token"
-                )
+            
+            return validate_with_cognito(token)
         else:
             # For local development with no Cognito, just decode the token
             try:
@@ -118,14 +146,6 @@ async def validate_token(credentials: HTTPAuthorizationCredentials = Depends(sec
             detail="Invalid authentication credentials"
         )
 
-# Include API routers
-app.include_router(calendar_router)
-app.include_router(message_router)
-app.include_router(call_manager_router)
-app.include_router(billing_router)
-app.include_router(payments_router)
-app.include_router(ai_assistant_router)
-
 # Root endpoint
 @app.get("/")
 def read_root():
@@ -146,10 +166,23 @@ async def health_check():
         "environment": STAGE
     }
 
-# Create handler for AWS Lambda
-handler = Mangum(app)
+# AWS client pool counters (created vs reused)
+@app.get("/api/health/aws-clients", tags=["Health"])
+async def aws_client_stats():
+    return aws_clients.get_stats()
+
+# Close pooled async AWS clients when the local server stops
+@app.on_event("shutdown")
+async def close_aws_clients():
+    await aws_clients.close_async_clients()
+
+# Create handler for AWS Lambda. Mangum would run the lifespan around every
+# invocation, closing the pooled clients each time, so it is turned off and
+# the clients live as long as the execution environment.
+handler = Mangum(app, lifespan="off")
 
 # For local development
 if __name__ == "__main__":
+    import uvicorn
     port = int(os.getenv("PORT", 8000))
     uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
\ No newline at end of file
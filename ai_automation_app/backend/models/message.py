@@ -14,6 +14,7 @@ class Attachment(BaseModel):
 class Message(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     conversation_id: str
+    seq: Optional[int] = None  # position in the conversation; read watermarks refer to it
     sender_id: str
     sender_name: str
     sender_role: str
@@ -43,9 +44,11 @@ class ConversationResponse(BaseModel):
     unread_count: int = 0
 
 class ConversationWithMessagesResponse(BaseModel):
-    """Response model for a conversation with all its messages"""
+    """Response model for a conversation with one page of its messages"""
     conversation: Conversation
-    messages: List[Message]
+    messages: List[Message]  # oldest first within the page
+    before_cursor: Optional[str] = None  # pass as ?before= for older messages
+    after_cursor: Optional[str] = None  # pass as ?after= for newer messages
     
 class ConversationListResponse(BaseModel):
     """Response model for listing all conversations"""
@@ -0,0 +1,142 @@
+"""
+In-process read-through cache for calendar reads
+
+Single appointments and pages of therapist/patient listings are kept in
+one LRU bounded by an approximate byte size (the length of the value's JSON
+form) and a TTL. Every entry carries tags naming the therapist and patient
+it depends on, so a write can drop all cached listing pages for the people
+it touches without knowing which pages exist.
+
+calendar_db updates or invalidates entries on its own writes. Writes from
+other processes become visible when entries expire after ``ttl`` seconds.
+Cached values are shared between callers and must not be mutated.
+"""
+
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+_MISSING = object()
+
+
+def _size_of(value: Any) -> int:
+    return len(json.dumps(value, default=str))
+
+
+class AppointmentCache:
+    """LRU with a byte budget, a TTL and tag-based invalidation"""
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024, ttl: float = 30):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int, float, Tuple[str, ...]]]" = OrderedDict()
+        self._tagged: Dict[str, Set[Hashable]] = {}
+        self._generations: Dict[str, int] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.ttl > 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        value, _, expires_at, _ = entry
+        if time.monotonic() >= expires_at:
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any, tags: Iterable[str] = (), ttl: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+        size = _size_of(value)
+        if key in self._entries:
+            self._remove(key)
+        if size > self.max_bytes:
+            return
+        tags = tuple(tag for tag in tags if tag)
+        self._entries[key] = (value, size, time.monotonic() + (self.ttl if ttl is None else ttl), tags)
+        self.bytes += size
+        for tag in tags:
+            self._tagged.setdefault(tag, set()).add(key)
+        while self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Cached value without touching LRU order or metrics"""
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() >= entry[2]:
+            return default
+        return entry[0]
+
+    def update(self, key: Hashable, changes: dict) -> None:
+        """Apply field changes to a cached dict in place of re-reading it"""
+        value = self.peek(key, _MISSING)
+        if isinstance(value, dict):
+            self.put(key, {**value, **changes}, self._entries[key][3])
+
+    def generation(self, *tags: str) -> Tuple[int, ...]:
+        """
+        Invalidation counters for tags
+
+        A slow reader takes the generation before reading and compares it
+        before caching what it read, so a write that lands in between is
+        not hidden behind a stale entry.
+        """
+        return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def invalidate(self, key: Hashable) -> None:
+        if key in self._entries:
+            self._remove(key)
+            self.invalidations += 1
+
+    def invalidate_tags(self, *tags: Optional[str]) -> None:
+        """Drop every entry carrying any of the given tags"""
+        for tag in tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+            for key in list(self._tagged.get(tag, ())):
+                self.invalidate(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tagged.clear()
+        self.bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _, tags = self._entries.pop(key)
+        self.bytes -= size
+        for tag in tags:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
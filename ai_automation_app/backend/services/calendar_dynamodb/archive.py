@@ -0,0 +1,380 @@
+"""
+Hot/cold tiering for historical appointments
+
+Appointments in a final status (completed, cancelled, no-show) that ended
+more than CALENDAR_ARCHIVE_AFTER_DAYS ago (365 by default) are moved out of
+the appointments table, where every index query and scan pays for them,
+into a cold store as gzip-compressed JSON Lines. Every appointment is
+written once under its therapist and once under its patient, partitioned by
+the month it starts in, so one person's history never reads anyone else's:
+
+    appointments/therapist_id=t-17/2025/03/20260101T020000Z-1a2b3c4d-0001.jsonl.gz
+    appointments/patient_id=p-342/2025/03/20260101T020000Z-1a2b3c4d-0001.jsonl.gz
+
+CALENDAR_ARCHIVE_URL selects the store: ``s3://bucket/prefix`` for S3 or
+any S3-compatible store (S3_ENDPOINT_URL overrides the endpoint), or a
+local directory (``file:///path`` or a plain path). Without it nothing is
+archived and history reads only see the table.
+
+A run writes each file before deleting its items from the table, so an
+interrupted run leaves copies in both tiers rather than losing any; reads
+prefer the table's copy. appointment_history combines a window query on the
+table with the owner's cold files for the months the window touches.
+
+Each batch also writes a ledger file with just the LEDGER_FIELDS of its
+items, under archived/, so the reporting aggregates can count archived
+appointments without reading every owner's files (see iter_ledger).
+
+Usage (from the backend directory):
+    python -m services.calendar_dynamodb.archive [--older-than-days N] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional
+from urllib.parse import quote, urlparse
+
+from utils import aws_clients
+from . import calendar_db
+from .interval_index import to_timestamp
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_URL = os.environ.get('CALENDAR_ARCHIVE_URL')
+ARCHIVE_AFTER_DAYS = int(os.environ.get('CALENDAR_ARCHIVE_AFTER_DAYS', '365'))
+# Items archived per batch: each batch writes its files, then deletes its items
+ARCHIVE_FILE_ITEMS = int(os.environ.get('CALENDAR_ARCHIVE_FILE_ITEMS', '10000'))
+# Cold files fetched at once by a history read, and written at once by a run
+ARCHIVE_READ_CONCURRENCY = int(os.environ.get('CALENDAR_ARCHIVE_READ_CONCURRENCY', '8'))
+ARCHIVE_WRITE_CONCURRENCY = int(os.environ.get('CALENDAR_ARCHIVE_WRITE_CONCURRENCY', '8'))
+
+# Final statuses, plus cancelled: only archived once long past, when
+# rescheduling it would mean booking a slot that is already over
+ARCHIVE_STATUSES = frozenset(
+    status for status, targets in calendar_db.STATUS_TRANSITIONS.items()
+    if not targets or not calendar_db.is_blocking(status)
+)
+
+PARTITION_ROOT = "appointments"
+LEDGER_ROOT = "archived"
+FILE_SUFFIX = ".jsonl.gz"
+
+# Attributes kept in the ledger: what calendar_aggregates counts
+LEDGER_FIELDS = ('appointment_id', 'therapist_id', 'start_time', 'end_time', 'status')
+
+# Attributes the cold tier is partitioned by, one copy per owner
+OWNER_KEYS = ('therapist_id', 'patient_id')
+
+
+class LocalArchiveStore:
+    """Archive files in a local directory"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial file
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+    def _read(self, key: str) -> bytes:
+        with open(os.path.join(self.root, key), "rb") as f:
+            return f.read()
+
+    def _list(self, prefix: str) -> List[str]:
+        keys = []
+        for directory, _, names in os.walk(os.path.join(self.root, prefix)):
+            relative = os.path.relpath(directory, self.root).replace(os.sep, "/")
+            keys.extend(f"{relative}/{name}" for name in names if name.endswith(FILE_SUFFIX))
+        return sorted(keys)
+
+    async def put(self, key: str, data: bytes) -> None:
+        await asyncio.to_thread(self._write, key, data)
+
+    async def get(self, key: str) -> bytes:
+        return await asyncio.to_thread(self._read, key)
+
+    async def list(self, prefix: str) -> List[str]:
+        """Keys of every archive file under a prefix, at any depth"""
+        return await asyncio.to_thread(self._list, prefix)
+
+
+class S3ArchiveStore:
+    """Archive files under a prefix of an S3 bucket"""
+
+    def __init__(self, bucket: str, prefix: str = ""):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    async def put(self, key: str, data: bytes) -> None:
+        client = await aws_clients.get_async_client('s3')
+        await client.put_object(Bucket=self.bucket, Key=self._object_key(key), Body=data,
+                                ContentType="application/gzip")
+
+    async def get(self, key: str) -> bytes:
+        client = await aws_clients.get_async_client('s3')
+        response = await client.get_object(Bucket=self.bucket, Key=self._object_key(key))
+        async with response['Body'] as stream:
+            return await stream.read()
+
+    async def list(self, prefix: str) -> List[str]:
+        client = await aws_clients.get_async_client('s3')
+        strip = len(self._object_key(""))
+        keys = []
+        paginator = client.get_paginator('list_objects_v2')
+        async for page in paginator.paginate(Bucket=self.bucket, Prefix=self._object_key(prefix) + "/"):
+            keys.extend(obj['Key'][strip:] for obj in page.get('Contents', []) if obj['Key'].endswith(FILE_SUFFIX))
+        return sorted(keys)
+
+
+def get_archive_store(url: Optional[str] = ARCHIVE_URL):
+    """Store for an s3:// URL, file:// URL or directory path; None without a URL"""
+    if not url:
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme == "s3":
+        return S3ArchiveStore(parsed.netloc, parsed.path)
+    if parsed.scheme == "file":
+        return LocalArchiveStore(parsed.path)
+    if parsed.scheme:
+        raise ValueError(f"Unsupported archive URL: {url}")
+    return LocalArchiveStore(url)
+
+
+archive_store = get_archive_store()
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Cannot archive {type(value).__name__} values")
+
+
+def encode_partition(items: List[dict]) -> bytes:
+    lines = "".join(json.dumps(item, default=_json_default, separators=(",", ":")) + "\n" for item in items)
+    return gzip.compress(lines.encode("utf-8"))
+
+
+def decode_partition(data: bytes) -> List[dict]:
+    return [json.loads(line) for line in gzip.decompress(data).decode("utf-8").splitlines() if line]
+
+
+def owner_prefix(key_name: str, key_value: str) -> str:
+    """Where one therapist's or patient's cold files live"""
+    return f"{PARTITION_ROOT}/{key_name}={quote(str(key_value), safe='')}"
+
+
+def _month(start_time) -> str:
+    start = datetime.fromtimestamp(to_timestamp(start_time), timezone.utc)
+    return f"{start.year:04d}/{start.month:02d}"
+
+
+def partitions_for(appt: dict) -> List[str]:
+    """The owner partitions an appointment is archived to"""
+    month = _month(appt['start_time'])
+    return [f"{owner_prefix(key_name, appt[key_name])}/{month}" for key_name in OWNER_KEYS if appt.get(key_name)]
+
+
+def months_between(start: datetime, end: datetime) -> List[str]:
+    """YYYY/MM of every month touched by [start, end]"""
+    first = datetime.fromtimestamp(to_timestamp(start), timezone.utc)
+    last = datetime.fromtimestamp(to_timestamp(end), timezone.utc)
+    year, month = first.year, first.month
+    months = []
+    while (year, month) <= (last.year, last.month):
+        months.append(f"{year:04d}/{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def is_archivable(appt: dict, cutoff: float) -> bool:
+    """Final status, an owner to file it under, and ended before the cutoff timestamp"""
+    if appt.get('status') not in ARCHIVE_STATUSES or not appt.get('start_time'):
+        return False
+    if not any(appt.get(key_name) for key_name in OWNER_KEYS):
+        return False
+    try:
+        return to_timestamp(appt.get('end_time') or appt['start_time']) < cutoff
+    except (TypeError, ValueError):
+        return False
+
+
+async def archive_appointments(store, older_than_days: int = ARCHIVE_AFTER_DAYS, dry_run: bool = False) -> dict:
+    """
+    Move archivable appointments from the table to the cold store
+
+    The table is read with a parallel scan. Every ARCHIVE_FILE_ITEMS
+    archivable items (and the rest at the end) are written as one file per
+    owner partition, then deleted from the table. Returns counts of what was
+    scanned, archived, written and left behind by failed deletes.
+    """
+    now = datetime.now(timezone.utc)
+    cutoff = (now - timedelta(days=older_than_days)).timestamp()
+    run_id = f"{now.strftime('%Y%m%dT%H%M%SZ')}-{uuid.uuid4().hex[:8]}"
+    counts = {'scanned': 0, 'archived': 0, 'files': 0, 'failed': 0}
+    batch: List[dict] = []
+    batches = 0
+    semaphore = asyncio.Semaphore(ARCHIVE_WRITE_CONCURRENCY)
+
+    async def write(key: str, items: List[dict]) -> None:
+        async with semaphore:
+            await store.put(key, encode_partition(items))
+
+    async def flush() -> None:
+        nonlocal batch, batches
+        items, batch = batch, []
+        batches += 1
+        partitions: Dict[str, List[dict]] = {}
+        for appt in items:
+            for partition in partitions_for(appt):
+                partitions.setdefault(partition, []).append(appt)
+        counts['files'] += len(partitions)
+        if dry_run:
+            counts['archived'] += len(items)
+            return
+        # Every copy of the batch is written before any of it is deleted
+        ledger = [{name: appt[name] for name in LEDGER_FIELDS if name in appt} for appt in items]
+        await asyncio.gather(
+            write(f"{LEDGER_ROOT}/{run_id}-{batches:04d}{FILE_SUFFIX}", ledger),
+            *(write(f"{partition}/{run_id}-{batches:04d}{FILE_SUFFIX}", partition_items)
+              for partition, partition_items in partitions.items())
+        )
+        failed = await calendar_db.delete_appointments(items, archived=True)
+        counts['archived'] += len(items) - len(failed)
+        counts['failed'] += len(failed)
+        for appointment_id, message in failed.items():
+            # Left in both tiers; the next run archives it again
+            logger.warning(f"{appointment_id} was archived but not deleted: {message}")
+        logger.info(f"Archived {len(items) - len(failed)} appointments to {len(partitions)} files")
+
+    async for appt in calendar_db.iter_all_appointments():
+        counts['scanned'] += 1
+        if not is_archivable(appt, cutoff):
+            continue
+        batch.append(appt)
+        if len(batch) >= ARCHIVE_FILE_ITEMS:
+            await flush()
+    if batch:
+        await flush()
+    return counts
+
+
+async def iter_ledger(store):
+    """
+    LEDGER_FIELDS of every archived appointment, one ledger file at a time
+
+    An item whose delete failed is in the ledger and still in the table,
+    and is in a second ledger file once a later run archives it, so readers
+    should skip IDs they have already seen.
+    """
+    for key in await store.list(LEDGER_ROOT):
+        for entry in decode_partition(await store.get(key)):
+            yield entry
+
+
+async def _read_cold(store, key_name: str, key_value: str, start: datetime, end: datetime) -> List[List[dict]]:
+    """Contents of one owner's cold files in the months [start, end] touches"""
+    prefix = owner_prefix(key_name, key_value)
+    semaphore = asyncio.Semaphore(ARCHIVE_READ_CONCURRENCY)
+
+    # Only the window's month partitions are listed, however long the history
+    async def list_month(month: str) -> List[str]:
+        async with semaphore:
+            return await store.list(f"{prefix}/{month}")
+
+    async def read(key: str) -> List[dict]:
+        async with semaphore:
+            return decode_partition(await store.get(key))
+
+    listings = await asyncio.gather(*(list_month(month) for month in months_between(start, end)))
+    return await asyncio.gather(*(read(key) for keys in listings for key in keys))
+
+
+async def appointment_history(key_name: str, key_value: str, start: datetime, end: datetime,
+                              fields: Optional[str] = None, store=None) -> dict:
+    """
+    A therapist's or patient's appointments starting in [start, end], from both tiers
+
+    Args:
+        key_name: "therapist_id" or "patient_id"
+        key_value: The therapist or patient
+        start, end: Window on start_time (naive means UTC)
+        fields: Attributes to return (see calendar_db.resolve_fields)
+        store: Cold store to read; defaults to the configured one
+
+    Returns:
+        {"items": [...] in start_time order, "archived": number of items from the cold tier}
+    """
+    if start > end:
+        raise ValueError("start must not be after end")
+    projected = calendar_db.resolve_fields(fields)
+    store = store or archive_store
+
+    # The cold files are fetched while the table is being queried
+    cold_read = asyncio.ensure_future(_read_cold(store, key_name, key_value, start, end)) if store else None
+    try:
+        items = {}
+        async for appt in calendar_db.iter_appointments_between(key_name, key_value, start, end, projected):
+            items[appt['appointment_id']] = appt
+        files = await cold_read if cold_read else []
+    finally:
+        if cold_read and not cold_read.done():
+            cold_read.cancel()
+
+    lower, upper = to_timestamp(start), to_timestamp(end)
+    archived = 0
+    for contents in files:
+        for appt in contents:
+            # The table's copy wins over one left behind by an interrupted run
+            if appt.get(key_name) != key_value or appt['appointment_id'] in items:
+                continue
+            if lower <= to_timestamp(appt['start_time']) <= upper:
+                items[appt['appointment_id']] = (
+                    {name: appt[name] for name in projected if name in appt} if projected else appt
+                )
+                archived += 1
+
+    return {
+        "items": sorted(items.values(), key=lambda appt: to_timestamp(appt['start_time'])),
+        "archived": archived,
+    }
+
+
+async def _run(args) -> dict:
+    try:
+        store = get_archive_store(args.url)
+        if store is None:
+            raise SystemExit("Set CALENDAR_ARCHIVE_URL or pass --url")
+        return await archive_appointments(store, args.older_than_days, args.dry_run)
+    finally:
+        await aws_clients.close_async_clients()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old finished appointments to the cold archive")
+    parser.add_argument('--url', default=ARCHIVE_URL, help="archive store (s3://bucket/prefix or a directory)")
+    parser.add_argument('--older-than-days', type=int, default=ARCHIVE_AFTER_DAYS,
+                        help="archive appointments that ended more than this many days ago")
+    parser.add_argument('--dry-run', action='store_true', help="report what would move without writing")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    counts = asyncio.run(_run(args))
+    logger.info(f"Archive run: {counts}")
+
+
+if __name__ == '__main__':
+    main()
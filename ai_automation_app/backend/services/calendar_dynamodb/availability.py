@@ -0,0 +1,169 @@
+"""
+Free-slot search across therapists
+
+A search window is cut into fixed slots (15 minutes by default) and each
+therapist's time is held as a Python int used as a bitmap, one bit per slot:
+
+    free = working_hours & ~booked
+
+Runs of ``k`` consecutive free bits (a session of ``k`` slots) are found
+with O(log k) shift-and-AND operations on the whole bitmap at once, so a
+month of 15-minute slots for dozens of therapists is a handful of big-int
+operations per therapist. Booked time comes from the in-memory interval
+index, so repeat searches do not touch DynamoDB.
+
+Working hours come from CALENDAR_WORKING_HOURS, a JSON object keyed by
+therapist ID (or "default") such as:
+
+    {"default": {"timezone": "America/New_York",
+                 "days": {"mon": [["09:00", "17:00"]], "tue": [["09:00", "12:00"], ["13:00", "17:00"]]}}}
+
+Therapists without an entry use "default", which itself defaults to
+Monday-Friday 09:00-17:00 UTC.
+"""
+
+import asyncio
+import json
+import os
+from datetime import datetime, time, timedelta
+from typing import Dict, List, Tuple
+from zoneinfo import ZoneInfo
+
+from . import calendar_db
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+DEFAULT_WORKING_HOURS = {
+    "timezone": "UTC",
+    "days": {day: [["09:00", "17:00"]] for day in WEEKDAYS[:5]}
+}
+
+
+def _parse_template(template: dict) -> Tuple[ZoneInfo, Dict[int, List[Tuple[time, time]]]]:
+    tz = ZoneInfo(template.get("timezone", "UTC"))
+    days = {
+        WEEKDAYS.index(day): [(time.fromisoformat(start), time.fromisoformat(end)) for start, end in periods]
+        for day, periods in template.get("days", {}).items()
+    }
+    return tz, days
+
+
+def _load_templates() -> dict:
+    configured = json.loads(os.environ.get("CALENDAR_WORKING_HOURS", "{}"))
+    configured.setdefault("default", DEFAULT_WORKING_HOURS)
+    return {therapist_id: _parse_template(template) for therapist_id, template in configured.items()}
+
+
+_templates = _load_templates()
+
+
+def working_hours_for(therapist_id: str):
+    return _templates.get(therapist_id, _templates["default"])
+
+
+def _set_bits(mask: int, first: int, last: int, n_slots: int) -> int:
+    """Set slots [first, last) clipped to the window"""
+    first, last = max(first, 0), min(last, n_slots)
+    if last > first:
+        mask |= ((1 << (last - first)) - 1) << first
+    return mask
+
+
+def working_mask(therapist_id: str, window_start: datetime, n_slots: int, slot_seconds: int) -> int:
+    """Bitmap of slots that fall entirely inside the therapist's working hours"""
+    tz, days = working_hours_for(therapist_id)
+    window_end = window_start + timedelta(seconds=n_slots * slot_seconds)
+    origin = window_start.timestamp()
+    mask = 0
+
+    day = window_start.astimezone(tz).date() - timedelta(days=1)
+    last_day = window_end.astimezone(tz).date()
+    while day <= last_day:
+        for start, end in days.get(day.weekday(), []):
+            period_start = datetime.combine(day, start, tz).timestamp()
+            period_end = datetime.combine(day, end, tz).timestamp()
+            # Round inward: a slot must start and end inside the period
+            first = -int((origin - period_start) // slot_seconds)
+            last = int((period_end - origin) // slot_seconds)
+            mask = _set_bits(mask, first, last, n_slots)
+        day += timedelta(days=1)
+    return mask
+
+
+def booked_mask(intervals, window_start: datetime, n_slots: int, slot_seconds: int) -> int:
+    """Bitmap of slots touched by any booked interval"""
+    origin = window_start.timestamp()
+    mask = 0
+    for start, end, _ in intervals:
+        # Round outward: any overlap makes the slot busy
+        first = int((start - origin) // slot_seconds)
+        last = -int((origin - end) // slot_seconds)
+        mask = _set_bits(mask, first, last, n_slots)
+    return mask
+
+
+def run_starts(free: int, length: int) -> int:
+    """Bitmap of slots that begin ``length`` consecutive free slots"""
+    starts, span = free, 1
+    while span < length:
+        step = min(span, length - span)
+        starts &= starts >> step
+        span += step
+    return starts
+
+
+def _bit_positions(mask: int, limit: int) -> List[int]:
+    positions = []
+    while mask and len(positions) < limit:
+        lowest = mask & -mask
+        positions.append(lowest.bit_length() - 1)
+        mask ^= lowest
+    return positions
+
+
+async def find_free_slots(therapist_ids: List[str], start: datetime, end: datetime,
+                          duration_minutes: int, slot_minutes: int = 15,
+                          tz: str = "UTC", max_slots: int = 20) -> List[dict]:
+    """
+    Free slots long enough for a session, for each therapist
+
+    Args:
+        therapist_ids: Therapists to search
+        start, end: Search window; naive times are read in ``tz``
+        duration_minutes: Session length
+        slot_minutes: Slot size; sessions start on slot boundaries from ``start``
+        tz: Time zone for naive inputs and for the returned times
+        max_slots: Maximum slots returned per therapist
+
+    Returns:
+        One entry per therapist: {"therapist_id", "slots": [{"start", "end"}]}
+    """
+    zone = ZoneInfo(tz)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=zone)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=zone)
+    if end <= start:
+        raise ValueError("end must be after start")
+
+    slot_seconds = slot_minutes * 60
+    n_slots = int((end - start).total_seconds() // slot_seconds)
+    length = -(-duration_minutes // slot_minutes)
+
+    schedules = await asyncio.gather(*(calendar_db.get_therapist_schedule(t) for t in therapist_ids))
+
+    results = []
+    for therapist_id, schedule in zip(therapist_ids, schedules):
+        booked = booked_mask(
+            schedule.overlapping(start.timestamp(), end.timestamp()), start, n_slots, slot_seconds
+        )
+        free = working_mask(therapist_id, start, n_slots, slot_seconds) & ~booked
+        slots = []
+        for position in _bit_positions(run_starts(free, length), max_slots):
+            slot_start = start + timedelta(seconds=position * slot_seconds)
+            slots.append({
+                "start": slot_start.astimezone(zone).isoformat(),
+                "end": (slot_start + timedelta(minutes=duration_minutes)).astimezone(zone).isoformat()
+            })
+        results.append({"therapist_id": therapist_id, "slots": slots})
+    return results
@@ -0,0 +1,334 @@
+"""
+Materialized reporting aggregates maintained from the change feed
+
+For every therapist and day (in the therapist's working-hours time zone,
+see availability.working_hours_for) this keeps the booked minutes, the
+number of booked sessions and a count of appointments per status, so
+utilization, daily session counts and no-show rates are lookups rather
+than full-table scans.
+
+The aggregates subscribe to change_feed.feed and apply each event in
+O(1). Every appointment's last contribution (therapist, day, minutes,
+status) is remembered, so applying an event replaces what that
+appointment counted before; events can repeat or arrive without an old
+image, and status-only events from bulk updates still land in the right
+bucket. Recurring series contribute their occurrences up to
+calendar_db.SERIES_HORIZON_DAYS ahead.
+
+The initial state comes from one scan of both tables plus the cold tier's
+ledger (see archive.iter_ledger), on the first report; events arriving
+during the scan are applied after it (to the previous state if the scan
+fails). Archiving an appointment moves it out of the table but not out of
+the reports: its REMOVE event is flagged ``archived`` and keeps what the
+appointment counted. The feed only carries this process's writes, so the
+state is rebuilt every CALENDAR_AGGREGATES_REFRESH seconds (one hour by
+default) to pick up everyone else's.
+
+Only the very first build makes a report wait. Every rebuild is saved as a
+snapshot to CALENDAR_AGGREGATES_URL (an archive store URL, by default
+CALENDAR_ARCHIVE_URL), so a new process starts from one read of it rather
+than a scan, and later rebuilds run in the background while the current
+figures are served.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from . import archive, calendar_db
+from .availability import working_hours_for
+from .change_feed import ChangeEvent, REMOVE, feed
+from .interval_index import is_blocking, to_timestamp
+from .recurrence import RecurringSeries
+
+logger = logging.getLogger(__name__)
+
+AGGREGATES_REFRESH = float(os.environ.get('CALENDAR_AGGREGATES_REFRESH', '3600'))
+SNAPSHOT_KEY = f"aggregates/snapshot{archive.FILE_SUFFIX}"
+
+# Attributes the rebuild scan reads
+SCAN_FIELDS = ('appointment_id', 'therapist_id', 'start_time', 'end_time', 'status')
+
+# (therapist_id, local day, minutes, status)
+Contribution = Tuple[str, str, float, str]
+
+
+def _contribution(item: dict) -> Optional[Contribution]:
+    if not item.get('therapist_id') or not item.get('start_time'):
+        return None
+    tz, _ = working_hours_for(item['therapist_id'])
+    start = to_timestamp(item['start_time'])
+    end = to_timestamp(item['end_time']) if item.get('end_time') else start
+    day = datetime.fromtimestamp(start, tz).date().isoformat()
+    return item['therapist_id'], day, max(end - start, 0) / 60, item.get('status') or 'scheduled'
+
+
+def working_minutes(therapist_id: str, day: date) -> float:
+    """Minutes inside the therapist's working hours on a local day"""
+    _, days = working_hours_for(therapist_id)
+    return sum(
+        (datetime.combine(day, end) - datetime.combine(day, start)).total_seconds() / 60
+        for start, end in days.get(day.weekday(), [])
+    )
+
+
+def _rate(part: float, whole: float) -> Optional[float]:
+    return round(part / whole, 4) if whole else None
+
+
+def _empty_totals() -> dict:
+    return {"booked_minutes": 0.0, "sessions": 0, "statuses": {}}
+
+
+class CalendarAggregates:
+    """Booked minutes, sessions and status counts per therapist per day"""
+
+    def __init__(self, store=None):
+        self._contributions: Dict[str, Contribution] = {}
+        self._series: Dict[str, Set[str]] = {}  # series_id -> occurrence IDs it contributed
+        self._days: Dict[str, Dict[str, dict]] = {}  # day -> therapist_id -> totals
+        self._pending: Optional[List[ChangeEvent]] = None  # events received during a rebuild
+        self._rebuild_lock = asyncio.Lock()
+        self._refresh: Optional[asyncio.Future] = None  # background rebuild, while one runs
+        self.store = store  # where snapshots are saved, if anywhere
+        self.refreshed_at: Optional[float] = None
+        self.events = 0
+
+    def __call__(self, event: ChangeEvent) -> None:
+        self.apply(event)
+
+    def _add(self, contribution: Contribution, sign: int) -> None:
+        therapist_id, day, minutes, status = contribution
+        totals = self._days.setdefault(day, {}).setdefault(therapist_id, _empty_totals())
+        if is_blocking(status):
+            totals["booked_minutes"] += sign * minutes
+            totals["sessions"] += sign
+        totals["statuses"][status] = totals["statuses"].get(status, 0) + sign
+        if not totals["statuses"][status]:
+            del totals["statuses"][status]
+        if not totals["statuses"]:
+            del self._days[day][therapist_id]
+            if not self._days[day]:
+                del self._days[day]
+
+    def _replace(self, key: str, contribution: Optional[Contribution]) -> None:
+        previous = self._contributions.pop(key, None)
+        if previous:
+            self._add(previous, -1)
+        if contribution:
+            self._contributions[key] = contribution
+            self._add(contribution, 1)
+
+    def _set_series(self, series_id: str, item: Optional[dict]) -> None:
+        for occurrence_id in self._series.pop(series_id, ()):
+            self._replace(occurrence_id, None)
+        if not item:
+            return
+        series = RecurringSeries(item)
+        horizon = datetime.now(timezone.utc) + timedelta(days=calendar_db.SERIES_HORIZON_DAYS)
+        occurrences = series.occurrences(to_timestamp(item['start_time']), horizon.timestamp())
+        for occurrence in occurrences:
+            self._replace(occurrence['appointment_id'], _contribution(occurrence))
+        self._series[series_id] = {occurrence['appointment_id'] for occurrence in occurrences}
+
+    def apply(self, event: ChangeEvent) -> None:
+        """Fold one change into the aggregates, or hold it while a rebuild runs"""
+        self.events += 1
+        if self._pending is not None:
+            self._pending.append(event)
+        else:
+            self._fold(event)
+
+    def _fold(self, event: ChangeEvent) -> None:
+        if event.entity == 'series':
+            self._set_series(event.key, None if event.event_name == REMOVE else event.new_image)
+        elif event.event_name == REMOVE and event.archived:
+            # Still counted, but no longer expected to change
+            self._contributions.pop(event.key, None)
+        elif event.event_name == REMOVE:
+            self._replace(event.key, None)
+        elif event.new_image is not None:
+            self._replace(event.key, _contribution(event.new_image))
+        elif event.changes and 'status' in event.changes:
+            current = self._contributions.get(event.key)
+            if current:
+                self._replace(event.key, current[:3] + (event.changes['status'],))
+
+    async def _swap(self, build) -> bool:
+        """
+        Replace the state with what ``build`` fills a fresh instance with
+
+        Events that arrive meanwhile go onto the new state, or onto the
+        current one if ``build`` fails or returns False (nothing to swap in).
+        """
+        fresh = CalendarAggregates()
+        target = self
+        self._pending = []
+        try:
+            if await build(fresh):
+                target = fresh
+        finally:
+            # No await from here on, so no event can slip between the replay
+            # and the swap
+            pending, self._pending = self._pending, None
+            for event in pending:
+                target._fold(event)
+        if target is fresh:
+            self._contributions, self._series, self._days = fresh._contributions, fresh._series, fresh._days
+        return target is fresh
+
+    async def rebuild(self) -> None:
+        """Recompute everything from a scan of the appointments and series tables and the archive ledger"""
+        async def scan(fresh):
+            async for item in calendar_db.iter_all_appointments(fields=SCAN_FIELDS):
+                fresh._replace(item['appointment_id'], _contribution(item))
+            async for item in calendar_db.iter_all_series():
+                fresh._set_series(item['series_id'], item)
+            if archive.archive_store:
+                # Counted once: the table's copy wins over one an interrupted
+                # archive run left behind, as in appointment_history
+                archived = set()
+                async for entry in archive.iter_ledger(archive.archive_store):
+                    if entry['appointment_id'] in fresh._contributions or entry['appointment_id'] in archived:
+                        continue
+                    archived.add(entry['appointment_id'])
+                    contribution = _contribution(entry)
+                    if contribution:
+                        fresh._add(contribution, 1)
+            return True
+
+        await self._swap(scan)
+        self.refreshed_at = time.time()
+        if self.store:
+            try:
+                await self.store.put(SNAPSHOT_KEY, archive.encode_partition([self.snapshot()]))
+            except Exception as e:
+                logger.error(f"Cannot save the calendar aggregates snapshot: {str(e)}")
+
+    def snapshot(self) -> dict:
+        return {
+            "contributions": self._contributions,
+            "series": {series_id: sorted(occurrences) for series_id, occurrences in self._series.items()},
+            "days": self._days,
+            "refreshed_at": self.refreshed_at,
+        }
+
+    async def load_snapshot(self) -> bool:
+        """Take the state the last rebuild (in any process) saved; False if there is none"""
+        if not self.store:
+            return False
+        refreshed_at = None
+
+        async def load(fresh):
+            nonlocal refreshed_at
+            try:
+                [state] = archive.decode_partition(await self.store.get(SNAPSHOT_KEY))
+            except Exception as e:
+                logger.info(f"No calendar aggregates snapshot to start from: {str(e)}")
+                return False
+            fresh._contributions = {key: tuple(value) for key, value in state["contributions"].items()}
+            fresh._series = {series_id: set(occurrences) for series_id, occurrences in state["series"].items()}
+            fresh._days = state["days"]
+            refreshed_at = state["refreshed_at"]
+            return True
+
+        if not await self._swap(load):
+            return False
+        self.refreshed_at = refreshed_at
+        return True
+
+    async def _rebuild_in_background(self) -> None:
+        try:
+            async with self._rebuild_lock:
+                await self.rebuild()
+        except Exception as e:
+            logger.error(f"Calendar aggregates rebuild failed: {str(e)}")
+
+    async def ensure_fresh(self) -> None:
+        """
+        Have aggregates to report from, refreshing them off the request path
+
+        The first call starts from the saved snapshot, or builds one if there
+        is none; only then does a report wait. Once AGGREGATES_REFRESH has
+        passed, a rebuild is started in the background and the current
+        figures are served until it finishes.
+        """
+        if self.refreshed_at is None:
+            async with self._rebuild_lock:
+                if self.refreshed_at is None and not await self.load_snapshot():
+                    await self.rebuild()
+        stale = time.time() - self.refreshed_at >= AGGREGATES_REFRESH
+        if stale and (self._refresh is None or self._refresh.done()):
+            self._refresh = asyncio.ensure_future(self._rebuild_in_background())
+
+    def therapist_day(self, therapist_id: str, day: date) -> dict:
+        totals = self._days.get(day.isoformat(), {}).get(therapist_id) or _empty_totals()
+        available = working_minutes(therapist_id, day)
+        return {
+            "date": day.isoformat(),
+            "booked_minutes": round(totals["booked_minutes"], 2),
+            "working_minutes": available,
+            "utilization": _rate(totals["booked_minutes"], available),
+            "sessions": totals["sessions"],
+            "statuses": dict(totals["statuses"]),
+        }
+
+    def therapist_report(self, therapist_id: str, start: date, end: date) -> dict:
+        """Per-day figures for [start, end] plus totals, utilization and no-show rate"""
+        days = [self.therapist_day(therapist_id, start + timedelta(days=n)) for n in range((end - start).days + 1)]
+        statuses: Dict[str, int] = {}
+        for day in days:
+            for status, count in day["statuses"].items():
+                statuses[status] = statuses.get(status, 0) + count
+        booked = sum(day["booked_minutes"] for day in days)
+        available = sum(day["working_minutes"] for day in days)
+        attended = statuses.get("completed", 0) + statuses.get("no-show", 0)
+        return {
+            "therapist_id": therapist_id,
+            "timezone": str(working_hours_for(therapist_id)[0]),
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "totals": {
+                "booked_minutes": round(booked, 2),
+                "working_minutes": available,
+                "utilization": _rate(booked, available),
+                "sessions": sum(day["sessions"] for day in days),
+                "statuses": statuses,
+                "no_show_rate": _rate(statuses.get("no-show", 0), attended),
+            },
+            "days": days,
+            "refreshed_at": self.refreshed_at,
+        }
+
+    def day_report(self, day: date) -> dict:
+        """Every therapist with appointments on a day (each in their own time zone)"""
+        therapists = [
+            {"therapist_id": therapist_id, **self.therapist_day(therapist_id, day)}
+            for therapist_id in sorted(self._days.get(day.isoformat(), {}))
+        ]
+        return {
+            "date": day.isoformat(),
+            "sessions": sum(entry["sessions"] for entry in therapists),
+            "booked_minutes": round(sum(entry["booked_minutes"] for entry in therapists), 2),
+            "therapists": therapists,
+            "refreshed_at": self.refreshed_at,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "appointments": len(self._contributions),
+            "series": len(self._series),
+            "days": len(self._days),
+            "events": self.events,
+            "refreshed_at": self.refreshed_at,
+            "feed": feed.stats(),
+        }
+
+
+aggregates = CalendarAggregates(
+    archive.get_archive_store(os.environ.get('CALENDAR_AGGREGATES_URL', archive.ARCHIVE_URL))
+)
+feed.subscribe(aggregates)
@@ -1,59 +1,452 @@
-from fastapi import APIRouter, HTTPException, Body
-from .calendar_schema import Appointment, AppointmentUpdate
+from fastapi import APIRouter, HTTPException, Body, Query, Header, Response, Request, Depends
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from datetime import date, datetime
+from decimal import Decimal
+import json
+import logging
+from .calendar_schema import (
+    Appointment,
+    AppointmentUpdate,
+    AppointmentPage,
+    AppointmentHistory,
+    AppointmentStatusChange,
+    BulkWriteResponse,
+    BatchGetRequest,
+    BatchGetResponse,
+    AvailabilityResponse,
+    CalendarView,
+    AppointmentSeries,
+    OccurrenceOverride
+)
+from .availability import find_free_slots
+from .calendar_view import build_calendar_view
+from .archive import appointment_history
+from .calendar_aggregates import aggregates
+from .ics_feed import build_feed, stream_feed, etag_for, etag_matches
+from .capacity import current_route
 from .calendar_db import (
     create_appointment, 
     get_appointment, 
     list_appointments_by_therapist,
     list_appointments_by_patient,
-    list_all_appointments,
-    update_appointment_status
+    iter_all_appointments,
+    update_appointment_status,
+    bulk_create_appointments,
+    bulk_update_appointment_status,
+    batch_get_appointments,
+    create_series,
+    get_series,
+    list_series_occurrences,
+    override_occurrence,
+    cache_stats,
+    capacity_stats,
+    get_cached_feed,
+    AppointmentConflictError,
+    InvalidStatusTransitionError,
+    resolve_fields,
+    SCAN_SEGMENTS
 )
 
-router = APIRouter(prefix="/calendar", tags=["Calendar"])
+logger = logging.getLogger(__name__)
+
+async def _track_route(request: Request):
+    """Attribute DynamoDB capacity consumed while serving this request to its route"""
+    route = request.scope.get("route")
+    current_route.set(f"{request.method} {route.path if route else request.url.path}")
+
+router = APIRouter(prefix="/calendar", tags=["Calendar"], dependencies=[Depends(_track_route)])
+
+# Upper bound for the limit query parameter on list endpoints
+MAX_PAGE_SIZE = 1000
+# Upper bound for items in one bulk request
+MAX_BULK_ITEMS = 1000
+# Limits for availability searches
+MAX_AVAILABILITY_DAYS = 31
+MAX_AVAILABILITY_THERAPISTS = 100
+# Limits for calendar views; six weeks covers a month grid
+MAX_VIEW_DAYS = 42
+MAX_VIEW_THERAPISTS = 50
+# Longest window for history reads across the table and the archive
+MAX_HISTORY_DAYS = 5 * 366
+# Longest range for a therapist report
+MAX_REPORT_DAYS = 366
+FIELDS_DESCRIPTION = "Comma-separated attributes to return, or 'grid' for IDs, times and status"
+# Upper bound for parallel scan workers on /all
+MAX_SCAN_SEGMENTS = 32
+
+def _json_default(value):
+    # DynamoDB numbers deserialize to Decimal
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def _conflict(e: AppointmentConflictError) -> HTTPException:
+    return HTTPException(status_code=409, detail={
+        "message": "Appointment overlaps existing appointments for this therapist",
+        "conflicting_appointment_ids": e.conflicting_ids
+    })
+
+def _invalid_transition(e: InvalidStatusTransitionError) -> HTTPException:
+    return HTTPException(status_code=409, detail={
+        "message": str(e),
+        "current_status": e.current_status,
+        "requested_status": e.requested_status
+    })
 
 @router.post("/create")
-def schedule(appt: Appointment):
+async def schedule(appt: Appointment):
+    try:
+        return await create_appointment(appt)
+    except AppointmentConflictError as e:
+        raise _conflict(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/series")
+async def schedule_series(series: AppointmentSeries):
+    """Create a recurring series; its occurrences are checked for conflicts but not stored individually"""
+    try:
+        return await create_series(series)
+    except AppointmentConflictError as e:
+        raise _conflict(e)
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/series/{series_id}")
+async def read_series(series_id: str):
+    series = await get_series(series_id)
+    if not series:
+        raise HTTPException(status_code=404, detail="Series not found")
+    return series
+
+@router.get("/series/{series_id}/occurrences")
+async def read_series_occurrences(
+    series_id: str,
+    start: Optional[datetime] = Query(None, description="Defaults to the first occurrence"),
+    end: Optional[datetime] = Query(None, description="Defaults to a year after start")
+):
+    """A series' occurrences in a window, with per-occurrence changes applied"""
+    try:
+        occurrences = await list_series_occurrences(series_id, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if occurrences is None:
+        raise HTTPException(status_code=404, detail="Series not found")
+    return {"items": occurrences}
+
+@router.patch("/series/{series_id}/occurrences/{recurrence_id}")
+async def update_occurrence(series_id: str, recurrence_id: str, override: OccurrenceOverride):
+    """Move, cancel or annotate one occurrence of a series"""
+    try:
+        result = await override_occurrence(series_id, recurrence_id, override.model_dump(exclude_none=True))
+        return {"message": "Occurrence updated", "data": result}
+    except AppointmentConflictError as e:
+        raise _conflict(e)
+    except InvalidStatusTransitionError as e:
+        raise _invalid_transition(e)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/bulk/create", response_model=BulkWriteResponse)
+async def bulk_schedule(appts: List[Appointment] = Body(..., max_length=MAX_BULK_ITEMS)):
+    """Create many appointments in batches of 25; returns a result per appointment"""
+    try:
+        return await bulk_create_appointments(appts)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/bulk/status", response_model=BulkWriteResponse)
+async def bulk_update_status(updates: List[AppointmentStatusChange] = Body(..., max_length=MAX_BULK_ITEMS)):
+    """Change many appointment statuses in transactions of 100; returns a result per update"""
+    try:
+        return await bulk_update_appointment_status([update.model_dump() for update in updates])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/batch-get", response_model=BatchGetResponse, response_model_exclude_unset=True)
+async def batch_get(request: BatchGetRequest):
+    """Resolve many appointment IDs at once; results follow request order and flag missing IDs"""
+    try:
+        return await batch_get_appointments(request.appointment_ids, request.fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Fixed paths are registered before /{appointment_id}, which would otherwise match them
+@router.get("/availability", response_model=AvailabilityResponse)
+async def get_availability(
+    therapist_ids: List[str] = Query(..., max_length=MAX_AVAILABILITY_THERAPISTS),
+    start: datetime = Query(..., description="Window start; naive times are read in timezone"),
+    end: datetime = Query(..., description="Window end"),
+    duration: int = Query(50, ge=5, le=480, description="Session length in minutes"),
+    granularity: int = Query(15, ge=5, le=60, description="Slot size in minutes"),
+    timezone: str = "UTC",
+    max_slots: int = Query(20, ge=1, le=500, description="Slots returned per therapist")
+):
+    """Free slots within working hours, for each requested therapist"""
+    if (end - start).days > MAX_AVAILABILITY_DAYS:
+        raise HTTPException(status_code=400, detail=f"Window cannot exceed {MAX_AVAILABILITY_DAYS} days")
+    try:
+        therapists = await find_free_slots(therapist_ids, start, end, duration, granularity, timezone, max_slots)
+        return {"therapists": therapists}
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/view", response_model=CalendarView, response_model_exclude_unset=True)
+async def get_calendar_view(
+    therapist_ids: List[str] = Query(..., max_length=MAX_VIEW_THERAPISTS),
+    start: datetime = Query(..., description="View start; naive times are read in timezone"),
+    end: datetime = Query(..., description="View end (exclusive)"),
+    timezone: str = "UTC",
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)
+):
+    """Appointments of several therapists for a week or month, grouped into days in timezone with per-day counts"""
+    if (end - start).days > MAX_VIEW_DAYS:
+        raise HTTPException(status_code=400, detail=f"View cannot exceed {MAX_VIEW_DAYS} days")
+    try:
+        return await build_calendar_view(therapist_ids, start, end, timezone, fields)
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Hit, miss and eviction counters for this process's appointment cache"""
+    return cache_stats()
+
+@router.get("/metrics/capacity")
+async def get_capacity_metrics():
+    """DynamoDB read/write capacity units consumed per route and operation by this process"""
+    return capacity_stats()
+
+@router.get("/reports/therapist/{therapist_id}")
+async def get_therapist_report(
+    therapist_id: str,
+    start: date = Query(..., description="First day, in the therapist's working-hours timezone"),
+    end: date = Query(..., description="Last day (inclusive)")
+):
+    """Booked minutes, utilization, sessions and status counts per day, with totals and the no-show rate"""
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if (end - start).days >= MAX_REPORT_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range cannot exceed {MAX_REPORT_DAYS} days")
+    try:
+        await aggregates.ensure_fresh()
+        return aggregates.therapist_report(therapist_id, start, end)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/reports/day/{day}")
+async def get_day_report(day: date):
+    """Sessions and booked minutes on one day for every therapist with appointments"""
+    try:
+        await aggregates.ensure_fresh()
+        return aggregates.day_report(day)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/reports/stats")
+async def get_report_stats():
+    """Size and freshness of the reporting aggregates and change-feed counters"""
+    return aggregates.stats()
+
+@router.get("/all")
+async def get_all_appointments(
+    segments: int = Query(SCAN_SEGMENTS, ge=1, le=MAX_SCAN_SEGMENTS),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)
+):
+    """Stream every appointment as newline-delimited JSON, read with a parallel scan"""
+    try:
+        projected = resolve_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    items = iter_all_appointments(segments, projected)
     try:
-        return create_appointment(appt)
+        # Pull the first item before answering so scan errors still produce a 500
+        first = await items.__anext__()
+    except StopAsyncIteration:
+        first = None
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    async def ndjson():
+        try:
+            if first is not None:
+                yield json.dumps(first, default=_json_default) + "\n"
+            async for item in items:
+                yield json.dumps(item, default=_json_default) + "\n"
+        except Exception as e:
+            # Headers are already sent; end the stream early and log it
+            logger.error(f"Error streaming appointments: {str(e)}")
+        finally:
+            await items.aclose()
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
 @router.get("/{appointment_id}")
-def read_appointment(appointment_id: str):
-    appt = get_appointment(appointment_id)
+async def read_appointment(appointment_id: str):
+    appt = await get_appointment(appointment_id)
     if not appt:
         raise HTTPException(status_code=404, detail="Appointment not found")
     return appt
 
-@router.get("/therapist/{therapist_id}")
-def get_by_therapist(therapist_id: str):
+@router.get("/therapist/{therapist_id}", response_model=AppointmentPage, response_model_exclude_unset=True)
+async def get_by_therapist(
+    therapist_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    start: Optional[datetime] = Query(None, description="Only appointments starting at or after this time"),
+    end: Optional[datetime] = Query(None, description="Only appointments starting at or before this time"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)
+):
+    """
+    One page of a therapist's appointments, sorted by start_time; pass next_cursor back as cursor for the next
+
+    Pages follow each other in start_time order only on the start_time-sorted
+    indexes (CALENDAR_INDEX_SORT_KEY=start_time); see calendar_db._query_index.
+    """
     try:
-        return list_appointments_by_therapist(therapist_id)
+        return await list_appointments_by_therapist(therapist_id, limit, cursor, start, end, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
         
-@router.get("/patient/{patient_id}")
-def get_by_patient(patient_id: str):
+@router.get("/patient/{patient_id}", response_model=AppointmentPage, response_model_exclude_unset=True)
+async def get_by_patient(
+    patient_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    start: Optional[datetime] = Query(None, description="Only appointments starting at or after this time"),
+    end: Optional[datetime] = Query(None, description="Only appointments starting at or before this time"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)
+):
+    """
+    One page of a patient's appointments, sorted by start_time; pass next_cursor back as cursor for the next
+
+    Pages follow each other in start_time order only on the start_time-sorted
+    indexes (CALENDAR_INDEX_SORT_KEY=start_time); see calendar_db._query_index.
+    """
     try:
-        return list_appointments_by_patient(patient_id)
+        return await list_appointments_by_patient(patient_id, limit, cursor, start, end, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
         
-@router.get("/all")
-def get_all_appointments():
+async def _history_response(key_name: str, key_value: str, start: datetime, end: datetime,
+                            fields: Optional[str]):
+    if (end - start).days > MAX_HISTORY_DAYS:
+        raise HTTPException(status_code=400, detail=f"Window cannot exceed {MAX_HISTORY_DAYS} days")
     try:
-        return list_all_appointments()
+        return await appointment_history(key_name, key_value, start, end, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-        
+
+@router.get("/therapist/{therapist_id}/history", response_model=AppointmentHistory, response_model_exclude_unset=True)
+async def get_therapist_history(
+    therapist_id: str,
+    start: datetime = Query(..., description="Only appointments starting at or after this time"),
+    end: datetime = Query(..., description="Only appointments starting at or before this time"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)
+):
+    """A therapist's appointments in a window, including ones moved to the cold archive"""
+    return await _history_response("therapist_id", therapist_id, start, end, fields)
+
+@router.get("/patient/{patient_id}/history", response_model=AppointmentHistory, response_model_exclude_unset=True)
+async def get_patient_history(
+    patient_id: str,
+    start: datetime = Query(..., description="Only appointments starting at or after this time"),
+    end: datetime = Query(..., description="Only appointments starting at or before this time"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)
+):
+    """A patient's appointments in a window, including ones moved to the cold archive"""
+    return await _history_response("patient_id", patient_id, start, end, fields)
+
+ICS_MEDIA_TYPE = "text/calendar; charset=utf-8"
+# Clients must revalidate each poll, which a matching ETag answers with 304
+FEED_HEADERS = {"Cache-Control": "private, no-cache"}
+# Uncached feeds up to this size are rendered whole so they go out with an
+# ETag; only larger ones are streamed (and get their ETag from the next poll)
+FEED_BUFFER_BYTES = 256 * 1024
+
+async def _feed_response(key_name: str, key_value: str, if_none_match: Optional[str]):
+    try:
+        cached = get_cached_feed(key_name, key_value)
+        if cached or if_none_match:
+            # Conditional polls need the ETag before any body is sent
+            body, etag = cached or await build_feed(key_name, key_value)
+            if etag_matches(etag, if_none_match):
+                return Response(status_code=304, headers={"ETag": etag, **FEED_HEADERS})
+            return Response(body, media_type=ICS_MEDIA_TYPE, headers={"ETag": etag, **FEED_HEADERS})
+
+        chunks = stream_feed(key_name, key_value)
+        # Buffer until the feed ends or outgrows FEED_BUFFER_BYTES; query
+        # errors in that part still produce a 500
+        head, size = [], 0
+        async for chunk in chunks:
+            head.append(chunk)
+            size += len(chunk)
+            if size > FEED_BUFFER_BYTES:
+                break
+        else:
+            body = "".join(head)
+            return Response(body, media_type=ICS_MEDIA_TYPE, headers={"ETag": etag_for(body), **FEED_HEADERS})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def ics():
+        try:
+            for chunk in head:
+                yield chunk
+            async for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            logger.error(f"Error streaming calendar feed: {str(e)}")
+        finally:
+            await chunks.aclose()
+
+    return StreamingResponse(ics(), media_type=ICS_MEDIA_TYPE, headers=FEED_HEADERS)
+
+@router.get("/therapist/{therapist_id}/feed.ics")
+async def therapist_feed(therapist_id: str, if_none_match: Optional[str] = Header(None)):
+    """iCalendar subscription feed of a therapist's appointments; supports If-None-Match"""
+    return await _feed_response('therapist_id', therapist_id, if_none_match)
+
+@router.get("/patient/{patient_id}/feed.ics")
+async def patient_feed(patient_id: str, if_none_match: Optional[str] = Header(None)):
+    """iCalendar subscription feed of a patient's appointments; supports If-None-Match"""
+    return await _feed_response('patient_id', patient_id, if_none_match)
+
 @router.patch("/{appointment_id}/status")
-def update_status(appointment_id: str, update: AppointmentUpdate):
+async def update_status(appointment_id: str, update: AppointmentUpdate):
+    """Change an appointment's status in one conditional write; 404 if missing, 409 if the transition is not allowed
+    or a rescheduled cancellation overlaps another appointment"""
     try:
-        appt = get_appointment(appointment_id)
-        if not appt:
-            raise HTTPException(status_code=404, detail="Appointment not found")
-            
-        result = update_appointment_status(appointment_id, update.status)
+        result = await update_appointment_status(appointment_id, update.status)
         return {"message": "Appointment updated", "data": result}
+    except InvalidStatusTransitionError as e:
+        raise _invalid_transition(e)
+    except AppointmentConflictError as e:
+        raise _conflict(e)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
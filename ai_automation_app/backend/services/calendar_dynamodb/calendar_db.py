@@ -1,57 +1,451 @@
 import os
-from datetime import datetime
+import asyncio
+import base64
+import json
+import random
+import time
+from contextlib import AsyncExitStack
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
 import uuid
-import boto3
 import logging
+from zoneinfo import ZoneInfo
+from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
 from botocore.exceptions import ClientError
-from .calendar_schema import Appointment
+from .calendar_schema import Appointment, AppointmentSeries, AppointmentListItem, STATUS_TRANSITIONS
+from .interval_index import IntervalIndex, is_blocking, to_timestamp
+from .appointment_cache import AppointmentCache
+from . import capacity
+from .change_feed import ChangeEvent, INSERT, MODIFY, REMOVE, feed as change_feed
+from .recurrence import RecurringSeries, split_occurrence_id, OVERRIDE_FIELDS
+from utils import aws_clients
 
 # Set up logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize DynamoDB client
-def get_dynamodb_client():
-    """Get the DynamoDB client based on environment"""
-    # Check if we're running in AWS environment or local
-    if 'AWS_EXECUTION_ENV' in os.environ:
-        # Production - use default endpoint
-        return boto3.resource('dynamodb')
-    else:
-        # Local development
-        endpoint_url = os.environ.get('DYNAMODB_ENDPOINT_URL')
-        if endpoint_url:
-            return boto3.resource('dynamodb', endpoint_url=endpoint_url)
-        else:
-            # Default to AWS
-            return boto3.resource('dynamodb')
-
 # Table name from environment or default
 TABLE_NAME = os.environ.get('APPOINTMENTS_TABLE_NAME', 'TherastackAppointments')
 
-def create_appointment(appt: Appointment):
+# GSIs keyed by therapist_id / patient_id. The original indexes are hash-only,
+# so time windows are filtered by default. Once migrate_time_index has built
+# the start_time-sorted indexes, point these at them and set
+# CALENDAR_INDEX_SORT_KEY=start_time to read windows as key ranges.
+THERAPIST_INDEX = os.environ.get('THERAPIST_INDEX_NAME', 'TherapistIndex')
+PATIENT_INDEX = os.environ.get('PATIENT_INDEX_NAME', 'PatientIndex')
+INDEX_SORT_KEY = os.environ.get('CALENDAR_INDEX_SORT_KEY', 'none')
+# Largest UTC offset a stored start_time may carry (see _query_index)
+MAX_UTC_OFFSET = timedelta(hours=14)
+
+# Recurring series live in their own table, with hash-only GSIs on therapist_id/patient_id
+# (created by create_series_table; reads treat a missing table as holding no series).
+# Open-ended series are checked for conflicts, and expanded for listings
+# without an end time, this many days ahead.
+SERIES_TABLE_NAME = os.environ.get('APPOINTMENT_SERIES_TABLE_NAME', 'TherastackAppointmentSeries')
+SERIES_THERAPIST_INDEX = os.environ.get('SERIES_THERAPIST_INDEX_NAME', 'TherapistIndex')
+SERIES_PATIENT_INDEX = os.environ.get('SERIES_PATIENT_INDEX_NAME', 'PatientIndex')
+SERIES_HORIZON_DAYS = int(os.environ.get('CALENDAR_SERIES_HORIZON_DAYS', '365'))
+
+# Attributes a caller may ask for with fields=, and the preset for calendar grids.
+# appointment_id and start_time are always read: pages are keyed and merged on them.
+LIST_FIELDS = frozenset(AppointmentListItem.model_fields)
+GRID_FIELDS = ('appointment_id', 'therapist_id', 'patient_id', 'start_time', 'end_time', 'status')
+REQUIRED_FIELDS = ('appointment_id', 'start_time')
+
+# Parallel scan workers used for full-table reads
+SCAN_SEGMENTS = int(os.environ.get('CALENDAR_SCAN_SEGMENTS', '4'))
+
+# Bulk reads/writes: DynamoDB request size limits, concurrent requests and retries
+BATCH_WRITE_SIZE = 25
+BATCH_GET_SIZE = 100
+TRANSACT_WRITE_SIZE = 100
+BULK_CONCURRENCY = int(os.environ.get('CALENDAR_BULK_CONCURRENCY', '4'))
+BULK_MAX_RETRIES = int(os.environ.get('CALENDAR_BULK_MAX_RETRIES', '5'))
+
+# Booked intervals per therapist for double-booking checks; schedules are
+# reloaded after this many seconds to pick up other processes' writes
+INTERVAL_INDEX_TTL = float(os.environ.get('CALENDAR_INTERVAL_INDEX_TTL', '300'))
+_interval_index = IntervalIndex(ttl=INTERVAL_INDEX_TTL)
+
+# One guard item per therapist (see _book), in its own table keyed by
+# therapist_id (created by create_guard_table). Every booking moves the
+# therapist's guard to its next version in the same transaction, so bookings
+# made by different processes cannot both pass their conflict checks. The
+# guard remembers bookings for GUARD_RECENT_SECONDS, longer than the GSIs
+# take to show them, up to GUARD_RECENT_LIMIT of them to stay well inside
+# the item size limit. Without the table, bookings are only checked within
+# this process.
+GUARD_TABLE_NAME = os.environ.get('SCHEDULE_GUARD_TABLE_NAME', 'TherastackScheduleGuards')
+GUARD_RECENT_SECONDS = int(os.environ.get('CALENDAR_GUARD_RECENT_SECONDS', '300'))
+GUARD_RECENT_LIMIT = int(os.environ.get('CALENDAR_GUARD_RECENT_LIMIT', '1000'))
+GUARD_MAX_RETRIES = int(os.environ.get('CALENDAR_GUARD_MAX_RETRIES', '5'))
+
+# Read-through cache for get_appointment and the listing endpoints; entries
+# are updated on this process's writes and expire after CALENDAR_CACHE_TTL
+# seconds. Either setting at 0 disables it.
+CACHE_MAX_BYTES = int(os.environ.get('CALENDAR_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+CACHE_TTL = float(os.environ.get('CALENDAR_CACHE_TTL', '30'))
+_cache = AppointmentCache(max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL)
+
+# Rendered calendar feeds are cached in the same cache, for longer: they are
+# dropped on this process's writes like the listings they are built from
+FEED_CACHE_TTL = float(os.environ.get('CALENDAR_FEED_CACHE_TTL', '300'))
+
+# STATUS_TRANSITIONS lives in calendar_schema so request models accept
+# exactly the statuses the conditional writes below know about
+
+def allowed_previous_statuses(status: str) -> List[str]:
+    """Statuses an appointment may be in to move to ``status``; ValueError for unknown statuses"""
+    if status not in STATUS_TRANSITIONS:
+        raise ValueError(f"Unknown status: {status}")
+    return sorted({current for current, targets in STATUS_TRANSITIONS.items() if status in targets} | {status})
+
+def plain_previous_statuses(status: str) -> List[str]:
+    """
+    Statuses a plain conditional write may move to ``status`` from
+
+    Taking a cancelled appointment back books its slot again, so those moves
+    are left out here and go through a conflict check instead.
+    """
+    return [current for current in allowed_previous_statuses(status)
+            if is_blocking(current) or not is_blocking(status)]
+
+def _status_condition(status: str, previous: List[str]):
+    """ConditionExpression requiring the item to exist and be in one of ``previous``, plus its values"""
+    values = {f':from{i}': {'S': value} for i, value in enumerate(previous)}
+    condition = f"#status IN ({', '.join(values)})"
+    if 'scheduled' in previous:
+        condition = f"(attribute_not_exists(#status) OR {condition})"
+    return f"attribute_exists(appointment_id) AND {condition}", values
+
+class InvalidStatusTransitionError(Exception):
+    """The appointment's current status does not allow the requested one"""
+
+    def __init__(self, current_status, requested_status):
+        super().__init__(f"Cannot change status from {current_status} to {requested_status}")
+        self.current_status = current_status
+        self.requested_status = requested_status
+
+class AppointmentConflictError(Exception):
+    """The requested time overlaps the therapist's existing appointments"""
+
+    def __init__(self, conflicting_ids):
+        super().__init__(f"Conflicts with appointments: {', '.join(conflicting_ids)}")
+        self.conflicting_ids = conflicting_ids
+
+# Marks bulk status changes that take a cancelled appointment back
+REACTIVATE = "reactivate"
+
+# The async client speaks DynamoDB's typed JSON ({"S": "..."}), so items are
+# converted on the way in and out
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+def serialize_item(item: dict) -> dict:
+    """Convert a plain dict to a DynamoDB attribute map"""
+    return {key: _serializer.serialize(value) for key, value in item.items()}
+
+def deserialize_item(item: dict) -> dict:
+    """Convert a DynamoDB attribute map to a plain dict"""
+    return {key: _deserializer.deserialize(value) for key, value in item.items()}
+
+def format_time(value: datetime) -> str:
+    """Canonical stored form of start_time/end_time: UTC without an offset, so strings sort chronologically"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat()
+
+def encode_cursor(last_evaluated_key: Optional[dict]) -> Optional[str]:
+    """Turn a LastEvaluatedKey into an opaque, URL-safe page cursor"""
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, separators=(',', ':'), sort_keys=True)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: Optional[str]) -> Optional[dict]:
+    """Turn a page cursor back into an ExclusiveStartKey"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, dict) or 'appointment_id' not in key:
+        raise ValueError("Invalid cursor")
+    return key
+
+# DynamoDB access goes through the shared client registry
+async def get_dynamodb_client():
+    """Get the pooled aiobotocore DynamoDB client (DYNAMODB_ENDPOINT_URL overrides the endpoint locally)"""
+    client = await aws_clients.get_async_client('dynamodb')
+    # Every call reports its consumed capacity to capacity.metrics
+    capacity.instrument(client)
+    return client
+
+def _list_tags(item: dict):
+    """Cache tags of the listings an appointment or series appears in"""
+    return (f"therapist:{item.get('therapist_id')}", f"patient:{item.get('patient_id')}")
+
+def _item_tag(appointment_id: str) -> str:
+    """Tag whose generation moves on every write to one appointment"""
+    return f"appointment:{appointment_id}"
+
+def _item_changed(appointment_id: str) -> None:
+    """Drop a cached appointment and tell in-flight reads of it not to cache what they read"""
+    _cache.invalidate(('appointment', appointment_id))
+    _cache.invalidate_tags(_item_tag(appointment_id))
+
+def _cache_written(item: dict) -> None:
+    """Write-through for a stored appointment: cache the item, drop the listings it appears in"""
+    _cache.invalidate_tags(_item_tag(item['appointment_id']))
+    previous = _cache.peek(('appointment', item['appointment_id']))
+    if previous:
+        # The appointment may have moved to another therapist or patient
+        _cache.invalidate_tags(*_list_tags(previous))
+    _cache.put(('appointment', item['appointment_id']), item)
+    _cache.invalidate_tags(*_list_tags(item))
+
+def _publish(event_name: str, entity: str, key: str, **images) -> None:
+    """Announce a successful write on the change feed"""
+    change_feed.publish(ChangeEvent(event_name, entity, key, **images))
+
+def capacity_stats() -> dict:
+    """Consumed read/write units per route and DynamoDB operation"""
+    return capacity.metrics.snapshot()
+
+def cache_stats() -> dict:
+    """Hit/miss/eviction counters and size of the appointment cache"""
+    return _cache.stats()
+
+def build_appointment_item(appt: Appointment) -> dict:
+    """Plain dict stored for an appointment"""
+    item = appt.model_dump()
+
+    # Generate ID if not provided
+    if not item.get('appointment_id'):
+        item['appointment_id'] = f"appt-{uuid.uuid4().hex[:8]}"
+
+    # Convert datetime to string
+    if isinstance(item['start_time'], datetime):
+        item['start_time'] = format_time(appt.start_time)
+
+    if isinstance(item['end_time'], datetime):
+        item['end_time'] = format_time(appt.end_time)
+
+    return item
+
+async def get_therapist_schedule(therapist_id: str):
+    """
+    The therapist's interval schedule, read from the TherapistIndex if not loaded
+
+    A new load also applies the bookings its guard recalls, which the GSIs
+    may not show yet.
+    """
+    schedule = _interval_index.get(therapist_id)
+    if schedule is not None:
+        return schedule
+
+    client = await get_dynamodb_client()
+    # Read first, so the schedule covers at least the bookings up to its version
+    guard = await _read_guard(client, therapist_id)
+    series_items = asyncio.ensure_future(_query_series('therapist_id', therapist_id))
+    params = {
+        'TableName': TABLE_NAME,
+        'IndexName': THERAPIST_INDEX,
+        'KeyConditionExpression': '#pk = :pk',
+        'ProjectionExpression': 'appointment_id, therapist_id, start_time, end_time, #status',
+        'ExpressionAttributeNames': {'#pk': 'therapist_id', '#status': 'status'},
+        'ExpressionAttributeValues': {':pk': {'S': therapist_id}}
+    }
+    appointments = []
+    try:
+        while True:
+            response = await client.query(**params)
+            appointments.extend(deserialize_item(item) for item in response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                break
+            params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    except BaseException:
+        series_items.cancel()
+        raise
+    series = [RecurringSeries(item) for item in await series_items]
+    schedule = _interval_index.load(therapist_id, appointments, series)
+    if guard is not None:
+        await _catch_up(client, therapist_id, guard['recent'])
+        schedule.guard_version = guard['version']
+    return schedule
+
+# SCHEDULE GUARD
+
+_guard_table_warned = False
+
+async def _read_guard(client, therapist_id: str) -> Optional[dict]:
+    """
+    The therapist's guard: {"version", "recent"}, version 0 if never booked
+
+    ``recent`` lists the bookings of the last GUARD_RECENT_SECONDS as
+    {"kind": "appointment" or "series", "id", "version", "at"}. Returns None
+    if the guard table does not exist (logged once).
+    """
+    global _guard_table_warned
+    try:
+        response = await client.get_item(
+            TableName=GUARD_TABLE_NAME,
+            Key={'therapist_id': {'S': therapist_id}},
+            ConsistentRead=True
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ResourceNotFoundException':
+            raise
+        if not _guard_table_warned:
+            _guard_table_warned = True
+            logger.error(f"{GUARD_TABLE_NAME} does not exist; bookings are only checked within this process")
+        return None
+    item = deserialize_item(response['Item']) if response.get('Item') else {}
+    recent = [dict(entry, version=int(entry['version']), at=int(entry['at'])) for entry in item.get('recent', [])]
+    return {'version': int(item.get('version', 0)), 'recent': recent}
+
+async def _catch_up(client, therapist_id: str, entries: List[dict]) -> None:
+    """Apply bookings from the guard, read consistently since the GSIs may not show them yet"""
+    async def apply(kind: str, key: str):
+        if kind == 'series':
+            response = await client.get_item(TableName=SERIES_TABLE_NAME, Key={'series_id': {'S': key}},
+                                             ConsistentRead=True)
+            if response.get('Item'):
+                _interval_index.record_series(RecurringSeries(deserialize_item(response['Item'])))
+            else:
+                schedule = _interval_index.get(therapist_id)
+                if schedule is not None:
+                    schedule.remove_series(key)
+        else:
+            response = await client.get_item(TableName=TABLE_NAME, Key={'appointment_id': {'S': key}},
+                                             ConsistentRead=True)
+            if response.get('Item'):
+                _interval_index.record(deserialize_item(response['Item']))
+            else:
+                _interval_index.discard(key)
+
+    await asyncio.gather(*(apply(kind, key) for kind, key in {(entry['kind'], entry['id']) for entry in entries}))
+
+async def _sync_schedule(client, therapist_id: str):
+    """The therapist's schedule caught up with every booking its guard has seen, and the guard"""
+    for reloaded in (False, True):
+        schedule = await get_therapist_schedule(therapist_id)
+        guard = await _read_guard(client, therapist_id)
+        if guard is None or schedule.guard_version == guard['version']:
+            return schedule, guard
+        known = schedule.guard_version
+        missed = [entry for entry in guard['recent'] if known is not None and entry['version'] > known]
+        covered = (known is not None and known < guard['version']
+                   and len({entry['version'] for entry in missed}) == guard['version'] - known)
+        if covered or reloaded:
+            # After a reload, anything still missed is among the recent bookings
+            await _catch_up(client, therapist_id, missed if covered else guard['recent'])
+            schedule.guard_version = guard['version']
+            return schedule, guard
+        # The guard has forgotten some of what this schedule missed
+        _interval_index.invalidate(therapist_id)
+
+def _guard_update(therapist_id: str, guard: dict, booked: List[Tuple[str, str]]) -> dict:
+    """TransactWriteItems operation moving a guard on by one version, if no one else has"""
+    now = int(time.time())
+    version = guard['version'] + 1
+    recent = [entry for entry in guard['recent'] if entry['at'] >= now - GUARD_RECENT_SECONDS]
+    recent += [{'kind': kind, 'id': key, 'version': version, 'at': now} for kind, key in booked]
+    recent = recent[-GUARD_RECENT_LIMIT:]
+    condition = 'attribute_not_exists(#version)' if guard['version'] == 0 else '#version = :version'
+    return {
+        'Update': {
+            'TableName': GUARD_TABLE_NAME,
+            'Key': {'therapist_id': {'S': therapist_id}},
+            'UpdateExpression': 'SET #version = :next, #recent = :recent',
+            'ConditionExpression': condition,
+            'ExpressionAttributeNames': {'#version': 'version', '#recent': 'recent'},
+            'ExpressionAttributeValues': {
+                ':next': {'N': str(version)},
+                ':recent': _serializer.serialize(recent),
+                **({':version': {'N': str(guard['version'])}} if guard['version'] else {})
+            }
+        }
+    }
+
+async def _book(client, therapist_id: str, prepare) -> None:
+    """
+    Check and write a booking so that no other process can book the slot in between
+
+    ``prepare(schedule)`` checks the booking against the therapist's caught-up
+    schedule (raising AppointmentConflictError) and returns its
+    TransactWriteItems operations and (kind, id) pairs for the guard. They
+    are written together with the guard's move to its next version, on
+    condition that no other process moved it since the schedule caught up;
+    if one did, the schedule catches up and the check runs again. A failed
+    condition on the booking's own operations raises the ClientError a
+    single write would (ConditionalCheckFailedException, with the item).
+    """
+    for attempt in range(GUARD_MAX_RETRIES + 1):
+        schedule, guard = await _sync_schedule(client, therapist_id)
+        writes, booked = prepare(schedule)
+        if not writes:
+            return
+        operations = writes + ([_guard_update(therapist_id, guard, booked)] if guard else [])
+        try:
+            await client.transact_write_items(TransactItems=operations)
+        except ClientError as e:
+            reasons = e.response.get('CancellationReasons', [])
+            if e.response['Error']['Code'] != 'TransactionCanceledException' or len(reasons) != len(operations):
+                raise
+            for reason in reasons[:len(writes)]:
+                if reason.get('Code') == 'ConditionalCheckFailed':
+                    error = {'Error': {'Code': 'ConditionalCheckFailedException',
+                                       'Message': reason.get('Message') or 'The conditional request failed'}}
+                    if reason.get('Item'):
+                        error['Item'] = reason['Item']
+                    raise ClientError(error, 'TransactWriteItems')
+            # Another process booked (or a write conflicted): check again
+            if attempt == GUARD_MAX_RETRIES:
+                raise
+            await _backoff(attempt)
+            continue
+        if guard:
+            schedule.guard_version = guard['version'] + 1
+        return
+
+async def find_conflicts(therapist_id: str, start_time, end_time, exclude_id: Optional[str] = None) -> List[str]:
+    """IDs of the therapist's active appointments overlapping [start_time, end_time)"""
+    schedule = await get_therapist_schedule(therapist_id)
+    return schedule.conflicts(to_timestamp(start_time), to_timestamp(end_time), exclude_id)
+
+async def create_appointment(appt: Appointment):
     """Create a new appointment"""
     try:
-        dynamodb = get_dynamodb_client()
-        table = dynamodb.Table(TABLE_NAME)
-        
-        item = appt.model_dump()
-        
-        # Generate ID if not provided
-        if not item.get('appointment_id'):
-            item['appointment_id'] = f"appt-{uuid.uuid4().hex[:8]}"
-            
-        # Convert datetime to string
-        if isinstance(item['start_time'], datetime):
-            item['start_time'] = appt.start_time.isoformat()
-            
-        if isinstance(item['end_time'], datetime):
-            item['end_time'] = appt.end_time.isoformat()
-            
-        # Put item in DynamoDB
-        table.put_item(Item=item)
-        
+        client = await get_dynamodb_client()
+
+        item = build_appointment_item(appt)
+
+        def prepare(schedule):
+            conflicts = schedule.conflicts(
+                to_timestamp(item['start_time']), to_timestamp(item['end_time']), item['appointment_id']
+            )
+            if conflicts:
+                raise AppointmentConflictError(conflicts)
+            put = {'Put': {'TableName': TABLE_NAME, 'Item': serialize_item(item)}}
+            return [put], [('appointment', item['appointment_id'])]
+
+        # Check and write under the therapist's lock so two bookings in this
+        # process cannot race, and under the guard so no other process can
+        async with _interval_index.lock(item['therapist_id']):
+            if is_blocking(item.get('status')):
+                await _book(client, item['therapist_id'], prepare)
+            else:
+                await client.put_item(TableName=TABLE_NAME, Item=serialize_item(item))
+            _interval_index.record(item)
+            _cache_written(item)
+            _publish(INSERT, 'appointment', item['appointment_id'], new_image=item)
+
         return {"message": "Appointment created", "appointment_id": item['appointment_id']}
+    except AppointmentConflictError:
+        raise
     except ClientError as e:
         logger.error(f"DynamoDB error: {e.response['Error']['Message']}")
         raise Exception(f"Error creating appointment: {e.response['Error']['Message']}")
@@ -59,17 +453,31 @@ def create_appointment(appt: Appointment):
         logger.error(f"Error: {str(e)}")
         raise Exception(f"Error creating appointment: {str(e)}")
 
-def get_appointment(appointment_id: str):
-    """Get an appointment by ID"""
+async def get_appointment(appointment_id: str):
+    """Get an appointment by ID; series occurrence IDs are expanded from their series"""
+    occurrence = split_occurrence_id(appointment_id)
+    if occurrence:
+        return await get_occurrence(*occurrence)
+    cached = _cache.get(('appointment', appointment_id))
+    if cached is not None:
+        return cached
+    # A write landing during the read must not be hidden behind what was read
+    generation = _cache.generation(_item_tag(appointment_id))
     try:
-        dynamodb = get_dynamodb_client()
-        table = dynamodb.Table(TABLE_NAME)
-        
-        response = table.get_item(
-            Key={'appointment_id': appointment_id}
+        client = await get_dynamodb_client()
+
+        response = await client.get_item(
+            TableName=TABLE_NAME,
+            Key={'appointment_id': {'S': appointment_id}}
         )
-        
-        return response.get('Item')
+
+        item = response.get('Item')
+        if not item:
+            return None
+        appt = deserialize_item(item)
+        if _cache.generation(_item_tag(appointment_id)) == generation:
+            _cache.put(('appointment', appointment_id), appt)
+        return appt
     except ClientError as e:
         logger.error(f"DynamoDB error: {e.response['Error']['Message']}")
         raise Exception(f"Error retrieving appointment: {e.response['Error']['Message']}")
@@ -77,19 +485,135 @@ def get_appointment(appointment_id: str):
         logger.error(f"Error: {str(e)}")
         raise Exception(f"Error retrieving appointment: {str(e)}")
 
-def list_appointments_by_therapist(therapist_id: str):
-    """List appointments by therapist ID using GSI"""
-    try:
-        dynamodb = get_dynamodb_client()
-        table = dynamodb.Table(TABLE_NAME)
-        
-        # Query using GSI
-        response = table.query(
-            IndexName='TherapistIndex',
-            KeyConditionExpression=boto3.dynamodb.conditions.Key('therapist_id').eq(therapist_id)
+def resolve_fields(fields: Optional[str]) -> Optional[tuple]:
+    """
+    Parse a comma-separated fields= value into the attributes to read
+
+    "grid" selects GRID_FIELDS. None or empty means every attribute.
+    Raises ValueError for unknown attributes.
+    """
+    if not fields:
+        return None
+    names = []
+    for name in fields.split(','):
+        name = name.strip()
+        if name == 'grid':
+            names.extend(GRID_FIELDS)
+        elif name:
+            if name not in LIST_FIELDS:
+                raise ValueError(f"Unknown field: {name}")
+            names.append(name)
+    return tuple(dict.fromkeys(REQUIRED_FIELDS + tuple(names)))
+
+def _projection(fields: Optional[tuple]) -> dict:
+    """ProjectionExpression parameters for the given attributes (placeholders avoid reserved words)"""
+    if not fields:
+        return {}
+    return {
+        'ProjectionExpression': ', '.join(f'#f{i}' for i in range(len(fields))),
+        'ExpressionAttributeNames': {f'#f{i}': name for i, name in enumerate(fields)}
+    }
+
+def _project(item: dict, fields: Optional[tuple]) -> dict:
+    return {name: item[name] for name in fields if name in item} if fields else item
+
+def _time_window_condition(start: Optional[datetime], end: Optional[datetime]):
+    """Condition on start_time for a window, plus its expression values"""
+    if start and end:
+        if start > end:
+            raise ValueError("start must not be after end")
+        return '#sk BETWEEN :start AND :end', {':start': {'S': format_time(start)}, ':end': {'S': format_time(end)}}
+    if start:
+        return '#sk >= :start', {':start': {'S': format_time(start)}}
+    return '#sk <= :end', {':end': {'S': format_time(end)}}
+
+async def _query_index(index_name: str, key_name: str, key_value: str,
+                       limit: Optional[int] = None, cursor: Optional[str] = None,
+                       start: Optional[datetime] = None, end: Optional[datetime] = None,
+                       fields: Optional[tuple] = None):
+    """
+    Query one page of a GSI, returning the items and the cursor for the next page
+
+    On start_time-sorted indexes pages are key ranges and follow each other
+    in start_time order. On hash-only indexes (the default) DynamoDB returns
+    items in no particular order, so each page is sorted by start_time but
+    pages are not ordered relative to each other, and the window is a
+    filter. Items written before start_time was stored canonically (see
+    format_time and migrate_time_index) may carry an offset, so the filter
+    is widened by MAX_UTC_OFFSET and the exact window is applied to the
+    parsed times here.
+    """
+    projection = _projection(fields)
+    params = {
+        'TableName': TABLE_NAME,
+        'IndexName': index_name,
+        'KeyConditionExpression': '#pk = :pk',
+        'ExpressionAttributeNames': {'#pk': key_name, **projection.pop('ExpressionAttributeNames', {})},
+        'ExpressionAttributeValues': {':pk': {'S': key_value}},
+        **projection
+    }
+    sorted_index = INDEX_SORT_KEY == 'start_time'
+    if start or end:
+        # Only appointments starting inside the window are read
+        condition, values = _time_window_condition(start, end)
+        params['ExpressionAttributeNames']['#sk'] = 'start_time'
+        if sorted_index:
+            params['KeyConditionExpression'] += ' AND ' + condition
+        else:
+            # Hash-only index: still reads the whole history
+            condition, values = _time_window_condition(start and start - MAX_UTC_OFFSET, end and end + MAX_UTC_OFFSET)
+            params['FilterExpression'] = condition
+        params['ExpressionAttributeValues'].update(values)
+    if limit:
+        params['Limit'] = limit
+    start_key = decode_cursor(cursor)
+    if start_key:
+        params['ExclusiveStartKey'] = start_key
+
+    client = await get_dynamodb_client()
+    response = await client.query(**params)
+
+    items = [deserialize_item(item) for item in response.get('Items', [])]
+    if not sorted_index:
+        lower = to_timestamp(start) if start else float('-inf')
+        upper = to_timestamp(end) if end else float('inf')
+        items = sorted(
+            (item for item in items if lower <= to_timestamp(item['start_time']) <= upper),
+            key=lambda item: to_timestamp(item['start_time'])
         )
-        
-        return response.get('Items', [])
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(response.get('LastEvaluatedKey'))
+    }
+
+async def list_appointments_by_therapist(therapist_id: str, limit: Optional[int] = None,
+                                         cursor: Optional[str] = None,
+                                         start: Optional[datetime] = None,
+                                         end: Optional[datetime] = None,
+                                         fields: Optional[str] = None):
+    """
+    List one page of a therapist's appointments using GSI, optionally within a start_time window
+
+    When a window is given, occurrences of the therapist's recurring series that
+    start inside it are merged in (see _merge_occurrences). ``fields`` limits
+    the attributes read (see resolve_fields).
+    """
+    try:
+        projected = resolve_fields(fields)
+        key = ('therapist', therapist_id, limit, cursor, start, end, projected)
+        cached = _cache.get(key)
+        if cached is not None:
+            return cached
+        tags = (f"therapist:{therapist_id}", "list")
+        generation = _cache.generation(*tags)
+        page = await _query_index(THERAPIST_INDEX, 'therapist_id', therapist_id, limit, cursor, start, end, projected)
+        if start or end:
+            page = await _merge_occurrences(page, 'therapist_id', therapist_id, cursor, start, end, projected)
+        if _cache.generation(*tags) == generation:
+            _cache.put(key, page, tags=tags)
+        return page
+    except ValueError:
+        raise
     except ClientError as e:
         logger.error(f"DynamoDB error: {e.response['Error']['Message']}")
         raise Exception(f"Error listing appointments: {e.response['Error']['Message']}")
@@ -97,71 +621,967 @@ def list_appointments_by_therapist(therapist_id: str):
         logger.error(f"Error: {str(e)}")
         raise Exception(f"Error listing appointments: {str(e)}")
 
-def list_appointments_by_patient(patient_id: str):
-    """List appointments by patient ID using GSI"""
+async def list_appointments_by_patient(patient_id: str, limit: Optional[int] = None,
+                                       cursor: Optional[str] = None,
+                                       start: Optional[datetime] = None,
+                                       end: Optional[datetime] = None,
+                                       fields: Optional[str] = None):
+    """
+    List one page of a patient's appointments using GSI, optionally within a start_time window
+
+    When a window is given, occurrences of the patient's recurring series that
+    start inside it are merged in (see _merge_occurrences). ``fields`` limits
+    the attributes read (see resolve_fields).
+    """
     try:
-        dynamodb = get_dynamodb_client()
-        table = dynamodb.Table(TABLE_NAME)
-        
-        # Query using GSI
-        response = table.query(
-            IndexName='PatientIndex',
-            KeyConditionExpression=boto3.dynamodb.conditions.Key('patient_id').eq(patient_id)
-        )
-        
-        return response.get('Items', [])
+        projected = resolve_fields(fields)
+        key = ('patient', patient_id, limit, cursor, start, end, projected)
+        cached = _cache.get(key)
+        if cached is not None:
+            return cached
+        tags = (f"patient:{patient_id}", "list")
+        generation = _cache.generation(*tags)
+        page = await _query_index(PATIENT_INDEX, 'patient_id', patient_id, limit, cursor, start, end, projected)
+        if start or end:
+            page = await _merge_occurrences(page, 'patient_id', patient_id, cursor, start, end, projected)
+        if _cache.generation(*tags) == generation:
+            _cache.put(key, page, tags=tags)
+        return page
+    except ValueError:
+        raise
     except ClientError as e:
         logger.error(f"DynamoDB error: {e.response['Error']['Message']}")
         raise Exception(f"Error listing appointments: {e.response['Error']['Message']}")
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise Exception(f"Error listing appointments: {str(e)}")
-        
-def list_all_appointments():
+
+async def iter_appointments_between(key_name: str, key_value: str, start: datetime, end: datetime,
+                                    fields: Optional[tuple] = None):
+    """
+    Yield every appointment of one therapist or patient starting in [start, end]
+
+    Stored appointments are read a page at a time, followed by the
+    occurrences of their recurring series; no overall order is guaranteed.
+    ``fields`` is a resolved projection (see resolve_fields).
+    """
+    index_name = THERAPIST_INDEX if key_name == 'therapist_id' else PATIENT_INDEX
+    cursor = None
+    while True:
+        page = await _query_index(index_name, key_name, key_value, None, cursor, start, end, fields)
+        for item in page['items']:
+            yield item
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+
+    lower, upper = to_timestamp(start), to_timestamp(end)
+    for item in await _query_series(key_name, key_value):
+        for occurrence in RecurringSeries(item).occurrences(lower, upper):
+            if to_timestamp(occurrence['start_time']) >= lower:
+                yield _project(occurrence, fields)
+
+def feed_generation(key_name: str, key_value: str):
+    """Token that changes whenever this process invalidates the owner's listings"""
+    return _cache.generation(f"{key_name.split('_')[0]}:{key_value}", "list")
+
+def get_cached_feed(key_name: str, key_value: str):
+    """(body, etag) of a cached feed, or None"""
+    return _cache.get(('feed', key_name, key_value))
+
+def cache_feed(key_name: str, key_value: str, body: str, etag: str, generation) -> None:
+    """Cache a rendered feed unless the owner's appointments changed while it was rendered"""
+    if feed_generation(key_name, key_value) != generation:
+        return
+    tag = f"{key_name.split('_')[0]}:{key_value}"
+    _cache.put(('feed', key_name, key_value), (body, etag), tags=(tag, "list"), ttl=FEED_CACHE_TTL)
+
+async def iter_all_appointments(total_segments: int = SCAN_SEGMENTS, fields: Optional[tuple] = None):
+    """
+    Yield every appointment using a parallel segmented scan
+
+    Each of the ``total_segments`` workers pages through its own Segment and
+    hands pages over through a queue, holding at most ``total_segments``
+    pages in memory however large the table is. Items arrive in no
+    particular order.
+    """
+    client = await get_dynamodb_client()
+    pages = asyncio.Queue()
+    # Bounds the buffered pages; end-of-segment markers and errors bypass it
+    # so a worker can always report without waiting on the consumer
+    slots = asyncio.Semaphore(total_segments)
+    finished = object()
+
+    async def scan_segment(segment: int):
+        params = {
+            'TableName': TABLE_NAME,
+            'Segment': segment,
+            'TotalSegments': total_segments,
+            **_projection(fields)
+        }
+        try:
+            while True:
+                response = await client.scan(**params)
+                await slots.acquire()
+                pages.put_nowait(response.get('Items', []))
+                if 'LastEvaluatedKey' not in response:
+                    break
+                params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        except Exception as e:
+            pages.put_nowait(e)
+        else:
+            pages.put_nowait(finished)
+
+    workers = [asyncio.create_task(scan_segment(segment)) for segment in range(total_segments)]
+    try:
+        running = total_segments
+        while running:
+            page = await pages.get()
+            if page is finished:
+                running -= 1
+            elif isinstance(page, Exception):
+                raise page
+            else:
+                slots.release()
+                for item in page:
+                    yield deserialize_item(item)
+    finally:
+        # Stop the other segments if the consumer goes away or a segment fails;
+        # a cancelled worker exits without touching the queue
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        while not pages.empty():
+            pages.get_nowait()
+
+async def list_all_appointments():
     """List all appointments - use with caution in production"""
     try:
-        dynamodb = get_dynamodb_client()
-        table = dynamodb.Table(TABLE_NAME)
-        
-        response = table.scan()
-        data = response.get('Items', [])
-        
-        # Handle pagination for large datasets
-        while 'LastEvaluatedKey' in response:
-            response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
-            data.extend(response.get('Items', []))
-            
-        return data
+        return [item async for item in iter_all_appointments()]
     except ClientError as e:
         logger.error(f"DynamoDB error: {e.response['Error']['Message']}")
         raise Exception(f"Error listing appointments: {e.response['Error']['Message']}")
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise Exception(f"Error listing appointments: {str(e)}")
-        
-def update_appointment_status(appointment_id: str, status: str):
-    """Update appointment status"""
-    try:
-        dynamodb = get_dynamodb_client()
-        table = dynamodb.Table(TABLE_NAME)
-        
-        # Update the item
-        response = table.update_item(
-            Key={'appointment_id': appointment_id},
-            UpdateExpression="set #status = :s",
-            ExpressionAttributeNames={
-                '#status': 'status'
-            },
-            ExpressionAttributeValues={
-                ':s': status
-            },
-            ReturnValues="UPDATED_NEW"
+
+def _reactivates(current: dict, status: str) -> bool:
+    """Whether moving ``current`` to ``status`` takes a freed slot back"""
+    return (current.get('status') in allowed_previous_statuses(status)
+            and current.get('status') not in plain_previous_statuses(status))
+
+async def _write_status(client, appointment_id: str, status: str, previous: List[str]) -> dict:
+    """Set the status if the current one is in ``previous``; ClientError otherwise"""
+    condition, values = _status_condition(status, previous)
+    response = await client.update_item(
+        TableName=TABLE_NAME,
+        Key={'appointment_id': {'S': appointment_id}},
+        UpdateExpression="set #status = :s",
+        ConditionExpression=condition,
+        ExpressionAttributeNames={
+            '#status': 'status'
+        },
+        ExpressionAttributeValues={
+            ':s': {'S': status},
+            **values
+        },
+        ReturnValues="ALL_NEW",
+        ReturnValuesOnConditionCheckFailure="ALL_OLD"
+    )
+    return _status_written(deserialize_item(response['Attributes']))
+
+def _status_written(item: dict) -> dict:
+    _interval_index.status_changed(item['appointment_id'], item['status'])
+    _cache_written(item)
+    _publish(MODIFY, 'appointment', item['appointment_id'], new_image=item)
+    return item
+
+async def _reactivate(client, current: dict, status: str) -> dict:
+    """Move a cancelled appointment back into the schedule, checked like a new booking"""
+    def prepare(schedule):
+        conflicts = schedule.conflicts(
+            to_timestamp(current['start_time']), to_timestamp(current['end_time']), current['appointment_id']
         )
-        
-        return response.get('Attributes', {"status": status})
+        if conflicts:
+            raise AppointmentConflictError(conflicts)
+        # Only from the status that was checked, in case it changed meanwhile
+        condition, values = _status_condition(status, [current['status']])
+        return [{
+            'Update': {
+                'TableName': TABLE_NAME,
+                'Key': {'appointment_id': {'S': current['appointment_id']}},
+                'UpdateExpression': "set #status = :s",
+                'ConditionExpression': condition,
+                'ExpressionAttributeNames': {'#status': 'status'},
+                'ExpressionAttributeValues': {':s': {'S': status}, **values},
+                'ReturnValuesOnConditionCheckFailure': "ALL_OLD"
+            }
+        }], [('appointment', current['appointment_id'])]
+
+    async with _interval_index.lock(current['therapist_id']):
+        await _book(client, current['therapist_id'], prepare)
+        # The condition held, so nothing but the status changed
+        return _status_written(dict(current, status=status))
+
+async def update_appointment_status(appointment_id: str, status: str):
+    """
+    Change an appointment's status in one conditional write
+
+    The item must exist and its current status must allow ``status`` (see
+    STATUS_TRANSITIONS). Returns the full updated item; raises LookupError
+    if there is no such appointment and InvalidStatusTransitionError if the
+    transition is not allowed. Taking a cancelled appointment back (e.g.
+    cancelled -> scheduled) books its slot again, so it is checked for
+    conflicts and raises AppointmentConflictError like a new booking. For a
+    series occurrence this records an override.
+    """
+    occurrence = split_occurrence_id(appointment_id)
+    if occurrence:
+        return await override_occurrence(*occurrence, {'status': status})
+    try:
+        client = await get_dynamodb_client()
+        previous = plain_previous_statuses(status)
+        try:
+            return await _write_status(client, appointment_id, status, previous)
+        except ClientError as e:
+            current = e.response.get('Item')
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException' or not current:
+                raise
+            current = deserialize_item(current)
+            if not _reactivates(current, status):
+                raise
+            return await _reactivate(client, current, status)
     except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            current = e.response.get('Item')
+            if not current:
+                _item_changed(appointment_id)
+                raise LookupError("Appointment not found")
+            current = deserialize_item(current)
+            _cache_written(current)
+            raise InvalidStatusTransitionError(current.get('status'), status)
         logger.error(f"DynamoDB error: {e.response['Error']['Message']}")
         raise Exception(f"Error updating appointment: {e.response['Error']['Message']}")
+    except (AppointmentConflictError, LookupError, ValueError, InvalidStatusTransitionError):
+        raise
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        raise Exception(f"Error updating appointment: {str(e)}")
+
+# RECURRING SERIES
+
+def build_series_item(series: AppointmentSeries) -> dict:
+    """Plain dict stored for a series; naive times are wall-clock times in the series' zone"""
+    item = series.model_dump(exclude={'recurrence'})
+    if not item.get('series_id'):
+        item['series_id'] = f"series-{uuid.uuid4().hex[:8]}"
+
+    zone = ZoneInfo(series.timezone)
+    for field in ('start_time', 'end_time'):
+        value = getattr(series, field)
+        item[field] = format_time(value if value.tzinfo else value.replace(tzinfo=zone))
+    if item['end_time'] <= item['start_time']:
+        raise ValueError("end_time must be after start_time")
+
+    rule = series.recurrence.model_dump(exclude_none=True)
+    if series.recurrence.until:
+        until = series.recurrence.until
+        rule['until'] = format_time(until if until.tzinfo else until.replace(tzinfo=zone))
+    item['recurrence'] = rule
+    item['overrides'] = {}
+    return item
+
+def _series_window(series: RecurringSeries, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """Timestamps bounding an expansion; open ends stop SERIES_HORIZON_DAYS after the start"""
+    lower = to_timestamp(start) if start else to_timestamp(series.item['start_time'])
+    upper = to_timestamp(end) if end else lower + SERIES_HORIZON_DAYS * 86400
+    return lower, upper
+
+_series_table_warned = False
+
+def _series_table_missing(e: ClientError) -> bool:
+    """Whether an error means the series table does not exist (warned about once)"""
+    global _series_table_warned
+    if e.response['Error']['Code'] != 'ResourceNotFoundException':
+        return False
+    if not _series_table_warned:
+        _series_table_warned = True
+        logger.warning(f"{SERIES_TABLE_NAME} does not exist; reading it as empty until "
+                       f"services.calendar_dynamodb.create_series_table is run")
+    return True
+
+async def _query_series(key_name: str, key_value: str) -> List[dict]:
+    """Every series of one therapist or patient"""
+    client = await get_dynamodb_client()
+    params = {
+        'TableName': SERIES_TABLE_NAME,
+        'IndexName': SERIES_THERAPIST_INDEX if key_name == 'therapist_id' else SERIES_PATIENT_INDEX,
+        'KeyConditionExpression': '#pk = :pk',
+        'ExpressionAttributeNames': {'#pk': key_name},
+        'ExpressionAttributeValues': {':pk': {'S': key_value}}
+    }
+    items = []
+    while True:
+        try:
+            response = await client.query(**params)
+        except ClientError as e:
+            if _series_table_missing(e):
+                return []
+            raise
+        items.extend(deserialize_item(item) for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+async def _merge_occurrences(page: dict, key_name: str, key_value: str, cursor: Optional[str],
+                             start: Optional[datetime], end: Optional[datetime],
+                             fields: Optional[tuple] = None) -> dict:
+    """
+    Add series occurrences starting inside the window to one page of stored appointments
+
+    With the start_time-sorted indexes each page covers a start_time range:
+    from the previous page's last item (carried in the cursor) to this
+    page's last item, or to the end of the window on the final page. The
+    occurrences in that range go on this page, so the merged pages stay in
+    start_time order; a page can hold up to ``limit`` stored items plus the
+    occurrences between them. On hash-only indexes every occurrence goes on
+    the first page.
+    """
+    series_items = await _query_series(key_name, key_value)
+    if not series_items:
+        return page
+
+    previous = None
+    if cursor:
+        if INDEX_SORT_KEY != 'start_time':
+            return page
+        previous = decode_cursor(cursor).get('start_time', {}).get('S')
+    last = None
+    if page['next_cursor'] and page['items'] and INDEX_SORT_KEY == 'start_time':
+        last = page['items'][-1]['start_time']
+
+    occurrences = []
+    for item in series_items:
+        series = RecurringSeries(item)
+        lower, upper = _series_window(series, start, end)
+        for occurrence in series.occurrences(lower, upper + 1):
+            starts = occurrence['start_time']
+            if to_timestamp(starts) < lower or to_timestamp(starts) > upper:
+                continue
+            if (previous and starts <= previous) or (last and starts > last):
+                continue
+            occurrences.append(_project(occurrence, fields))
+
+    items = sorted(page['items'] + occurrences, key=lambda appt: to_timestamp(appt['start_time']))
+    return {"items": items, "next_cursor": page['next_cursor']}
+
+async def create_series(series: AppointmentSeries):
+    """Create a recurring series after checking its occurrences against the therapist's schedule"""
+    try:
+        client = await get_dynamodb_client()
+        item = build_series_item(series)
+        recurring = RecurringSeries(item)
+
+        put = {
+            'TableName': SERIES_TABLE_NAME,
+            'Item': serialize_item(item),
+            'ConditionExpression': 'attribute_not_exists(series_id)'
+        }
+
+        def prepare(schedule):
+            conflicts = []
+            for start, end, _ in recurring.intervals(*_series_window(recurring)):
+                conflicts.extend(schedule.conflicts(start, end))
+            if conflicts:
+                raise AppointmentConflictError(sorted(set(conflicts)))
+            return [{'Put': put}], [('series', item['series_id'])]
+
+        async with _interval_index.lock(item['therapist_id']):
+            if is_blocking(item.get('status')):
+                await _book(client, item['therapist_id'], prepare)
+            else:
+                await client.put_item(**put)
+            _interval_index.record_series(recurring)
+            _cache.invalidate_tags(*_list_tags(item))
+            _publish(INSERT, 'series', item['series_id'], new_image=item)
+
+        return {"message": "Series created", "series_id": item['series_id']}
+    except (AppointmentConflictError, ValueError):
+        raise
+    except ClientError as e:
+        if _series_table_missing(e):
+            raise Exception(f"Error creating series: {SERIES_TABLE_NAME} does not exist")
+        logger.error(f"DynamoDB error: {e.response['Error']['Message']}")
+        raise Exception(f"Error creating series: {e.response['Error']['Message']}")
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        raise Exception(f"Error creating series: {str(e)}")
+
+async def get_series(series_id: str):
+    """Get a series definition by ID"""
+    try:
+        client = await get_dynamodb_client()
+        response = await client.get_item(
+            TableName=SERIES_TABLE_NAME,
+            Key={'series_id': {'S': series_id}}
+        )
+        item = response.get('Item')
+        return deserialize_item(item) if item else None
+    except ClientError as e:
+        if _series_table_missing(e):
+            return None
+        logger.error(f"DynamoDB error: {e.response['Error']['Message']}")
+        raise Exception(f"Error retrieving series: {e.response['Error']['Message']}")
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        raise Exception(f"Error retrieving series: {str(e)}")
+
+async def iter_all_series():
+    """Yield every series definition; the series table is small, so one scan page at a time"""
+    client = await get_dynamodb_client()
+    params = {'TableName': SERIES_TABLE_NAME}
+    while True:
+        try:
+            response = await client.scan(**params)
+        except ClientError as e:
+            if _series_table_missing(e):
+                return
+            raise
+        for item in response.get('Items', []):
+            yield deserialize_item(item)
+        if 'LastEvaluatedKey' not in response:
+            break
+        params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+async def list_series_occurrences(series_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """A series' occurrences overlapping [start, end), or None if the series does not exist"""
+    if start and end and start > end:
+        raise ValueError("start must not be after end")
+    item = await get_series(series_id)
+    if not item:
+        return None
+    series = RecurringSeries(item)
+    return series.occurrences(*_series_window(series, start, end))
+
+async def get_occurrence(series_id: str, recurrence: str):
+    """One occurrence of a series, or None if the series has no such occurrence"""
+    item = await get_series(series_id)
+    return RecurringSeries(item).occurrence(recurrence) if item else None
+
+async def override_occurrence(series_id: str, recurrence: str, changes: dict):
+    """
+    Change one occurrence of a series (move it, cancel it, edit its notes)
+
+    Moving or re-activating an occurrence is checked for conflicts like a
+    new booking. Returns the updated occurrence; raises LookupError if the
+    series has no such occurrence.
+    """
+    try:
+        item = await get_series(series_id)
+        series = RecurringSeries(item) if item else None
+        occurrence = series.occurrence(recurrence) if series else None
+        if not occurrence:
+            raise LookupError("Occurrence not found")
+
+        override = dict(series.overrides.get(recurrence, {}))
+        changes = {field: value for field, value in changes.items() if field in OVERRIDE_FIELDS and value is not None}
+        if 'status' in changes:
+            current = occurrence.get('status') or 'scheduled'
+            if current not in allowed_previous_statuses(changes['status']):
+                raise InvalidStatusTransitionError(current, changes['status'])
+        for field in ('start_time', 'end_time'):
+            if isinstance(changes.get(field), datetime):
+                changes[field] = format_time(changes[field])
+        if 'start_time' in changes and 'end_time' not in changes:
+            duration = to_timestamp(occurrence['end_time']) - to_timestamp(occurrence['start_time'])
+            changes['end_time'] = format_time(
+                datetime.fromtimestamp(to_timestamp(changes['start_time']) + duration, timezone.utc)
+            )
+        elif 'end_time' in changes and 'start_time' not in changes:
+            changes['start_time'] = occurrence['start_time']
+        override.update(changes)
+
+        updated = dict(occurrence, **override)
+        if to_timestamp(updated['end_time']) <= to_timestamp(updated['start_time']):
+            raise ValueError("end_time must be after start_time")
+
+        update = {
+            'TableName': SERIES_TABLE_NAME,
+            'Key': {'series_id': {'S': series_id}},
+            'UpdateExpression': 'SET overrides.#recurrence = :override',
+            'ConditionExpression': 'attribute_exists(series_id)',
+            'ExpressionAttributeNames': {'#recurrence': recurrence},
+            'ExpressionAttributeValues': {':override': _serializer.serialize(override)}
+        }
+
+        def prepare(schedule):
+            conflicts = schedule.conflicts(
+                to_timestamp(updated['start_time']), to_timestamp(updated['end_time']), occurrence['appointment_id']
+            )
+            if conflicts:
+                raise AppointmentConflictError(conflicts)
+            return [{'Update': update}], [('series', series_id)]
+
+        client = await get_dynamodb_client()
+        async with _interval_index.lock(occurrence['therapist_id']):
+            if is_blocking(updated.get('status')):
+                await _book(client, occurrence['therapist_id'], prepare)
+                # Transactions return no item; read back the series as written
+                response = await client.get_item(
+                    TableName=SERIES_TABLE_NAME, Key={'series_id': {'S': series_id}}, ConsistentRead=True
+                )
+                attributes = response['Item']
+            else:
+                response = await client.update_item(**update, ReturnValues='ALL_NEW')
+                attributes = response['Attributes']
+            updated_series = deserialize_item(attributes)
+            _interval_index.record_series(RecurringSeries(updated_series))
+            _cache.invalidate_tags(*_list_tags(updated_series))
+            _publish(MODIFY, 'series', series_id, new_image=updated_series)
+
+        return updated
+    except (AppointmentConflictError, InvalidStatusTransitionError, LookupError, ValueError):
+        raise
+    except ClientError as e:
+        logger.error(f"DynamoDB error: {e.response['Error']['Message']}")
+        raise Exception(f"Error updating occurrence: {e.response['Error']['Message']}")
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        raise Exception(f"Error updating occurrence: {str(e)}")
+
+# BULK OPERATIONS
+
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+async def _backoff(attempt: int, base: float = 0.05, cap: float = 2.0):
+    """Exponential backoff with full jitter"""
+    await asyncio.sleep(random.uniform(0, min(cap, base * 2 ** attempt)))
+
+def _request_id(request: dict) -> str:
+    if 'PutRequest' in request:
+        return request['PutRequest']['Item']['appointment_id']['S']
+    return request['DeleteRequest']['Key']['appointment_id']['S']
+
+async def _batch_write(client, requests: List[dict]) -> dict:
+    """
+    Send up to BATCH_WRITE_SIZE put/delete requests with BatchWriteItem
+
+    UnprocessedItems are retried with backoff. Returns
+    {appointment_id: error message} for requests that could not be applied.
+    """
+    for attempt in range(BULK_MAX_RETRIES + 1):
+        try:
+            response = await client.batch_write_item(RequestItems={TABLE_NAME: requests})
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if code not in ('ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded'):
+                message = e.response['Error']['Message']
+                return {_request_id(r): message for r in requests}
+        else:
+            requests = response.get('UnprocessedItems', {}).get(TABLE_NAME, [])
+            if not requests:
+                return {}
+        if attempt < BULK_MAX_RETRIES:
+            await _backoff(attempt)
+
+    return {_request_id(r): "Unprocessed after retries" for r in requests}
+
+async def _batch_put(client, items: List[dict]) -> dict:
+    """Write up to BATCH_WRITE_SIZE items; failures as in _batch_write"""
+    return await _batch_write(client, [{'PutRequest': {'Item': serialize_item(item)}} for item in items])
+
+async def _batch_delete(client, appointment_ids: List[str]) -> dict:
+    """Delete up to BATCH_WRITE_SIZE items by ID; failures as in _batch_write"""
+    return await _batch_write(client, [
+        {'DeleteRequest': {'Key': {'appointment_id': {'S': appointment_id}}}} for appointment_id in appointment_ids
+    ])
+
+async def _transact_status_updates(client, updates: List[dict]) -> dict:
+    """
+    Apply up to TRANSACT_WRITE_SIZE status changes in one TransactWriteItems call
+
+    Each update carries the same existence and transition condition as
+    update_appointment_status. A transaction is all-or-nothing, so when it is
+    cancelled the items that caused it (missing appointments, disallowed
+    transitions) are dropped and the rest are retried. Returns
+    {appointment_id: error message} for items that were not updated;
+    cancelled appointments being taken back are marked REACTIVATE instead,
+    for the caller to update one by one with a conflict check.
+    """
+    failed = {}
+    pending = []
+    for update in updates:
+        try:
+            status = update['status']
+            pending.append((update, _status_condition(status, plain_previous_statuses(status))))
+        except ValueError as e:
+            failed[update['appointment_id']] = str(e)
+    attempt = 0
+    while pending:
+        try:
+            await client.transact_write_items(TransactItems=[{
+                'Update': {
+                    'TableName': TABLE_NAME,
+                    'Key': {'appointment_id': {'S': update['appointment_id']}},
+                    'UpdateExpression': 'set #status = :s',
+                    'ConditionExpression': condition,
+                    'ExpressionAttributeNames': {'#status': 'status'},
+                    'ExpressionAttributeValues': {':s': {'S': update['status']}, **values},
+                    'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+                }
+            } for update, (condition, values) in pending])
+            return failed
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            reasons = e.response.get('CancellationReasons', [])
+            if code != 'TransactionCanceledException' or len(reasons) != len(pending):
+                if code not in ('ThrottlingException', 'ProvisionedThroughputExceededException') or attempt >= BULK_MAX_RETRIES:
+                    failed.update({u['appointment_id']: e.response['Error']['Message'] for u, _ in pending})
+                    return failed
+            else:
+                retry = []
+                for (update, condition), reason in zip(pending, reasons):
+                    reason_code = reason.get('Code', 'None')
+                    if reason_code == 'ConditionalCheckFailed':
+                        current = reason.get('Item')
+                        if current and _reactivates(deserialize_item(current), update['status']):
+                            failed[update['appointment_id']] = REACTIVATE
+                            continue
+                        failed[update['appointment_id']] = (
+                            str(InvalidStatusTransitionError(deserialize_item(current).get('status'), update['status']))
+                            if current else "Appointment not found"
+                        )
+                    elif reason_code in ('None', 'TransactionConflict', 'ThrottlingError') and attempt < BULK_MAX_RETRIES:
+                        retry.append((update, condition))
+                    else:
+                        failed[update['appointment_id']] = reason.get('Message') or reason_code
+                pending = retry
+        if pending:
+            await _backoff(attempt)
+            attempt += 1
+    return failed
+
+async def _run_chunks(chunks: list, write) -> dict:
+    """Run chunk writers concurrently, BULK_CONCURRENCY at a time, merging their failures"""
+    client = await get_dynamodb_client()
+    semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+
+    async def run(chunk):
+        async with semaphore:
+            return await write(client, chunk)
+
+    failed = {}
+    for chunk_failures in await asyncio.gather(*(run(chunk) for chunk in chunks)):
+        failed.update(chunk_failures)
+    return failed
+
+async def _batch_get(client, keys: List[tuple], projections: dict) -> Tuple[dict, set]:
+    """
+    Read up to BATCH_GET_SIZE (table, key_name, key_value) keys with BatchGetItem
+
+    UnprocessedKeys are retried with backoff. Returns the items found, keyed
+    by (table, key_value), and the keys still unprocessed after retries.
+    """
+    key_names = {table: key_name for table, key_name, _ in keys}
+    request = {}
+    for table, key_name, key_value in keys:
+        entry = request.setdefault(table, {'Keys': [], **projections.get(table, {})})
+        entry['Keys'].append({key_name: {'S': key_value}})
+
+    found = {}
+    for attempt in range(BULK_MAX_RETRIES + 1):
+        try:
+            response = await client.batch_get_item(RequestItems=request)
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded'):
+                raise
+        else:
+            for table, items in response.get('Responses', {}).items():
+                for item in items:
+                    item = deserialize_item(item)
+                    found[(table, item[key_names[table]])] = item
+            request = response.get('UnprocessedKeys') or {}
+            if not request:
+                return found, set()
+        if attempt < BULK_MAX_RETRIES:
+            await _backoff(attempt)
+
+    unprocessed = {(table, key[key_names[table]]['S']) for table, entry in request.items() for key in entry['Keys']}
+    return found, unprocessed
+
+async def batch_get_appointments(appointment_ids: List[str], fields: Optional[str] = None):
+    """
+    Look up many appointments at once, returning a result per requested ID in request order
+
+    Uncached IDs are read with BatchGetItem in chunks of BATCH_GET_SIZE,
+    BULK_CONCURRENCY chunks at a time. Series occurrence IDs are resolved
+    from their series, which are fetched in the same requests.
+    """
+    try:
+        projected = resolve_fields(fields)
+        client = await get_dynamodb_client()
+
+        items, keys = {}, {}
+        for appointment_id in dict.fromkeys(appointment_ids):
+            occurrence = split_occurrence_id(appointment_id)
+            if occurrence:
+                keys[(SERIES_TABLE_NAME, occurrence[0])] = 'series_id'
+                continue
+            cached = _cache.get(('appointment', appointment_id))
+            if cached is not None:
+                items[appointment_id] = cached
+            else:
+                keys[(TABLE_NAME, appointment_id)] = 'appointment_id'
+        generations = {value: _cache.generation(_item_tag(value)) for table, value in keys if table == TABLE_NAME}
+
+        # Series are needed whole to expand occurrences
+        projections = {TABLE_NAME: _projection(projected)}
+        semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+
+        async def run(chunk):
+            async with semaphore:
+                try:
+                    return await _batch_get(client, chunk, projections)
+                except ClientError as e:
+                    # Without a series table its occurrence IDs are simply not found
+                    series_keys = [key for key in chunk if key[0] == SERIES_TABLE_NAME]
+                    if not series_keys or not _series_table_missing(e):
+                        raise
+                    rest = [key for key in chunk if key[0] != SERIES_TABLE_NAME]
+                    return await _batch_get(client, rest, projections) if rest else ({}, set())
+
+        chunks = list(_chunks([(table, name, value) for (table, value), name in keys.items()], BATCH_GET_SIZE))
+        found, unprocessed = {}, set()
+        for chunk_found, chunk_unprocessed in await asyncio.gather(*(run(chunk) for chunk in chunks)):
+            found.update(chunk_found)
+            unprocessed |= chunk_unprocessed
+
+        for (table, key_value), item in found.items():
+            if table == TABLE_NAME:
+                items[key_value] = item
+                # Skip items written while the batch was in flight
+                if not projected and _cache.generation(_item_tag(key_value)) == generations[key_value]:
+                    _cache.put(('appointment', key_value), item)
+
+        results = []
+        for appointment_id in appointment_ids:
+            occurrence = split_occurrence_id(appointment_id)
+            key = (SERIES_TABLE_NAME, occurrence[0]) if occurrence else (TABLE_NAME, appointment_id)
+            if key in unprocessed:
+                results.append({"appointment_id": appointment_id, "found": False, "item": None,
+                                "error": "Unprocessed after retries"})
+                continue
+            if occurrence:
+                series = found.get(key)
+                item = RecurringSeries(series).occurrence(occurrence[1]) if series else None
+            else:
+                item = items.get(appointment_id)
+            results.append({"appointment_id": appointment_id, "found": item is not None,
+                            "item": _project(item, projected) if item else None, "error": None})
+
+        found_count = sum(1 for result in results if result["found"])
+        return {"results": results, "found": found_count, "missing": len(results) - found_count}
+    except ValueError:
+        raise
+    except ClientError as e:
+        logger.error(f"DynamoDB error: {e.response['Error']['Message']}")
+        raise Exception(f"Error retrieving appointments: {e.response['Error']['Message']}")
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        raise Exception(f"Error retrieving appointments: {str(e)}")
+
+def _split_duplicates(entries: List[dict]):
+    """Keep the first entry per appointment_id; DynamoDB rejects a batch that repeats a key"""
+    unique, seen, duplicates = [], set(), set()
+    for index, entry in enumerate(entries):
+        if entry['appointment_id'] in seen:
+            duplicates.add(index)
+        else:
+            seen.add(entry['appointment_id'])
+            unique.append(entry)
+    return unique, duplicates
+
+def _bulk_results(entries: List[dict], duplicates: set, failed: dict) -> dict:
+    """Result per input entry, in input order"""
+    results = []
+    for index, entry in enumerate(entries):
+        appointment_id = entry['appointment_id']
+        error = "Duplicate appointment_id in request" if index in duplicates else failed.get(appointment_id)
+        results.append({"appointment_id": appointment_id, "ok": error is None, "error": error})
+    succeeded = sum(1 for result in results if result["ok"])
+    return {"results": results, "succeeded": succeeded, "failed": len(results) - succeeded}
+
+async def _book_chunk(client, therapist_id: str, items: List[dict]) -> dict:
+    """
+    Book up to TRANSACT_WRITE_SIZE - 1 of one therapist's items in one guarded transaction
+
+    Items overlapping the schedule or an earlier item of the chunk are
+    failed with the conflict; if the transaction fails, so does every item
+    left. Returns failures as in _batch_write.
+    """
+    failed = {}
+
+    def prepare(schedule):
+        failed.clear()
+        accepted = []
+        for item in items:
+            start, end = to_timestamp(item['start_time']), to_timestamp(item['end_time'])
+            conflicts = schedule.conflicts(start, end, item['appointment_id'])
+            conflicts += [other['appointment_id'] for other in accepted
+                          if to_timestamp(other['start_time']) < end and start < to_timestamp(other['end_time'])]
+            if conflicts:
+                failed[item['appointment_id']] = str(AppointmentConflictError(conflicts))
+            else:
+                accepted.append(item)
+        return ([{'Put': {'TableName': TABLE_NAME, 'Item': serialize_item(item)}} for item in accepted],
+                [('appointment', item['appointment_id']) for item in accepted])
+
+    try:
+        await _book(client, therapist_id, prepare)
+    except Exception as e:
+        # Reload this therapist rather than guess what is stored
+        _interval_index.invalidate(therapist_id)
+        return {item['appointment_id']: failed.get(item['appointment_id'], str(e)) for item in items}
+    for item in items:
+        if item['appointment_id'] not in failed:
+            _interval_index.record(item)
+    return failed
+
+async def bulk_create_appointments(appts: List[Appointment]):
+    """Create many appointments, returning a result per input item
+
+    Items that would double-book their therapist are reported as failures
+    and not written. Each therapist's bookings are written in guarded
+    transactions (see _book), one chunk after another so each is checked
+    against the last, and different therapists concurrently. Items that
+    book no time go in with BatchWriteItem.
+    """
+    try:
+        items = [build_appointment_item(appt) for appt in appts]
+        unique, duplicates = _split_duplicates(items)
+        client = await get_dynamodb_client()
+
+        by_therapist = {}
+        for item in unique:
+            if is_blocking(item.get('status')):
+                by_therapist.setdefault(item['therapist_id'], []).append(item)
+        free = [item for item in unique if not is_blocking(item.get('status'))]
+
+        async with AsyncExitStack() as locks:
+            # Lock every therapist involved, in a fixed order so bulk calls cannot deadlock
+            for therapist_id in sorted({item['therapist_id'] for item in unique}):
+                await locks.enter_async_context(_interval_index.lock(therapist_id))
+
+            semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+
+            async def book(therapist_id, therapist_items):
+                failures = {}
+                for chunk in _chunks(therapist_items, TRANSACT_WRITE_SIZE - 1):
+                    async with semaphore:
+                        failures.update(await _book_chunk(client, therapist_id, chunk))
+                return failures
+
+            failed = await _run_chunks(list(_chunks(free, BATCH_WRITE_SIZE)), _batch_put)
+            for therapist_failures in await asyncio.gather(*(book(*entry) for entry in by_therapist.items())):
+                failed.update(therapist_failures)
+            for item in unique:
+                if item['appointment_id'] not in failed:
+                    if not is_blocking(item.get('status')):
+                        _interval_index.record(item)
+                    _cache_written(item)
+                    _publish(INSERT, 'appointment', item['appointment_id'], new_image=item)
+
+        return _bulk_results(items, duplicates, failed)
+    except ClientError as e:
+        logger.error(f"DynamoDB error: {e.response['Error']['Message']}")
+        raise Exception(f"Error creating appointments: {e.response['Error']['Message']}")
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        raise Exception(f"Error creating appointments: {str(e)}")
+
+async def _update_singly(updates: List[dict]) -> dict:
+    """Status changes that need update_appointment_status's checks, BULK_CONCURRENCY at a time"""
+    semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+    failed = {}
+
+    async def run(update):
+        async with semaphore:
+            try:
+                await update_appointment_status(update['appointment_id'], update['status'])
+            except Exception as e:
+                failed[update['appointment_id']] = str(e)
+
+    await asyncio.gather(*(run(update) for update in updates))
+    return failed
+
+async def bulk_update_appointment_status(updates: List[dict]):
+    """
+    Apply many status changes with TransactWriteItems, returning a result per input item
+
+    Series occurrences, and cancelled appointments being taken back (which
+    need a conflict check), are updated one by one through
+    update_appointment_status instead.
+    """
+    try:
+        unique, duplicates = _split_duplicates(updates)
+        # An occurrence's status is an override on its series item
+        singly = [update for update in unique if split_occurrence_id(update['appointment_id'])]
+        stored = [update for update in unique if not split_occurrence_id(update['appointment_id'])]
+        failed = await _run_chunks(list(_chunks(stored, TRANSACT_WRITE_SIZE)), _transact_status_updates)
+        reactivated = [update for update in stored if failed.get(update['appointment_id']) == REACTIVATE]
+        for update in reactivated:
+            del failed[update['appointment_id']]
+        # These update their own caches, index and feed
+        singly += reactivated
+        failed.update(await _update_singly(singly))
+        unattributed = False
+        for update in stored:
+            if update['appointment_id'] not in failed and update not in reactivated:
+                _interval_index.status_changed(update['appointment_id'], update['status'])
+                _publish(MODIFY, 'appointment', update['appointment_id'], changes={'status': update['status']})
+                key = ('appointment', update['appointment_id'])
+                cached = _cache.peek(key)
+                _cache.invalidate_tags(_item_tag(update['appointment_id']))
+                if cached:
+                    _cache.update(key, {'status': update['status']})
+                    _cache.invalidate_tags(*_list_tags(cached))
+                else:
+                    unattributed = True
+        if unattributed:
+            # Transactions return no attributes, so any cached listing may hold these items
+            _cache.invalidate_tags('list')
+        return _bulk_results(updates, duplicates, failed)
+    except ClientError as e:
+        logger.error(f"DynamoDB error: {e.response['Error']['Message']}")
+        raise Exception(f"Error updating appointments: {e.response['Error']['Message']}")
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        raise Exception(f"Error updating appointments: {str(e)}")
+
+async def delete_appointments(appts: List[dict], archived: bool = False) -> dict:
+    """
+    Remove stored appointments with BatchWriteItem, e.g. once they are archived
+
+    Deletes are unconditional, so callers should only pass appointments
+    that are no longer expected to change (see archive.ARCHIVE_STATUSES).
+    ``archived`` marks the REMOVE events as moves to the cold tier. Returns
+    {appointment_id: error message} for items that were not deleted.
+    """
+    try:
+        ids = list(dict.fromkeys(appt['appointment_id'] for appt in appts))
+        failed = await _run_chunks(list(_chunks(ids, BATCH_WRITE_SIZE)), _batch_delete)
+        for appt in appts:
+            if appt['appointment_id'] not in failed:
+                _interval_index.discard(appt['appointment_id'])
+                _item_changed(appt['appointment_id'])
+                _cache.invalidate_tags(*_list_tags(appt))
+                _publish(REMOVE, 'appointment', appt['appointment_id'], old_image=appt, archived=archived)
+        return failed
+    except ClientError as e:
+        logger.error(f"DynamoDB error: {e.response['Error']['Message']}")
+        raise Exception(f"Error deleting appointments: {e.response['Error']['Message']}")
     except Exception as e:
         logger.error(f"Error: {str(e)}")
-        raise Exception(f"Error updating appointment: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Error deleting appointments: {str(e)}")
@@ -1,6 +1,36 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Literal
-from datetime import datetime
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field
+from typing import Optional, Literal, List, Dict, Annotated
+from datetime import date, datetime
+
+# Allowed status changes: current status -> statuses it may move to. Setting
+# the current status again is always allowed so retries are harmless; an
+# item without a status counts as scheduled. A cancelled appointment may be
+# rescheduled, which books its slot again and so is conflict-checked (see
+# calendar_db.update_appointment_status); no-show and completed are final.
+# 'canceled' is only kept for items stored with that spelling; new writes
+# use 'cancelled' (see STATUS_ALIASES).
+STATUS_TRANSITIONS = {
+    'scheduled': {'confirmed', 'checked-in', 'in-progress', 'completed', 'cancelled', 'no-show'},
+    'confirmed': {'scheduled', 'checked-in', 'in-progress', 'completed', 'cancelled', 'no-show'},
+    'checked-in': {'in-progress', 'completed', 'cancelled'},
+    'in-progress': {'completed'},
+    'completed': set(),
+    'canceled': {'scheduled'},
+    'cancelled': {'scheduled'},
+    'no-show': set(),
+}
+
+# Other spellings accepted on input -> the status stored
+STATUS_ALIASES = {'canceled': 'cancelled'}
+
+def canonical_status(value):
+    return STATUS_ALIASES.get(value, value) if isinstance(value, str) else value
+
+# A status a client may set: any STATUS_TRANSITIONS key, aliases normalized
+AppointmentStatus = Annotated[
+    Literal[tuple(status for status in STATUS_TRANSITIONS if status not in STATUS_ALIASES)],
+    BeforeValidator(canonical_status)
+]
 
 class Appointment(BaseModel):
     appointment_id: str
@@ -10,13 +40,13 @@ class Appointment(BaseModel):
     end_time: datetime
     title: Optional[str] = "Therapy Session"
     notes: Optional[str] = None
-    status: str = "scheduled"  # scheduled, canceled, completed
+    status: AppointmentStatus = "scheduled"  # see STATUS_TRANSITIONS for allowed changes
     patient_name: Optional[str] = None
     therapist_name: Optional[str] = None
     appointment_type: Optional[str] = "standard"  # standard, initial, follow-up
 
 class AppointmentUpdate(BaseModel):
-    status: str = Field(..., description="New appointment status") 
+    status: AppointmentStatus = Field(..., description="New appointment status") 
     
 class AppointmentResponse(BaseModel):
     appointment_id: str
@@ -29,3 +59,109 @@ class AppointmentResponse(BaseModel):
     therapist_name: Optional[str] = None
     status: str
     notes: Optional[str] = None
+
+class AppointmentListItem(BaseModel):
+    """An appointment as listed; with ?fields= only the requested attributes are present"""
+    model_config = ConfigDict(extra='allow')
+
+    appointment_id: str
+    patient_id: Optional[str] = None
+    therapist_id: Optional[str] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    title: Optional[str] = None
+    notes: Optional[str] = None
+    status: Optional[str] = None
+    patient_name: Optional[str] = None
+    therapist_name: Optional[str] = None
+    appointment_type: Optional[str] = None
+    series_id: Optional[str] = None  # set on recurring-series occurrences
+    recurrence_id: Optional[str] = None
+
+class AppointmentPage(BaseModel):
+    items: List[AppointmentListItem]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
+
+class AppointmentHistory(BaseModel):
+    items: List[AppointmentListItem]
+    archived: int  # how many items came from the cold archive
+
+class AppointmentStatusChange(BaseModel):
+    appointment_id: str
+    status: AppointmentStatus = Field(..., description="New appointment status")
+
+class BulkItemResult(BaseModel):
+    appointment_id: str
+    ok: bool
+    error: Optional[str] = None
+
+class BulkWriteResponse(BaseModel):
+    results: List[BulkItemResult]  # one per input item, in input order
+    succeeded: int
+    failed: int
+
+class BatchGetRequest(BaseModel):
+    appointment_ids: List[str] = Field(..., min_length=1, max_length=1000)
+    fields: Optional[str] = None  # same as fields= on the list endpoints
+
+class BatchGetResult(BaseModel):
+    appointment_id: str
+    found: bool
+    item: Optional[AppointmentListItem] = None
+    error: Optional[str] = None  # set when the lookup itself failed, not for missing IDs
+
+class BatchGetResponse(BaseModel):
+    results: List[BatchGetResult]  # one per requested ID, in request order
+    found: int
+    missing: int
+
+class AvailabilitySlot(BaseModel):
+    start: datetime
+    end: datetime
+
+class TherapistAvailability(BaseModel):
+    therapist_id: str
+    slots: List[AvailabilitySlot]
+
+class AvailabilityResponse(BaseModel):
+    therapists: List[TherapistAvailability]
+
+class CalendarDay(BaseModel):
+    date: date  # in the view's timezone
+    count: int
+    counts: Dict[str, int]  # per therapist
+    appointments: List[AppointmentListItem]
+
+class CalendarView(BaseModel):
+    timezone: str
+    start: datetime
+    end: datetime
+    total: int
+    days: List[CalendarDay]
+
+class RecurrenceRule(BaseModel):
+    frequency: Literal["daily", "weekly"] = "weekly"
+    interval: int = Field(1, ge=1, le=52, description="Repeat every N days/weeks")
+    count: Optional[int] = Field(None, ge=1, description="Stop after this many occurrences")
+    until: Optional[datetime] = Field(None, description="No occurrence starts after this time")
+
+class AppointmentSeries(BaseModel):
+    series_id: Optional[str] = None
+    patient_id: str
+    therapist_id: str
+    start_time: datetime  # first occurrence; naive times are wall-clock times in timezone
+    end_time: datetime
+    timezone: str = "UTC"  # zone the series repeats in, so local times survive DST changes
+    recurrence: RecurrenceRule = RecurrenceRule()
+    title: Optional[str] = "Therapy Session"
+    notes: Optional[str] = None
+    status: AppointmentStatus = "scheduled"
+    patient_name: Optional[str] = None
+    therapist_name: Optional[str] = None
+    appointment_type: Optional[str] = "standard"
+
+class OccurrenceOverride(BaseModel):
+    start_time: Optional[datetime] = None  # moving keeps the duration unless end_time is given
+    end_time: Optional[datetime] = None
+    status: Optional[AppointmentStatus] = None
+    notes: Optional[str] = None
@@ -0,0 +1,94 @@
+"""
+Week/month calendar views across therapists
+
+A view reads every requested therapist's appointments in a range with one
+concurrent query per therapist (through the cached, series-aware listing
+in calendar_db) and groups them into day buckets in the viewer's time zone.
+Every day of the range gets a bucket, empty or not, so a calendar grid can
+be drawn straight from the response.
+
+Appointments belong to the day they start on, in the requested zone.
+"""
+
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from . import calendar_db
+from .interval_index import to_timestamp
+
+
+async def _therapist_appointments(therapist_id: str, start: datetime, end: datetime,
+                                  fields: Optional[str]) -> List[dict]:
+    """Every appointment of one therapist starting in [start, end), all pages"""
+    appointments, cursor = [], None
+    lower, upper = start.timestamp(), end.timestamp()
+    while True:
+        page = await calendar_db.list_appointments_by_therapist(therapist_id, None, cursor, start, end, fields)
+        appointments.extend(
+            appt for appt in page["items"] if lower <= to_timestamp(appt["start_time"]) < upper
+        )
+        cursor = page["next_cursor"]
+        if not cursor:
+            return appointments
+
+
+def _days(first: date, last: date) -> List[date]:
+    return [first + timedelta(days=n) for n in range((last - first).days + 1)]
+
+
+async def build_calendar_view(therapist_ids: List[str], start: datetime, end: datetime,
+                              tz: str = "UTC", fields: Optional[str] = None) -> dict:
+    """
+    Appointments of several therapists grouped by local day
+
+    Args:
+        therapist_ids: Therapists to include; duplicates are ignored
+        start, end: View range, end exclusive; naive times are read in ``tz``
+        tz: Time zone the days are cut in
+        fields: Attributes to return per appointment (see calendar_db.resolve_fields)
+
+    Returns:
+        {"timezone", "start", "end", "total", "days": [{"date", "count",
+        "counts": {therapist_id: n}, "appointments": [...]}]}, appointments
+        in start_time order within each day
+    """
+    zone = ZoneInfo(tz)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=zone)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=zone)
+    if end <= start:
+        raise ValueError("end must be after start")
+    calendar_db.resolve_fields(fields)  # Reject unknown fields before querying
+
+    therapist_ids = list(dict.fromkeys(therapist_ids))
+    start_utc, end_utc = start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+    results = await asyncio.gather(
+        *(_therapist_appointments(t, start_utc, end_utc, fields) for t in therapist_ids)
+    )
+
+    # The last bucket is the day holding the final instant before end
+    last_instant = end - timedelta(microseconds=1)
+    buckets: Dict[date, dict] = {
+        day: {"date": day.isoformat(), "count": 0, "counts": {}, "appointments": []}
+        for day in _days(start.astimezone(zone).date(), last_instant.astimezone(zone).date())
+    }
+    for therapist_id, appointments in zip(therapist_ids, results):
+        for appt in appointments:
+            day = datetime.fromtimestamp(to_timestamp(appt["start_time"]), zone).date()
+            bucket = buckets[day]
+            bucket["appointments"].append(appt)
+            bucket["count"] += 1
+            bucket["counts"][therapist_id] = bucket["counts"].get(therapist_id, 0) + 1
+
+    for bucket in buckets.values():
+        bucket["appointments"].sort(key=lambda appt: appt["start_time"])
+    return {
+        "timezone": tz,
+        "start": start.astimezone(zone).isoformat(),
+        "end": end.astimezone(zone).isoformat(),
+        "total": sum(bucket["count"] for bucket in buckets.values()),
+        "days": list(buckets.values()),
+    }
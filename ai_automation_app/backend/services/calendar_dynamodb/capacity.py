@@ -0,0 +1,84 @@
+"""
+Consumed-capacity accounting for calendar DynamoDB calls
+
+``instrument`` hooks the shared DynamoDB client's botocore events so that
+every call made through it asks for ``ReturnConsumedCapacity=TOTAL`` and
+records the reported units. Calls are attributed to the route being served
+(set per request by the calendar router, "-" outside a request) and to the
+DynamoDB operation, so the metrics show what each endpoint actually costs.
+
+Units count as reads or writes by operation; a transactional or batch call
+reports one entry per table, which are summed.
+"""
+
+import contextvars
+import os
+import threading
+from typing import Dict, Tuple
+
+# Set CALENDAR_CAPACITY_METRICS=0 to stop requesting consumed capacity
+ENABLED = os.environ.get('CALENDAR_CAPACITY_METRICS', '1') != '0'
+
+READ_OPERATIONS = {'GetItem', 'BatchGetItem', 'Query', 'Scan', 'TransactGetItems'}
+
+current_route: contextvars.ContextVar[str] = contextvars.ContextVar('calendar_route', default='-')
+
+
+class CapacityMetrics:
+    """Calls and capacity units per (route, operation)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+    def record(self, route: str, operation: str, units: float) -> None:
+        kind = 'read_units' if operation in READ_OPERATIONS else 'write_units'
+        with self._lock:
+            totals = self._totals.setdefault(
+                (route, operation), {'calls': 0, 'read_units': 0.0, 'write_units': 0.0}
+            )
+            totals['calls'] += 1
+            totals[kind] += units
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals.clear()
+
+    def snapshot(self) -> dict:
+        """{route: {"operations": {operation: totals}, "read_units", "write_units", "calls"}}"""
+        with self._lock:
+            routes = {}
+            for (route, operation), totals in sorted(self._totals.items()):
+                entry = routes.setdefault(route, {'calls': 0, 'read_units': 0.0, 'write_units': 0.0, 'operations': {}})
+                entry['operations'][operation] = dict(totals)
+                for field in ('calls', 'read_units', 'write_units'):
+                    entry[field] += totals[field]
+            return routes
+
+
+metrics = CapacityMetrics()
+
+
+def _consumed_units(consumed) -> float:
+    if isinstance(consumed, list):
+        return sum(entry.get('CapacityUnits', 0.0) for entry in consumed)
+    return consumed.get('CapacityUnits', 0.0) if consumed else 0.0
+
+
+def _request_capacity(params, model, **kwargs):
+    if 'ReturnConsumedCapacity' in model.input_shape.members:
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+
+def _record_capacity(http_response, parsed, model, **kwargs):
+    if 'ConsumedCapacity' in parsed:
+        metrics.record(current_route.get(), model.name, _consumed_units(parsed['ConsumedCapacity']))
+
+
+def instrument(client) -> None:
+    """Register the capacity hooks on a DynamoDB client once"""
+    if not ENABLED or getattr(client, '_calendar_capacity_instrumented', False):
+        return
+    client.meta.events.register('provide-client-params.dynamodb.*', _request_capacity)
+    client.meta.events.register('after-call.dynamodb.*', _record_capacity)
+    client._calendar_capacity_instrumented = True
@@ -0,0 +1,103 @@
+"""
+In-process change feed for calendar writes
+
+calendar_db publishes a ChangeEvent after every successful write to the
+appointments or series table. Events are shaped like DynamoDB Streams
+records (INSERT/MODIFY/REMOVE with the item images) so a listener could be
+fed from the table's stream instead without changing. A REMOVE made by the
+archive run is flagged ``archived``, the way a stream marks TTL deletes by
+their userIdentity, since the appointment still happened.
+
+Listeners are plain callables taking one event. They run synchronously on
+the write path, so they must be quick; an exception in one is logged and
+does not fail the write or reach the other listeners. Besides listeners
+subscribed in code, CALENDAR_CHANGE_LISTENERS may name extra ones as a
+comma-separated list of ``module:attribute`` paths, loaded on first publish.
+
+Only this process's writes are seen; writes from other processes are not.
+"""
+
+import importlib
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+INSERT = "INSERT"
+MODIFY = "MODIFY"
+REMOVE = "REMOVE"
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """One write to a calendar table"""
+    event_name: str  # INSERT, MODIFY or REMOVE
+    entity: str  # "appointment" or "series"
+    key: str  # appointment_id or series_id
+    new_image: Optional[dict] = None  # item after the write, when known
+    old_image: Optional[dict] = None  # item before the write, when known
+    changes: Optional[dict] = None  # attributes set, when the full new item is not known
+    archived: bool = False  # a REMOVE that moved the item to the cold tier, not a deletion
+
+
+Listener = Callable[[ChangeEvent], None]
+
+
+def _load_listener(path: str) -> Listener:
+    module_name, _, attribute = path.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+class ChangeFeed:
+    """Fans change events out to subscribed listeners"""
+
+    def __init__(self, configured: str = ""):
+        self._listeners: List[Listener] = []
+        self._configured = [path.strip() for path in configured.split(",") if path.strip()]
+        self._lock = threading.Lock()
+        self.published = 0
+        self.failures = 0
+
+    def subscribe(self, listener: Listener) -> None:
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Listener) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def _load_configured(self) -> None:
+        # Imported lazily: listener modules usually import calendar_db themselves
+        with self._lock:
+            paths, self._configured = self._configured, []
+        for path in paths:
+            try:
+                self.subscribe(_load_listener(path))
+            except Exception as e:
+                logger.error(f"Cannot load change listener {path}: {str(e)}")
+
+    def publish(self, event: ChangeEvent) -> None:
+        if self._configured:
+            self._load_configured()
+        self.published += 1
+        for listener in list(self._listeners):
+            try:
+                listener(event)
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Change listener {listener!r} failed on {event.event_name} {event.key}: {str(e)}")
+
+    def stats(self) -> dict:
+        return {
+            "listeners": len(self._listeners),
+            "published": self.published,
+            "failures": self.failures,
+        }
+
+
+feed = ChangeFeed(os.environ.get('CALENDAR_CHANGE_LISTENERS', ''))
@@ -0,0 +1,69 @@
+"""
+Create the schedule guard table next to an existing appointments table
+
+Every booking moves its therapist's guard item (see calendar_db._book) in
+the same transaction, which is what stops two processes from booking the
+same slot. The guards live in their own table (SCHEDULE_GUARD_TABLE_NAME,
+by default TherastackScheduleGuards) keyed by therapist_id. Until it is
+created, bookings are only checked for conflicts within each process.
+
+The table copies the appointments table's billing mode and, when that is
+provisioned, its throughput. Running it again once the table exists does
+nothing.
+
+Usage (from the backend directory):
+    python -m services.calendar_dynamodb.create_guard_table [--dry-run]
+"""
+
+import argparse
+import logging
+
+from utils import aws_clients
+from .calendar_db import TABLE_NAME, GUARD_TABLE_NAME
+from .create_series_table import _existing_table
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def create_guard_table(client, dry_run: bool = False) -> None:
+    """Create the schedule guard table unless it already exists"""
+    if _existing_table(client, GUARD_TABLE_NAME):
+        logger.info(f"{GUARD_TABLE_NAME} already exists")
+        return
+
+    appointments = client.describe_table(TableName=TABLE_NAME)['Table']
+    provisioned = appointments.get('BillingModeSummary', {}).get('BillingMode') != 'PAY_PER_REQUEST'
+
+    create = {
+        'TableName': GUARD_TABLE_NAME,
+        'AttributeDefinitions': [{'AttributeName': 'therapist_id', 'AttributeType': 'S'}],
+        'KeySchema': [{'AttributeName': 'therapist_id', 'KeyType': 'HASH'}],
+        'BillingMode': 'PAY_PER_REQUEST'
+    }
+    if provisioned:
+        throughput = appointments['ProvisionedThroughput']
+        create['BillingMode'] = 'PROVISIONED'
+        create['ProvisionedThroughput'] = {
+            'ReadCapacityUnits': throughput['ReadCapacityUnits'],
+            'WriteCapacityUnits': throughput['WriteCapacityUnits']
+        }
+
+    logger.info(f"Creating {GUARD_TABLE_NAME} ({create['BillingMode']})")
+    if dry_run:
+        return
+    client.create_table(**create)
+    client.get_waiter('table_exists').wait(TableName=GUARD_TABLE_NAME)
+    logger.info(f"{GUARD_TABLE_NAME} is active")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create the schedule guard table")
+    parser.add_argument('--dry-run', action='store_true', help="report what would be created without creating it")
+    args = parser.parse_args()
+
+    create_guard_table(aws_clients.get_client('dynamodb'), args.dry_run)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Create the recurring series table next to an existing appointments table
+
+Series live in their own table (APPOINTMENT_SERIES_TABLE_NAME, by default
+TherastackAppointmentSeries) keyed by series_id, with hash-only GSIs on
+therapist_id and patient_id (SERIES_THERAPIST_INDEX_NAME and
+SERIES_PATIENT_INDEX_NAME). Deployments created before series existed do
+not have it; until it is created the service reads it as empty and creating
+a series fails.
+
+The table copies the appointments table's billing mode and, when that is
+provisioned, its throughput. Running it again once the table exists only
+checks that the indexes are there.
+
+Usage (from the backend directory):
+    python -m services.calendar_dynamodb.create_series_table [--dry-run]
+"""
+
+import argparse
+import logging
+
+from utils import aws_clients
+from .calendar_db import TABLE_NAME, SERIES_TABLE_NAME, SERIES_THERAPIST_INDEX, SERIES_PATIENT_INDEX
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Index name -> partition key
+SERIES_INDEXES = {
+    SERIES_THERAPIST_INDEX: 'therapist_id',
+    SERIES_PATIENT_INDEX: 'patient_id',
+}
+
+
+def _existing_table(client, table_name: str):
+    try:
+        return client.describe_table(TableName=table_name)['Table']
+    except client.exceptions.ResourceNotFoundException:
+        return None
+
+
+def create_series_table(client, dry_run: bool = False) -> None:
+    """Create the series table and its GSIs unless it already exists"""
+    table = _existing_table(client, SERIES_TABLE_NAME)
+    if table:
+        existing = {index['IndexName'] for index in table.get('GlobalSecondaryIndexes', [])}
+        missing = [name for name in SERIES_INDEXES if name not in existing]
+        if missing:
+            logger.warning(f"{SERIES_TABLE_NAME} exists but has no {', '.join(missing)}")
+        else:
+            logger.info(f"{SERIES_TABLE_NAME} already exists")
+        return
+
+    appointments = client.describe_table(TableName=TABLE_NAME)['Table']
+    provisioned = appointments.get('BillingModeSummary', {}).get('BillingMode') != 'PAY_PER_REQUEST'
+
+    indexes = [
+        {
+            'IndexName': index_name,
+            'KeySchema': [{'AttributeName': hash_key, 'KeyType': 'HASH'}],
+            'Projection': {'ProjectionType': 'ALL'}
+        }
+        for index_name, hash_key in SERIES_INDEXES.items()
+    ]
+    create = {
+        'TableName': SERIES_TABLE_NAME,
+        'AttributeDefinitions': [{'AttributeName': name, 'AttributeType': 'S'}
+                                 for name in ('series_id', 'therapist_id', 'patient_id')],
+        'KeySchema': [{'AttributeName': 'series_id', 'KeyType': 'HASH'}],
+        'GlobalSecondaryIndexes': indexes,
+        'BillingMode': 'PAY_PER_REQUEST'
+    }
+    if provisioned:
+        throughput = appointments['ProvisionedThroughput']
+        throughput = {
+            'ReadCapacityUnits': throughput['ReadCapacityUnits'],
+            'WriteCapacityUnits': throughput['WriteCapacityUnits']
+        }
+        create['BillingMode'] = 'PROVISIONED'
+        create['ProvisionedThroughput'] = throughput
+        for index in indexes:
+            index['ProvisionedThroughput'] = throughput
+
+    logger.info(f"Creating {SERIES_TABLE_NAME} with {', '.join(SERIES_INDEXES)} ({create['BillingMode']})")
+    if dry_run:
+        return
+    client.create_table(**create)
+    client.get_waiter('table_exists').wait(TableName=SERIES_TABLE_NAME)
+    logger.info(f"{SERIES_TABLE_NAME} is active")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create the recurring appointment series table")
+    parser.add_argument('--dry-run', action='store_true', help="report what would be created without creating it")
+    args = parser.parse_args()
+
+    create_series_table(aws_clients.get_client('dynamodb'), args.dry_run)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+iCalendar (RFC 5545) feeds of a therapist's or patient's appointments
+
+Calendar apps poll a subscription URL every few minutes, so a feed is
+rendered once and then served from the appointment cache until one of the
+owner's appointments changes (or CALENDAR_FEED_CACHE_TTL passes). Served
+feeds carry an ETag derived from their content, so a poll with a matching
+If-None-Match costs a 304 and no body.
+
+A feed that is not cached is rendered as pages arrive from DynamoDB, and the
+finished body is cached for the next poll. The API sends small feeds whole,
+with their ETag, and streams larger ones as they render.
+
+The feed covers CALENDAR_FEED_PAST_DAYS before and CALENDAR_FEED_FUTURE_DAYS
+after the current time, including recurring-series occurrences.
+"""
+
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Optional, Tuple
+
+from . import calendar_db
+from .interval_index import is_blocking, to_timestamp
+
+FEED_PAST_DAYS = int(os.environ.get('CALENDAR_FEED_PAST_DAYS', '30'))
+FEED_FUTURE_DAYS = int(os.environ.get('CALENDAR_FEED_FUTURE_DAYS', '180'))
+
+PRODID = "-//Therastack//Calendar//EN"
+UID_DOMAIN = "therastack"
+
+# Whose name appears in event titles: a therapist sees the patient and vice versa
+COUNTERPART = {"therapist_id": "patient_name", "patient_id": "therapist_name"}
+
+
+def _escape(text: str) -> str:
+    return (str(text).replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _fold(line: str) -> str:
+    """Fold a content line at 75 octets, without splitting a UTF-8 character"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts, limit = [], 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+        limit = 74  # continuation lines start with a space
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _utc_stamp(value) -> str:
+    return datetime.fromtimestamp(to_timestamp(value), timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def render_event(appt: dict, key_name: str) -> str:
+    """One VEVENT for an appointment or series occurrence"""
+    summary = appt.get("title") or "Appointment"
+    counterpart = appt.get(COUNTERPART[key_name])
+    if counterpart:
+        summary = f"{summary} - {counterpart}"
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{_escape(appt['appointment_id'])}@{UID_DOMAIN}",
+        # Nothing records when an appointment was last changed; a fixed stamp
+        # keeps unchanged feeds byte-identical so their ETags match
+        f"DTSTAMP:{_utc_stamp(appt['start_time'])}",
+        f"DTSTART:{_utc_stamp(appt['start_time'])}",
+        f"DTEND:{_utc_stamp(appt['end_time'])}",
+        f"SUMMARY:{_escape(summary)}",
+        f"STATUS:{'CONFIRMED' if is_blocking(appt.get('status')) else 'CANCELLED'}",
+        "END:VEVENT",
+    ]
+    return "".join(_fold(line) for line in lines)
+
+
+def etag_for(body: str) -> str:
+    return '"' + hashlib.sha1(body.encode("utf-8")).hexdigest() + '"'
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or any(value.removeprefix("W/") == etag for value in candidates)
+
+
+async def render_feed(key_name: str, key_value: str) -> AsyncIterator[str]:
+    """Yield the feed in chunks: the header, one chunk per event, the footer"""
+    now = datetime.now(timezone.utc)
+    owner = key_name.split("_")[0]
+    yield "".join(_fold(line) for line in (
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        "X-WR-CALNAME:" + _escape(f"Therastack {owner} {key_value}"),
+    ))
+    async for appt in calendar_db.iter_appointments_between(
+        key_name, key_value, now - timedelta(days=FEED_PAST_DAYS), now + timedelta(days=FEED_FUTURE_DAYS)
+    ):
+        yield render_event(appt, key_name)
+    yield "END:VCALENDAR\r\n"
+
+
+async def build_feed(key_name: str, key_value: str) -> Tuple[str, str]:
+    """Cached (body, etag), rendering and caching the feed in full if needed"""
+    cached = calendar_db.get_cached_feed(key_name, key_value)
+    if cached:
+        return cached
+    generation = calendar_db.feed_generation(key_name, key_value)
+    body = "".join([chunk async for chunk in render_feed(key_name, key_value)])
+    etag = etag_for(body)
+    calendar_db.cache_feed(key_name, key_value, body, etag, generation)
+    return body, etag
+
+
+async def stream_feed(key_name: str, key_value: str) -> AsyncIterator[str]:
+    """Stream a freshly rendered feed, caching it once it is complete"""
+    generation = calendar_db.feed_generation(key_name, key_value)
+    chunks = []
+    async for chunk in render_feed(key_name, key_value):
+        chunks.append(chunk)
+        yield chunk
+    body = "".join(chunks)
+    calendar_db.cache_feed(key_name, key_value, body, etag_for(body), generation)
@@ -0,0 +1,178 @@
+"""
+In-process interval index of therapists' booked time
+
+Each therapist's active (not cancelled) appointments are kept as a list of
+intervals sorted by start time. Any interval that overlaps [start, end) must
+begin before ``end`` and no earlier than ``start - longest appointment``, so
+a conflict check is two binary searches plus a scan of that narrow slice:
+O(log n) for a normal schedule, and still correct if legacy data already
+contains overlaps.
+
+Recurring series are held unexpanded next to the single appointments; a
+check expands each of the therapist's series over just the checked window
+(see recurrence.py), adding O(series) work rather than O(occurrences).
+
+A therapist's schedule is loaded from DynamoDB on first use and then kept in
+sync by the calendar_db write paths. Other processes' writes are picked up
+when the schedule expires after ``ttl`` seconds, and before every booking
+from the therapist's schedule guard (see calendar_db._book), which is what
+keeps two processes from booking the same slot.
+"""
+
+import asyncio
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .recurrence import RecurringSeries
+
+# Statuses that free the slot
+NON_BLOCKING_STATUSES = {"cancelled", "canceled"}
+
+
+def to_timestamp(value) -> float:
+    """Epoch seconds for a datetime or stored ISO string (naive means UTC)"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def is_blocking(status: Optional[str]) -> bool:
+    return (status or "scheduled").lower() not in NON_BLOCKING_STATUSES
+
+
+class TherapistSchedule:
+    """Sorted active intervals for one therapist, plus the times of its inactive ones"""
+
+    def __init__(self):
+        self._entries: List[Tuple[float, float, str]] = []  # (start, end, appointment_id), sorted
+        self._by_id: Dict[str, Tuple[float, float, str]] = {}
+        self._inactive: Dict[str, Tuple[float, float]] = {}
+        self._max_duration = 0.0
+        self._series: Dict[str, "RecurringSeries"] = {}
+        self.loaded_at = time.monotonic()
+        self.guard_version: Optional[int] = None  # schedule guard version it has caught up to
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, appointment_id: str, start: float, end: float, active: bool = True) -> None:
+        self.remove(appointment_id)
+        if not active:
+            self._inactive[appointment_id] = (start, end)
+            return
+        entry = (start, end, appointment_id)
+        insort(self._entries, entry)
+        self._by_id[appointment_id] = entry
+        self._max_duration = max(self._max_duration, end - start)
+
+    def remove(self, appointment_id: str) -> None:
+        self._inactive.pop(appointment_id, None)
+        entry = self._by_id.pop(appointment_id, None)
+        if entry is not None:
+            del self._entries[bisect_left(self._entries, entry)]
+
+    def set_active(self, appointment_id: str, active: bool) -> None:
+        if active and appointment_id in self._inactive:
+            self.add(appointment_id, *self._inactive[appointment_id])
+        elif not active and appointment_id in self._by_id:
+            start, end, _ = self._by_id[appointment_id]
+            self.add(appointment_id, start, end, active=False)
+
+    def add_series(self, series) -> None:
+        self._series[series.series_id] = series
+
+    def remove_series(self, series_id: str) -> None:
+        self._series.pop(series_id, None)
+
+    def overlapping(self, start: float, end: float) -> List[Tuple[float, float, str]]:
+        """Active (start, end, appointment_id) intervals overlapping [start, end), in start order"""
+        low = bisect_left(self._entries, (start - self._max_duration,))
+        high = bisect_left(self._entries, (end,))
+        found = [entry for entry in self._entries[low:high] if entry[1] > start]
+        if self._series:
+            for series in self._series.values():
+                found.extend(series.intervals(start, end))
+            found.sort()
+        return found
+
+    def conflicts(self, start: float, end: float, exclude_id: Optional[str] = None) -> List[str]:
+        """IDs of active intervals overlapping [start, end)"""
+        return [appointment_id for _, _, appointment_id in self.overlapping(start, end)
+                if appointment_id != exclude_id]
+
+
+class IntervalIndex:
+    """Per-therapist schedules with per-therapist write locks"""
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._schedules: Dict[str, TherapistSchedule] = {}
+        self._therapist_of: Dict[str, str] = {}  # appointment_id -> therapist_id, loaded schedules only
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def lock(self, therapist_id: str) -> asyncio.Lock:
+        """Serializes check-then-write for one therapist within this process"""
+        return self._locks.setdefault(therapist_id, asyncio.Lock())
+
+    def get(self, therapist_id: str) -> Optional[TherapistSchedule]:
+        schedule = self._schedules.get(therapist_id)
+        if schedule is not None and time.monotonic() - schedule.loaded_at > self.ttl:
+            self.invalidate(therapist_id)
+            return None
+        return schedule
+
+    def load(self, therapist_id: str, appointments: List[dict], series: List["RecurringSeries"] = ()) -> TherapistSchedule:
+        """Replace a therapist's schedule with freshly read appointments and series"""
+        self.invalidate(therapist_id)
+        self._schedules[therapist_id] = TherapistSchedule()
+        for appt in appointments:
+            self.record(appt)
+        for recurring in series:
+            self.record_series(recurring)
+        return self._schedules[therapist_id]
+
+    def invalidate(self, therapist_id: str) -> None:
+        schedule = self._schedules.pop(therapist_id, None)
+        if schedule is not None:
+            for appointment_id in list(schedule._by_id) + list(schedule._inactive):
+                self._therapist_of.pop(appointment_id, None)
+
+    def record(self, appt: dict) -> None:
+        """Apply a written appointment to its therapist's schedule, if loaded"""
+        # The appointment may have moved from another therapist
+        self.discard(appt["appointment_id"])
+        schedule = self._schedules.get(appt["therapist_id"])
+        if schedule is None:
+            return
+        schedule.add(
+            appt["appointment_id"],
+            to_timestamp(appt["start_time"]),
+            to_timestamp(appt["end_time"]),
+            active=is_blocking(appt.get("status"))
+        )
+        self._therapist_of[appt["appointment_id"]] = appt["therapist_id"]
+
+    def record_series(self, series: "RecurringSeries") -> None:
+        """Apply a written series to its therapist's schedule, if loaded"""
+        schedule = self._schedules.get(series.therapist_id)
+        if schedule is not None:
+            schedule.add_series(series)
+
+    def discard(self, appointment_id: str) -> None:
+        """Remove an appointment from whichever schedule holds it"""
+        therapist_id = self._therapist_of.pop(appointment_id, None)
+        schedule = self._schedules.get(therapist_id) if therapist_id else None
+        if schedule is not None:
+            schedule.remove(appointment_id)
+
+    def status_changed(self, appointment_id: str, status: str) -> None:
+        """Apply a status change known only by ID; cancelling frees the slot"""
+        therapist_id = self._therapist_of.get(appointment_id)
+        schedule = self._schedules.get(therapist_id) if therapist_id else None
+        if schedule is not None:
+            schedule.set_active(appointment_id, is_blocking(status))
@@ -0,0 +1,167 @@
+"""
+Migrate an existing appointments table to start_time-sorted GSIs
+
+DynamoDB cannot add a sort key to an existing GSI, so tables created with
+hash-only TherapistIndex/PatientIndex get two new indexes alongside them:
+
+  1. Create TherapistTimeIndex (therapist_id, start_time) and
+     PatientTimeIndex (patient_id, start_time) and wait for their backfill.
+  2. Rewrite start_time/end_time values that are not in the canonical form
+     (UTC, no offset; see calendar_db.format_time) so string order matches
+     time order on the new sort key.
+  3. Point the service at the new indexes and read windows as key ranges:
+         THERAPIST_INDEX_NAME=TherapistTimeIndex
+         PATIENT_INDEX_NAME=PatientTimeIndex
+         CALENDAR_INDEX_SORT_KEY=start_time
+     after which the old indexes can be deleted.
+
+Until step 3 the service filters time windows on the old indexes
+(CALENDAR_INDEX_SORT_KEY defaults to none).
+
+Usage (from the backend directory):
+    python -m services.calendar_dynamodb.migrate_time_index [--dry-run]
+"""
+
+import argparse
+import logging
+import time
+from datetime import datetime
+
+from utils import aws_clients
+from .calendar_db import TABLE_NAME, format_time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# New index name -> partition key
+TIME_INDEXES = {
+    'TherapistTimeIndex': 'therapist_id',
+    'PatientTimeIndex': 'patient_id',
+}
+
+
+def _wait_for_index(client, index_name: str, poll_seconds: int = 10) -> None:
+    while True:
+        table = client.describe_table(TableName=TABLE_NAME)['Table']
+        statuses = {index['IndexName']: index['IndexStatus']
+                    for index in table.get('GlobalSecondaryIndexes', [])}
+        if statuses.get(index_name) == 'ACTIVE':
+            return
+        logger.info(f"Waiting for {index_name} ({statuses.get(index_name)})")
+        time.sleep(poll_seconds)
+
+
+def create_time_indexes(client, dry_run: bool = False) -> None:
+    """Create any missing start_time-sorted GSIs, one at a time"""
+    table = client.describe_table(TableName=TABLE_NAME)['Table']
+    existing = {index['IndexName'] for index in table.get('GlobalSecondaryIndexes', [])}
+    provisioned = table.get('BillingModeSummary', {}).get('BillingMode') != 'PAY_PER_REQUEST'
+
+    for index_name, hash_key in TIME_INDEXES.items():
+        if index_name in existing:
+            logger.info(f"{index_name} already exists")
+            continue
+
+        create = {
+            'IndexName': index_name,
+            'KeySchema': [
+                {'AttributeName': hash_key, 'KeyType': 'HASH'},
+                {'AttributeName': 'start_time', 'KeyType': 'RANGE'}
+            ],
+            'Projection': {'ProjectionType': 'ALL'}
+        }
+        if provisioned:
+            throughput = table['ProvisionedThroughput']
+            create['ProvisionedThroughput'] = {
+                'ReadCapacityUnits': throughput['ReadCapacityUnits'],
+                'WriteCapacityUnits': throughput['WriteCapacityUnits']
+            }
+
+        logger.info(f"Creating {index_name} on ({hash_key}, start_time)")
+        if dry_run:
+            continue
+        client.update_table(
+            TableName=TABLE_NAME,
+            AttributeDefinitions=[
+                {'AttributeName': hash_key, 'AttributeType': 'S'},
+                {'AttributeName': 'start_time', 'AttributeType': 'S'}
+            ],
+            GlobalSecondaryIndexUpdates=[{'Create': create}]
+        )
+        # DynamoDB allows one index creation per update_table call
+        _wait_for_index(client, index_name)
+
+
+def _canonical(value: str) -> str:
+    return format_time(datetime.fromisoformat(value))
+
+
+def normalize_times(client, dry_run: bool = False) -> dict:
+    """Rewrite start_time/end_time values that are not in canonical form"""
+    counts = {'scanned': 0, 'rewritten': 0, 'unindexed': 0, 'invalid': 0}
+    paginator = client.get_paginator('scan')
+    pages = paginator.paginate(
+        TableName=TABLE_NAME,
+        ProjectionExpression='appointment_id, start_time, end_time'
+    )
+
+    for page in pages:
+        for item in page.get('Items', []):
+            counts['scanned'] += 1
+            appointment_id = item['appointment_id']['S']
+            if 'S' not in item.get('start_time', {}):
+                # Items without a string start_time never appear in the new indexes
+                counts['unindexed'] += 1
+                logger.warning(f"{appointment_id} has no start_time and will not be indexed")
+                continue
+
+            updates = {}
+            for field in ('start_time', 'end_time'):
+                value = item.get(field, {}).get('S')
+                if value is None:
+                    continue
+                try:
+                    canonical = _canonical(value)
+                except ValueError:
+                    counts['invalid'] += 1
+                    logger.warning(f"{appointment_id} has an unparseable {field}: {value}")
+                    continue
+                if canonical != value:
+                    updates[field] = canonical
+
+            if not updates:
+                continue
+            counts['rewritten'] += 1
+            if dry_run:
+                continue
+            client.update_item(
+                TableName=TABLE_NAME,
+                Key={'appointment_id': {'S': appointment_id}},
+                UpdateExpression='SET ' + ', '.join(f'#{field} = :{field}' for field in updates),
+                ExpressionAttributeNames={f'#{field}': field for field in updates},
+                ExpressionAttributeValues={f':{field}': {'S': value} for field, value in updates.items()},
+                ConditionExpression='attribute_exists(appointment_id)'
+            )
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add start_time-sorted GSIs to the appointments table")
+    parser.add_argument('--dry-run', action='store_true', help="report what would change without writing")
+    parser.add_argument('--skip-indexes', action='store_true', help="only normalize stored times")
+    args = parser.parse_args()
+
+    client = aws_clients.get_client('dynamodb')
+    if not args.skip_indexes:
+        create_time_indexes(client, args.dry_run)
+    counts = normalize_times(client, args.dry_run)
+    logger.info(f"Normalized times: {counts}")
+    logger.info("Next: set " + " ".join(
+        [f"{'THERAPIST' if key == 'therapist_id' else 'PATIENT'}_INDEX_NAME={name}"
+         for name, key in TIME_INDEXES.items()] + ["CALENDAR_INDEX_SORT_KEY=start_time"]
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+Recurring appointment series
+
+A series is stored once: the first occurrence's times, a repeat rule
+(daily or weekly, every ``interval`` periods, optionally ending after
+``count`` occurrences or at ``until``) and a map of per-occurrence
+overrides. Occurrences are never written as separate items; they are
+generated on demand for the window being read, starting from the first
+occurrence that can reach the window rather than from the beginning of the
+series, so reading one week of a years-long series costs the same as
+reading one week of a new one.
+
+The rule repeats in the series' own time zone, so a 10:00 weekly session
+stays at 10:00 local time across daylight-saving changes.
+
+Each occurrence is identified by its series and its original start in UTC,
+``<series_id>@20260105T150000Z``. Overrides are keyed by that recurrence ID
+and may move an occurrence (start_time/end_time), change its status (e.g.
+cancel it) or its notes.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from .interval_index import is_blocking, to_timestamp
+
+FREQUENCIES = {
+    "daily": timedelta(days=1),
+    "weekly": timedelta(weeks=1),
+}
+
+OCCURRENCE_SEPARATOR = "@"
+RECURRENCE_ID_FORMAT = "%Y%m%dT%H%M%SZ"
+
+# Series fields copied onto every occurrence
+OCCURRENCE_FIELDS = (
+    "patient_id", "therapist_id", "title", "notes", "status",
+    "patient_name", "therapist_name", "appointment_type"
+)
+# Fields an override may change
+OVERRIDE_FIELDS = ("start_time", "end_time", "status", "notes")
+
+
+def recurrence_id(start: datetime) -> str:
+    return start.astimezone(timezone.utc).strftime(RECURRENCE_ID_FORMAT)
+
+
+def occurrence_id(series_id: str, recurrence: str) -> str:
+    return f"{series_id}{OCCURRENCE_SEPARATOR}{recurrence}"
+
+
+def recurrence_timestamp(recurrence: str) -> float:
+    """Original start of an occurrence, from its recurrence ID"""
+    return datetime.strptime(recurrence, RECURRENCE_ID_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+
+
+def split_occurrence_id(appointment_id: str) -> Optional[Tuple[str, str]]:
+    """(series_id, recurrence_id) for an occurrence ID, or None for a stored appointment"""
+    series_id, separator, recurrence = appointment_id.rpartition(OCCURRENCE_SEPARATOR)
+    if not separator or not series_id:
+        return None
+    try:
+        datetime.strptime(recurrence, RECURRENCE_ID_FORMAT)
+    except ValueError:
+        return None
+    return series_id, recurrence
+
+
+def _utc(value: str) -> datetime:
+    return datetime.fromtimestamp(to_timestamp(value), timezone.utc)
+
+
+def _iso(value: datetime) -> str:
+    # Same canonical form as calendar_db.format_time
+    return value.astimezone(timezone.utc).replace(tzinfo=None).isoformat()
+
+
+class RecurringSeries:
+    """Expands a stored series item into the occurrences inside a time window"""
+
+    def __init__(self, item: dict):
+        self.item = item
+        self.series_id = item["series_id"]
+        self.therapist_id = item["therapist_id"]
+        self.tz = ZoneInfo(item.get("timezone") or "UTC")
+
+        first_start = _utc(item["start_time"])
+        self.duration = _utc(item["end_time"]) - first_start
+        self._local_start = first_start.astimezone(self.tz).replace(tzinfo=None)
+
+        rule = item.get("recurrence") or {}
+        self._step = FREQUENCIES[rule.get("frequency", "weekly")] * int(rule.get("interval", 1))
+        self._count = int(rule["count"]) if rule.get("count") is not None else None
+        self._until = to_timestamp(rule["until"]) if rule.get("until") else None
+        self.overrides: Dict[str, dict] = item.get("overrides") or {}
+
+    def _start_at(self, n: int) -> datetime:
+        # Wall-clock arithmetic in the series' zone, then back to an instant
+        return (self._local_start + n * self._step).replace(tzinfo=self.tz)
+
+    def _original_starts(self, window_start: float, window_end: float):
+        """Unmodified occurrence starts overlapping [window_start, window_end)"""
+        n = 0
+        if window_start > self._local_start.replace(tzinfo=self.tz).timestamp():
+            local_window_start = datetime.fromtimestamp(window_start, self.tz).replace(tzinfo=None)
+            # One period of slack covers offset changes between the two instants
+            n = max(0, (local_window_start - self._local_start - self.duration) // self._step - 1)
+        span = self.duration.total_seconds()
+        while self._count is None or n < self._count:
+            start = self._start_at(n)
+            timestamp = start.timestamp()
+            if timestamp >= window_end or (self._until is not None and timestamp > self._until):
+                break
+            if timestamp + span > window_start:
+                yield start
+            n += 1
+
+    def is_occurrence(self, recurrence: str) -> bool:
+        """Whether a recurrence ID is one of this series' original occurrences"""
+        try:
+            timestamp = recurrence_timestamp(recurrence)
+        except ValueError:
+            return False
+        return any(start.timestamp() == timestamp for start in self._original_starts(timestamp, timestamp + 1))
+
+    def _occurrence(self, recurrence: str, start: datetime, end: datetime) -> dict:
+        occurrence = {field: self.item.get(field) for field in OCCURRENCE_FIELDS}
+        occurrence.update({
+            "appointment_id": occurrence_id(self.series_id, recurrence),
+            "series_id": self.series_id,
+            "recurrence_id": recurrence,
+            "start_time": _iso(start),
+            "end_time": _iso(end),
+        })
+        override = self.overrides.get(recurrence)
+        if override:
+            occurrence.update({field: override[field] for field in OVERRIDE_FIELDS if field in override})
+        return occurrence
+
+    def occurrences(self, window_start: float, window_end: float) -> List[dict]:
+        """Occurrences overlapping [window_start, window_end), overrides applied, in start order"""
+        found = []
+        for start in self._original_starts(window_start, window_end):
+            recurrence = recurrence_id(start)
+            if "start_time" in self.overrides.get(recurrence, {}):
+                continue  # Moved; picked up below at its new time
+            found.append(self._occurrence(recurrence, start, start + self.duration))
+
+        for recurrence, override in self.overrides.items():
+            if "start_time" not in override:
+                continue
+            start, end = _utc(override["start_time"]), _utc(override["end_time"])
+            if start.timestamp() < window_end and end.timestamp() > window_start:
+                found.append(self._occurrence(recurrence, start, end))
+
+        found.sort(key=lambda occurrence: occurrence["start_time"])
+        return found
+
+    def occurrence(self, recurrence: str) -> Optional[dict]:
+        """One occurrence by recurrence ID, overrides applied, or None if the series has no such occurrence"""
+        if not self.is_occurrence(recurrence):
+            return None
+        override = self.overrides.get(recurrence, {})
+        start = to_timestamp(override["start_time"]) if "start_time" in override else recurrence_timestamp(recurrence)
+        for occurrence in self.occurrences(start, start + 1):
+            if occurrence["recurrence_id"] == recurrence:
+                return occurrence
+        return None
+
+    def intervals(self, window_start: float, window_end: float) -> List[Tuple[float, float, str]]:
+        """Blocking (start, end, appointment_id) intervals overlapping the window"""
+        return [
+            (to_timestamp(occurrence["start_time"]), to_timestamp(occurrence["end_time"]), occurrence["appointment_id"])
+            for occurrence in self.occurrences(window_start, window_end)
+            if is_blocking(occurrence.get("status"))
+        ]
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Query
 from typing import List, Optional
 from datetime import datetime
 import uuid
@@ -42,15 +42,10 @@ async def get_conversations(current_user = Depends(get_current_user)):
     # Format response with latest message and unread count
     conversation_responses = []
     for conv in conversations:
-        # Get messages for this conversation
-        messages = message_db.get_messages_for_conversation(conv["id"])
-        
-        # Get latest message
-        latest_message = None
-        if messages:
-            latest_message = messages[-1]  # Last message in the chronologically sorted list
-        
-        # Get unread count
+        # Latest message and unread count are kept up to date on every write
+        latest_message = message_db.get_latest_message(conv["id"])
+        if latest_message:
+            latest_message = message_db.with_read_receipts([latest_message])[0]
         unread_count = message_db.get_unread_message_count(conv["id"], user_id)
         
         # Add to response
@@ -68,9 +63,18 @@ async def get_conversations(current_user = Depends(get_current_user)):
     
     return {"conversations": conversation_responses}
 
+# Upper bound for messages in one page of a conversation
+MAX_MESSAGE_PAGE = 200
+
 @router.get("/conversations/{conversation_id}", response_model=ConversationWithMessagesResponse)
-async def get_conversation(conversation_id: str, current_user = Depends(get_current_user)):
-    """Get a conversation with all its messages"""
+async def get_conversation(
+    conversation_id: str,
+    limit: int = Query(50, ge=1, le=MAX_MESSAGE_PAGE),
+    before: Optional[str] = Query(None, description="Message ID; return the messages just older than it"),
+    after: Optional[str] = Query(None, description="Message ID; return the messages just newer than it"),
+    current_user = Depends(get_current_user)
+):
+    """Get a conversation with one page of its messages, the newest page unless a cursor is given"""
     user_id = current_user["id"]
     
     # Get conversation
@@ -83,19 +87,56 @@ async def get_conversation(conversation_id: str, current_user = Depends(get_curr
     if user_id not in participant_ids:
         raise HTTPException(status_code=403, detail="Not authorized to view this conversation")
     
-    # Get messages
-    messages = message_db.get_messages_for_conversation(conversation_id)
-    
-    # Mark all messages as read
-    for message in messages:
-        if message["sender_id"] != user_id and not message["read_at"]:
-            message_db.mark_message_as_read(message["id"], user_id)
+    # Opening a conversation reads it: one watermark write, not one per message
+    message_db.mark_conversation_read(conversation_id, user_id)
+    try:
+        page = message_db.get_message_page(conversation_id, limit, before, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     
     return {
         "conversation": conversation,
-        "messages": messages
+        "messages": message_db.with_read_receipts(page["messages"]),
+        "before_cursor": page["before_cursor"],
+        "after_cursor": page["after_cursor"]
+    }
+
+@router.post("/conversations/{conversation_id}/read")
+async def mark_conversation_read(
+    conversation_id: str,
+    up_to_seq: Optional[int] = None,
+    current_user = Depends(get_current_user)
+):
+    """Mark a conversation read up to a message seq (default: the newest message)"""
+    user_id = current_user["id"]
+    
+    conversation = message_db.get_conversation(conversation_id)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    if user_id not in [p["id"] for p in conversation["participants"]]:
+        raise HTTPException(status_code=403, detail="Not authorized to view this conversation")
+    
+    watermark = message_db.mark_conversation_read(conversation_id, user_id, up_to_seq)
+    return {
+        "watermark": watermark,
+        "unread_count": message_db.get_unread_message_count(conversation_id, user_id)
     }
 
+@router.get("/conversations/{conversation_id}/receipts")
+async def get_read_receipts(conversation_id: str, current_user = Depends(get_current_user)):
+    """How far each participant has read, as {user_id: {seq, read_at}}"""
+    user_id = current_user["id"]
+    
+    conversation = message_db.get_conversation(conversation_id)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    if user_id not in [p["id"] for p in conversation["participants"]]:
+        raise HTTPException(status_code=403, detail="Not authorized to view this conversation")
+    
+    return {"receipts": message_db.get_read_receipts(conversation_id)}
+
 @router.post("/conversations", response_model=ConversationResponse)
 async def create_conversation(
     title: Optional[str] = None,
@@ -135,8 +176,9 @@ async def create_conversation(
         other_id = participant_ids[0] if participant_ids[0] != user_id else participant_ids[1]
         existing_conv = message_db.get_conversation_with_user(user_id, other_id)
         if existing_conv:
-            messages = message_db.get_messages_for_conversation(existing_conv["id"])
-            latest_message = messages[-1] if messages else None
+            latest_message = message_db.get_latest_message(existing_conv["id"])
+            if latest_message:
+                latest_message = message_db.with_read_receipts([latest_message])[0]
             unread_count = message_db.get_unread_message_count(existing_conv["id"], user_id)
             
             return {
@@ -154,6 +196,22 @@ async def create_conversation(
         "unread_count": 0
     }
 
+@router.delete("/conversations/{conversation_id}")
+async def delete_conversation(conversation_id: str, current_user = Depends(get_current_user)):
+    """Delete a conversation and its messages"""
+    user_id = current_user["id"]
+    
+    conversation = message_db.get_conversation(conversation_id)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    if user_id not in [p["id"] for p in conversation["participants"]]:
+        raise HTTPException(status_code=403, detail="Not authorized to delete this conversation")
+    
+    if not message_db.delete_conversation(conversation_id):
+        raise HTTPException(status_code=500, detail="Failed to delete conversation")
+    
+    return {"success": True}
+
 @router.post("/conversations/{conversation_id}/messages", response_model=MessageResponse)
 async def create_message(
     conversation_id: str,
@@ -1,6 +1,7 @@
 import uuid
+from bisect import bisect_left, insort
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import json
 import os
 
@@ -8,6 +9,71 @@ import os
 _conversations_db = {}
 _messages_db = {}
 _user_conversations = {}  # user_id -> list of conversation_ids
+_direct_conversations = {}  # sorted (user_id, user_id) -> id of their 1:1 conversation
+_conversation_messages = {}  # conversation_id -> ids of its live messages, oldest first
+_unread_counts = {}  # conversation_id -> {user_id: live messages from others not yet read}
+_message_seqs = {}  # conversation_id -> seq of its newest message; seqs count up from 1
+_read_watermarks = {}  # conversation_id -> {user_id: {"seq": read up to, "read_at": when it moved}}
+
+def _next_seq(conversation_id: str) -> int:
+    _message_seqs[conversation_id] = _message_seqs.get(conversation_id, 0) + 1
+    return _message_seqs[conversation_id]
+
+def _read_seq(conversation_id: str, user_id: str) -> int:
+    return _read_watermarks.get(conversation_id, {}).get(user_id, {}).get("seq", 0)
+
+def _direct_pair(conversation: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """Canonical key of a 1:1 conversation, or None for group conversations"""
+    if conversation["is_group"] or len(conversation["participants"]) != 2:
+        return None
+    first, second = sorted(participant["id"] for participant in conversation["participants"])
+    return first, second
+
+def _index_conversation(conversation: Dict[str, Any]) -> None:
+    pair = _direct_pair(conversation)
+    if pair:
+        # The first conversation of a pair stays the one found
+        _direct_conversations.setdefault(pair, conversation["id"])
+
+def _created_at(message_id: str) -> str:
+    return _messages_db[message_id]["created_at"]
+
+def _index_message(message: Dict[str, Any]) -> None:
+    """Add a message to its conversation's time-ordered index"""
+    message_ids = _conversation_messages.setdefault(message["conversation_id"], [])
+    if not message_ids or _created_at(message_ids[-1]) <= message["created_at"]:
+        message_ids.append(message["id"])  # The usual case: newest message
+    else:
+        insort(message_ids, message["id"], key=_created_at)
+
+def _adjust_unread(message: Dict[str, Any], delta: int) -> None:
+    """Count a message for (or discount it from) every participant who has not read it"""
+    conversation = _conversations_db.get(message["conversation_id"])
+    if not conversation:
+        return
+    counts = _unread_counts.setdefault(message["conversation_id"], {})
+    for participant in conversation["participants"]:
+        user_id = participant["id"]
+        if user_id != message["sender_id"] and _read_seq(message["conversation_id"], user_id) < message["seq"]:
+            counts[user_id] = counts.get(user_id, 0) + delta
+
+def _index_position(message_ids: List[str], message: Dict[str, Any]) -> Tuple[int, bool]:
+    """Where a message sits in an index, and whether it is there (deleted messages are not)"""
+    position = bisect_left(message_ids, message["created_at"], key=_created_at)
+    # Messages created in the same instant share a key; find this one among them
+    for offset, message_id in enumerate(message_ids[position:]):
+        if message_id == message["id"]:
+            return position + offset, True
+        if _created_at(message_id) != message["created_at"]:
+            break
+    return position, False
+
+def _unindex_message(message: Dict[str, Any]) -> None:
+    """Remove a message from its conversation's index"""
+    message_ids = _conversation_messages.get(message["conversation_id"], [])
+    position, found = _index_position(message_ids, message)
+    if found:
+        del message_ids[position]
 
 def init_db():
     """Initialize in-memory database with some sample data if empty"""
@@ -42,6 +108,7 @@ def init_db():
         # Store conversations
         _conversations_db[doctor_patient_conv["id"]] = doctor_patient_conv
         _conversations_db[group_conv["id"]] = group_conv
+        _index_conversation(doctor_patient_conv)
         
         # Link users to conversations
         _user_conversations[doctor_user["id"]] = [doctor_patient_conv["id"], group_conv["id"]]
@@ -52,6 +119,7 @@ def init_db():
         message1 = {
             "id": str(uuid.uuid4()),
             "conversation_id": doctor_patient_conv["id"],
+            "seq": _next_seq(doctor_patient_conv["id"]),
             "sender_id": patient_user["id"],
             "sender_name": patient_user["name"],
             "sender_role": patient_user["role"],
@@ -65,6 +133,7 @@ def init_db():
         message2 = {
             "id": str(uuid.uuid4()),
             "conversation_id": doctor_patient_conv["id"],
+            "seq": _next_seq(doctor_patient_conv["id"]),
             "sender_id": doctor_user["id"],
             "sender_name": doctor_user["name"],
             "sender_role": doctor_user["role"],
@@ -78,6 +147,10 @@ def init_db():
         # Store messages
         _messages_db[message1["id"]] = message1
         _messages_db[message2["id"]] = message2
+        _index_message(message1)
+        _index_message(message2)
+        _adjust_unread(message1, 1)
+        _adjust_unread(message2, 1)
 
 # Initialize the database
 init_db()
@@ -108,6 +181,7 @@ def create_conversation(participants: List[Dict[str, Any]], title: Optional[str]
     
     # Store the conversation
     _conversations_db[conversation_id] = conversation
+    _index_conversation(conversation)
     
     # Link participants to this conversation
     for participant in participants:
@@ -118,6 +192,34 @@ def create_conversation(participants: List[Dict[str, Any]], title: Optional[str]
     
     return conversation
 
+def delete_conversation(conversation_id: str) -> bool:
+    """Delete a conversation, soft deleting its messages and dropping its read state"""
+    conversation = _conversations_db.pop(conversation_id, None)
+    if not conversation:
+        return False
+    
+    for participant in conversation["participants"]:
+        user_conversations = _user_conversations.get(participant["id"], [])
+        if conversation_id in user_conversations:
+            user_conversations.remove(conversation_id)
+    
+    pair = _direct_pair(conversation)
+    if pair and _direct_conversations.get(pair) == conversation_id:
+        del _direct_conversations[pair]
+        # Another 1:1 conversation of the same pair, if any, takes its place
+        for other in get_conversations_for_user(pair[0]):
+            if _direct_pair(other) == pair:
+                _direct_conversations[pair] = other["id"]
+                break
+    
+    # Messages are soft deleted, like single message deletes
+    for message_id in _conversation_messages.pop(conversation_id, []):
+        _messages_db[message_id]["is_deleted"] = True
+    _unread_counts.pop(conversation_id, None)
+    _message_seqs.pop(conversation_id, None)
+    _read_watermarks.pop(conversation_id, None)
+    return True
+
 def update_conversation_last_message(conversation_id: str, last_message: str) -> Optional[Dict[str, Any]]:
     """Update the last message of a conversation"""
     conversation = _conversations_db.get(conversation_id)
@@ -132,13 +234,54 @@ def update_conversation_last_message(conversation_id: str, last_message: str) ->
 
 # MESSAGE OPERATIONS
 
+def get_latest_message(conversation_id: str) -> Optional[Dict[str, Any]]:
+    """Newest live message of a conversation"""
+    message_ids = _conversation_messages.get(conversation_id)
+    return _messages_db[message_ids[-1]] if message_ids else None
+
 def get_messages_for_conversation(conversation_id: str) -> List[Dict[str, Any]]:
-    """Get all messages for a conversation"""
-    messages = [msg for msg in _messages_db.values() 
-                if msg["conversation_id"] == conversation_id and not msg["is_deleted"]]
-    # Sort by created_at
-    messages.sort(key=lambda x: x["created_at"])
-    return messages
+    """Get all messages for a conversation, oldest first"""
+    return [_messages_db[message_id] for message_id in _conversation_messages.get(conversation_id, [])]
+
+def get_message_page(conversation_id: str, limit: int = 50, before: Optional[str] = None,
+                     after: Optional[str] = None) -> Dict[str, Any]:
+    """
+    One page of a conversation, oldest first within the page
+
+    Without a cursor this is the newest ``limit`` messages. ``before`` (a
+    message ID) pages back to the messages just older than it, ``after``
+    forward to the ones just newer. Only the page itself is read: the
+    cursor is found by bisecting the conversation's index.
+
+    Returns {"messages", "before_cursor", "after_cursor"}; a cursor is the
+    ID to pass back for the adjacent page, or None at that end. Raises
+    LookupError for a cursor that is not a message of this conversation.
+    """
+    message_ids = _conversation_messages.get(conversation_id, [])
+    if before and after:
+        raise ValueError("Pass either before or after, not both")
+    cursor = before or after
+    if cursor:
+        message = _messages_db.get(cursor)
+        if not message or message["conversation_id"] != conversation_id:
+            raise LookupError("Cursor message not found")
+        position, found = _index_position(message_ids, message)
+    if before:
+        end = position
+        start = max(0, end - limit)
+    elif after:
+        start = position + 1 if found else position
+        end = min(len(message_ids), start + limit)
+    else:
+        end = len(message_ids)
+        start = max(0, end - limit)
+
+    page = message_ids[start:end]
+    return {
+        "messages": [_messages_db[message_id] for message_id in page],
+        "before_cursor": page[0] if page and start > 0 else None,
+        "after_cursor": page[-1] if page and end < len(message_ids) else None,
+    }
 
 def create_message(conversation_id: str, sender_id: str, sender_name: str, 
                   sender_role: str, content: str, 
@@ -151,6 +294,7 @@ def create_message(conversation_id: str, sender_id: str, sender_name: str,
     message = {
         "id": message_id,
         "conversation_id": conversation_id,
+        "seq": _next_seq(conversation_id),
         "sender_id": sender_id,
         "sender_name": sender_name,
         "sender_role": sender_role,
@@ -163,45 +307,99 @@ def create_message(conversation_id: str, sender_id: str, sender_name: str,
     
     # Store the message
     _messages_db[message_id] = message
+    _index_message(message)
+    _adjust_unread(message, 1)
     
     # Update conversation last message
     update_conversation_last_message(conversation_id, content)
     
     return message
 
+def mark_conversation_read(conversation_id: str, user_id: str, up_to_seq: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Move a user's read watermark forward to ``up_to_seq`` (default: the newest message)
+
+    Everything at or below the watermark counts as read by that user. Reading
+    up to the newest message is a single write; a partial watermark recounts
+    the conversation's unread messages. Returns the watermark, or None if
+    the conversation does not exist. Watermarks never move backwards.
+    """
+    if conversation_id not in _conversations_db:
+        return None
+    newest = _message_seqs.get(conversation_id, 0)
+    seq = newest if up_to_seq is None else min(up_to_seq, newest)
+    watermarks = _read_watermarks.setdefault(conversation_id, {})
+    current = watermarks.get(user_id)
+    if current and current["seq"] >= seq:
+        return current
+
+    watermarks[user_id] = {"seq": seq, "read_at": datetime.now().isoformat()}
+    counts = _unread_counts.setdefault(conversation_id, {})
+    if seq == newest:
+        counts[user_id] = 0
+    else:
+        counts[user_id] = sum(
+            1 for message in get_messages_for_conversation(conversation_id)
+            if message["seq"] > seq and message["sender_id"] != user_id
+        )
+    return watermarks[user_id]
+
 def mark_message_as_read(message_id: str, user_id: str) -> Optional[Dict[str, Any]]:
-    """Mark a message as read by a user"""
+    """Mark a message, and everything before it in its conversation, as read by a user"""
     message = _messages_db.get(message_id)
     if not message or message["sender_id"] == user_id:  # Don't mark own messages as read
         return None
     
-    message["read_at"] = datetime.now().isoformat()
-    _messages_db[message_id] = message
-    
-    return message
+    mark_conversation_read(message["conversation_id"], user_id, message["seq"])
+    return with_read_receipts([message])[0]
+
+def get_read_receipts(conversation_id: str) -> Dict[str, Dict[str, Any]]:
+    """Each participant's read watermark: {user_id: {"seq", "read_at"}}"""
+    return dict(_read_watermarks.get(conversation_id, {}))
+
+def with_read_receipts(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Copies of messages with read_at derived from the read watermarks
+
+    read_at is set once any participant other than the sender has read past
+    the message, to the earliest of those readers' watermark times (the
+    watermark keeps only its latest move, so this is when it was known read).
+    """
+    result = []
+    for message in messages:
+        read_times = [
+            watermark["read_at"]
+            for user_id, watermark in _read_watermarks.get(message["conversation_id"], {}).items()
+            if user_id != message["sender_id"] and watermark["seq"] >= message["seq"]
+        ]
+        result.append(dict(message, read_at=min(read_times) if read_times else None))
+    return result
 
 def delete_message(message_id: str) -> bool:
     """Soft delete a message"""
     if message_id not in _messages_db:
         return False
     
-    _messages_db[message_id]["is_deleted"] = True
+    message = _messages_db[message_id]
+    if not message["is_deleted"]:
+        message["is_deleted"] = True
+        _unindex_message(message)
+        _adjust_unread(message, -1)
+        # Keep the conversation preview on its newest remaining message
+        conversation = _conversations_db.get(message["conversation_id"])
+        latest = get_latest_message(message["conversation_id"])
+        if conversation and (latest is None or latest["created_at"] <= message["created_at"]):
+            conversation["last_message"] = latest["content"] if latest else None
     return True
 
 def get_unread_message_count(conversation_id: str, user_id: str) -> int:
-    """Count unread messages in a conversation for a user"""
-    messages = get_messages_for_conversation(conversation_id)
-    return sum(1 for msg in messages 
-              if msg["sender_id"] != user_id and not msg["read_at"] and not msg["is_deleted"])
+    """Count unread messages in a conversation for a participant"""
+    return _unread_counts.get(conversation_id, {}).get(user_id, 0)
 
 # Utility functions for the messaging system
 
 def get_conversation_with_user(user_id: str, other_user_id: str) -> Optional[Dict[str, Any]]:
     """Find a direct (non-group) conversation between two users"""
-    user_conversations = get_conversations_for_user(user_id)
-    for conv in user_conversations:
-        if not conv["is_group"] and len(conv["participants"]) == 2:
-            participant_ids = [p["id"] for p in conv["participants"]]
-            if user_id in participant_ids and other_user_id in participant_ids:
-                return conv
-    return None
\ No newline at end of file
+    first, second = sorted((user_id, other_user_id))
+    conversation_id = _direct_conversations.get((first, second))
+    return _conversations_db.get(conversation_id) if conversation_id else None
\ No newline at end of file
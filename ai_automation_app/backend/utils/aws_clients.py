@@ -0,0 +1,223 @@
+"""
+Process-wide registry of pooled AWS clients and resources
+
+Creating a boto3 client costs several milliseconds of CPU and every new
+client opens its own TLS connections. Services should get their clients
+from here instead of calling ``boto3.client``/``boto3.resource`` directly:
+each distinct (service, region, endpoint) is built once, lazily, and shared.
+
+Pool tuning comes from the environment:
+    AWS_MAX_POOL_CONNECTIONS  connections kept per client (default 50)
+    AWS_TCP_KEEPALIVE         enable TCP keep-alive on pooled sockets (default on)
+    AWS_CONNECT_TIMEOUT       connect timeout in seconds (default 5)
+    AWS_READ_TIMEOUT          read timeout in seconds (default 10)
+    AWS_MAX_ATTEMPTS          retry attempts, standard retry mode (default 3)
+    AWS_KEEPALIVE_TIMEOUT     idle seconds before an async pooled socket closes (default 30)
+
+Async code (aiobotocore) gets its clients from ``get_async_client``; those
+are shared per event loop and closed with ``close_async_clients``.
+"""
+
+import asyncio
+import os
+import threading
+import logging
+import weakref
+from contextlib import AsyncExitStack
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_session = None
+_clients: Dict[Tuple, Any] = {}
+_resources: Dict[Tuple, Any] = {}
+_tables: Dict[Tuple, Any] = {}
+_counters: Dict[str, Dict[str, int]] = {}
+
+_async_session = None
+_async_clients: Dict[Tuple, Tuple[Any, Any, AsyncExitStack]] = {}  # key -> (loop, client, exit stack)
+_async_locks = weakref.WeakKeyDictionary()  # event loop -> creation lock
+
+
+def client_config():
+    """Build the botocore config shared by every pooled client"""
+    from botocore.config import Config
+
+    return Config(
+        max_pool_connections=int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '50')),
+        tcp_keepalive=os.environ.get('AWS_TCP_KEEPALIVE', 'true').lower() in ('1', 'true', 'yes'),
+        connect_timeout=float(os.environ.get('AWS_CONNECT_TIMEOUT', '5')),
+        read_timeout=float(os.environ.get('AWS_READ_TIMEOUT', '10')),
+        retries={
+            'max_attempts': int(os.environ.get('AWS_MAX_ATTEMPTS', '3')),
+            'mode': 'standard'
+        }
+    )
+
+
+def async_client_config():
+    """Build the aiobotocore config shared by every pooled async client"""
+    from aiobotocore.config import AioConfig
+
+    return AioConfig(
+        max_pool_connections=int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '50')),
+        connect_timeout=float(os.environ.get('AWS_CONNECT_TIMEOUT', '5')),
+        read_timeout=float(os.environ.get('AWS_READ_TIMEOUT', '10')),
+        retries={
+            'max_attempts': int(os.environ.get('AWS_MAX_ATTEMPTS', '3')),
+            'mode': 'standard'
+        },
+        connector_args={
+            'keepalive_timeout': float(os.environ.get('AWS_KEEPALIVE_TIMEOUT', '30'))
+        }
+    )
+
+
+def default_endpoint_url(service_name: str) -> Optional[str]:
+    """Endpoint override for local development, e.g. DYNAMODB_ENDPOINT_URL"""
+    # Lambda always talks to the real AWS endpoints
+    if 'AWS_EXECUTION_ENV' in os.environ:
+        return None
+    env_name = f"{service_name.upper().replace('-', '_')}_ENDPOINT_URL"
+    return os.environ.get(env_name)
+
+
+def _get_session():
+    # boto3's default session is not safe to build clients from concurrently,
+    # so the registry keeps its own and only touches it under the lock.
+    # boto3 is imported here to keep it off the Lambda cold-start path.
+    global _session
+    if _session is None:
+        import boto3
+        _session = boto3.session.Session()
+    return _session
+
+
+def _count(label: str, created: bool) -> None:
+    counter = _counters.setdefault(label, {"created": 0, "reused": 0})
+    counter["created" if created else "reused"] += 1
+
+
+def _key(service_name: str, region_name: Optional[str], endpoint_url: Optional[str]) -> Tuple:
+    if endpoint_url is None:
+        endpoint_url = default_endpoint_url(service_name)
+    return (service_name, region_name or os.environ.get('AWS_REGION'), endpoint_url)
+
+
+def _label(kind: str, key: Tuple) -> str:
+    return ":".join([kind] + [str(part) for part in key if part])
+
+
+def _get_or_create(cache: Dict[Tuple, Any], kind: str, key: Tuple, factory):
+    label = _label(kind, key)
+    with _lock:
+        obj = cache.get(key)
+        created = obj is None
+        if created:
+            obj = factory()
+            cache[key] = obj
+            logger.info(f"Created AWS {label}")
+        _count(label, created)
+    return obj
+
+
+def get_client(service_name: str, region_name: Optional[str] = None,
+               endpoint_url: Optional[str] = None):
+    """Get the shared low-level client for a service"""
+    key = _key(service_name, region_name, endpoint_url)
+    return _get_or_create(_clients, 'client', key, lambda: _get_session().client(
+        service_name,
+        region_name=key[1],
+        endpoint_url=key[2],
+        config=client_config()
+    ))
+
+
+def get_resource(service_name: str, region_name: Optional[str] = None,
+                 endpoint_url: Optional[str] = None):
+    """Get the shared boto3 resource for a service"""
+    key = _key(service_name, region_name, endpoint_url)
+    return _get_or_create(_resources, 'resource', key, lambda: _get_session().resource(
+        service_name,
+        region_name=key[1],
+        endpoint_url=key[2],
+        config=client_config()
+    ))
+
+
+def get_dynamodb_table(table_name: str, region_name: Optional[str] = None,
+                       endpoint_url: Optional[str] = None):
+    """Get a shared DynamoDB Table object backed by the pooled resource"""
+    dynamodb = get_resource('dynamodb', region_name, endpoint_url)
+    key = (table_name,) + _key('dynamodb', region_name, endpoint_url)[1:]
+    return _get_or_create(_tables, 'table', key, lambda: dynamodb.Table(table_name))
+
+
+async def get_async_client(service_name: str, region_name: Optional[str] = None,
+                           endpoint_url: Optional[str] = None):
+    """Get the shared aiobotocore client for a service on the running event loop"""
+    global _async_session
+    key = _key(service_name, region_name, endpoint_url)
+    label = _label('async-client', key)
+    loop = asyncio.get_running_loop()
+
+    entry = _async_clients.get(key)
+    if entry is None or entry[0] is not loop:
+        lock = _async_locks.setdefault(loop, asyncio.Lock())
+        async with lock:
+            entry = _async_clients.get(key)
+            if entry is None or entry[0] is not loop:
+                if _async_session is None:
+                    from aiobotocore.session import get_session
+                    _async_session = get_session()
+                stack = AsyncExitStack()
+                client = await stack.enter_async_context(_async_session.create_client(
+                    service_name,
+                    region_name=key[1],
+                    endpoint_url=key[2],
+                    config=async_client_config()
+                ))
+                # A client left on a previous (closed) loop is simply dropped
+                _async_clients[key] = (loop, client, stack)
+                logger.info(f"Created AWS {label}")
+                with _lock:
+                    _count(label, created=True)
+                return client
+
+    with _lock:
+        _count(label, created=False)
+    return entry[1]
+
+
+async def close_async_clients() -> None:
+    """Close the async clients owned by the running event loop"""
+    loop = asyncio.get_running_loop()
+    for key, (owner, _client, stack) in list(_async_clients.items()):
+        if owner is loop:
+            del _async_clients[key]
+            await stack.aclose()
+
+
+def get_stats() -> Dict[str, Any]:
+    """Creation and reuse counters for every client and resource"""
+    with _lock:
+        per_client = {label: dict(counts) for label, counts in _counters.items()}
+    return {
+        "created": sum(c["created"] for c in per_client.values()),
+        "reused": sum(c["reused"] for c in per_client.values()),
+        "clients": per_client
+    }
+
+
+def reset() -> None:
+    """Drop every cached client and counter (tests and benchmarks only)"""
+    global _session, _async_session
+    with _lock:
+        _clients.clear()
+        _resources.clear()
+        _tables.clear()
+        _async_clients.clear()
+        _counters.clear()
+        _session = None
+        _async_session = None
@@ -0,0 +1,144 @@
+"""
+Offline verification of Cognito-issued JWTs
+
+The user pool's JSON Web Key Set is downloaded once and kept in memory, so
+validating a token is a local signature check instead of a round-trip to
+Cognito. Group membership is read from the ``cognito:groups`` claim. The
+download runs in a worker thread so it never blocks the event loop.
+"""
+
+import asyncio
+import json
+import logging
+import time
+import urllib.request
+from typing import Any, Dict, Optional
+
+from jose import jwt, JWTError
+
+logger = logging.getLogger(__name__)
+
+
+class UnknownKeyError(Exception):
+    """Raised when a token is signed with a key ID that is not in the JWKS"""
+
+    def __init__(self, kid: Optional[str]):
+        super().__init__(f"Unknown signing key: {kid}")
+        self.kid = kid
+
+
+class JWKSCache:
+    """Refreshable in-memory cache of a Cognito user pool's signing keys"""
+
+    def __init__(self, region: str, user_pool_id: str, ttl: int = 3600,
+                 min_refresh_interval: int = 60, timeout: float = 3.0):
+        """
+        Args:
+            region: AWS region of the user pool
+            user_pool_id: Cognito user pool ID
+            ttl: Seconds before the key set is re-downloaded
+            min_refresh_interval: Minimum seconds between refreshes triggered
+                by an unknown key ID or a failed download, so forged kids and
+                an unreachable endpoint cannot hammer Cognito
+            timeout: HTTP timeout for the JWKS download
+        """
+        self.issuer = f"https://cognito-idp.{region}.amazonaws.com/{user_pool_id}"
+        self.jwks_url = f"{self.issuer}/.well-known/jwks.json"
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self._keys: Dict[str, Dict[str, Any]] = {}
+        self._attempted_at: Optional[float] = None  # last download attempt, successful or not
+        self._lock = asyncio.Lock()
+
+    def _fetch(self) -> Dict[str, Dict[str, Any]]:
+        with urllib.request.urlopen(self.jwks_url, timeout=self.timeout) as response:
+            document = json.loads(response.read())
+        return {key["kid"]: key for key in document.get("keys", [])}
+
+    def _due(self, force: bool) -> bool:
+        if self._attempted_at is None:
+            return True
+        age = time.monotonic() - self._attempted_at
+        if force or not self._keys:
+            # Unknown kids and failed downloads wait out the minimum interval
+            return age >= self.min_refresh_interval
+        return age >= self.ttl
+
+    async def refresh(self, force: bool = False) -> None:
+        """Re-download the key set if it is stale (or if forced)"""
+        if not self._due(force):
+            return
+        async with self._lock:
+            # Another request may have refreshed while this one waited
+            if not self._due(force):
+                return
+            try:
+                self._keys = await asyncio.to_thread(self._fetch)
+                logger.info(f"Loaded {len(self._keys)} signing keys from {self.jwks_url}")
+            except Exception as e:
+                # Keep serving the previous key set if the refresh fails
+                logger.warning(f"Could not refresh JWKS: {str(e)}")
+            self._attempted_at = time.monotonic()
+
+    async def get_key(self, kid: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Return the JWK for a key ID, refreshing once if it is not known"""
+        await self.refresh()
+        key = self._keys.get(kid)
+        if key is None:
+            # Cognito rotates keys occasionally; pick up new ones
+            await self.refresh(force=True)
+            key = self._keys.get(kid)
+        return key
+
+
+async def verify_cognito_token(token: str, cache: JWKSCache,
+                         app_client_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Verify a Cognito access or ID token locally
+
+    Args:
+        token: The raw JWT
+        cache: Key cache for the issuing user pool
+        app_client_id: If set, the token must have been issued to this client
+
+    Returns:
+        Dictionary with the username (``sub``), ``groups`` and raw ``claims``
+
+    Raises:
+        UnknownKeyError: The token's key ID is not in the user pool's JWKS
+        JWTError: The token is malformed, expired or fails verification
+    """
+    header = jwt.get_unverified_header(token)
+    kid = header.get("kid")
+    key = await cache.get_key(kid)
+    if key is None:
+        raise UnknownKeyError(kid)
+
+    claims = jwt.decode(
+        token,
+        key,
+        # Cognito signs with RS256 only; never let the key or token pick
+        algorithms=["RS256"],
+        issuer=cache.issuer,
+        # Access tokens carry client_id instead of aud; checked below
+        options={"verify_aud": False, "verify_at_hash": False}
+    )
+
+    token_use = claims.get("token_use")
+    if token_use == "access":
+        client_id = claims.get("client_id")
+    elif token_use == "id":
+        client_id = claims.get("aud")
+    else:
+        raise JWTError(f"Unexpected token_use: {token_use}")
+
+    if app_client_id and client_id != app_client_id:
+        raise JWTError("Token was not issued for this app client")
+
+    username = claims.get("username") or claims.get("cognito:username") or claims.get("sub")
+    return {
+        "sub": username,
+        "groups": claims.get("cognito:groups", []),
+        "claims": claims
+    }
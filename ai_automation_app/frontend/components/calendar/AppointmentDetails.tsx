@@ -5,7 +5,7 @@ interface AppointmentDetailsProps {
   isOpen: boolean
   onClose: () => void
   appointment: CalendarEvent
-  onUpdateStatus: (appointmentId: string, status: 'scheduled' | 'canceled' | 'completed') => void
+  onUpdateStatus: (appointmentId: string, status: 'scheduled' | 'cancelled' | 'completed') => void
   userRole: string
 }
 
@@ -24,7 +24,7 @@ export default function AppointmentDetails({
   
   const getStatusBadgeClass = (status: string) => {
     if (status === 'completed') return 'bg-green-100 text-green-800'
-    if (status === 'canceled') return 'bg-red-100 text-red-800'
+    if (status === 'cancelled') return 'bg-red-100 text-red-800'
     return 'bg-blue-100 text-blue-800'
   }
   
@@ -69,13 +69,13 @@ export default function AppointmentDetails({
           </button>
           
           <div className="space-x-2">
-            {/* Only show these buttons for relevant roles and if appointment isn't already canceled/completed */}
+            {/* Only show these buttons for relevant roles and if appointment isn't already cancelled/completed */}
             {appointment.status === 'scheduled' && (
               <>
                 {/* Both doctor and patient can cancel */}
                 <button
                   type="button"
-                  onClick={() => onUpdateStatus(appointment.id, 'canceled')}
+                  onClick={() => onUpdateStatus(appointment.id, 'cancelled')}
                   className="px-4 py-2 bg-red-500 text-white rounded hover:bg-red-600"
                 >
                   Cancel
@@ -94,8 +94,8 @@ export default function AppointmentDetails({
               </>
             )}
             
-            {/* Allow rescheduling canceled appointments */}
-            {appointment.status === 'canceled' && (
+            {/* Allow rescheduling cancelled appointments */}
+            {appointment.status === 'cancelled' && (
               <button
                 type="button"
                 onClick={() => onUpdateStatus(appointment.id, 'scheduled')}
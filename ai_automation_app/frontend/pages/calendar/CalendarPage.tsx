@@ -103,7 +103,7 @@ export default function CalendarPage() {
   }
 
   // Update appointment status (cancel or complete)
-  const handleUpdateAppointmentStatus = async (appointmentId: string, status: 'scheduled' | 'canceled' | 'completed') => {
+  const handleUpdateAppointmentStatus = async (appointmentId: string, status: 'scheduled' | 'cancelled' | 'completed') => {
     try {
       setIsLoading(true)
       await updateAppointmentStatus(appointmentId, status)
@@ -122,8 +122,8 @@ export default function CalendarPage() {
   const eventStyleGetter = (event: CalendarEvent) => {
     let backgroundColor = '#3174ad' // default color
     
-    if (event.status === 'canceled') {
-      backgroundColor = '#f44336' // red for canceled
+    if (event.status === 'cancelled') {
+      backgroundColor = '#f44336' // red for cancelled
     } else if (event.status === 'completed') {
       backgroundColor = '#4caf50' // green for completed
     }
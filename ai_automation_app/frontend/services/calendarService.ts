@@ -7,7 +7,7 @@ export interface Appointment {
   start_time: string;
   end_time: string;
   notes?: string;
-  status: 'scheduled' | 'canceled' | 'completed';
+  status: 'scheduled' | 'cancelled' | 'completed';
   patient_name?: string;
   therapist_name?: string;
   appointment_type?: string;
@@ -100,7 +100,7 @@ export const createAppointment = async (appointment: Omit<Appointment, 'appointm
 }
 
 // Update appointment status (cancel or complete) - mock data version
-export const updateAppointmentStatus = async (appointmentId: string, status: 'scheduled' | 'canceled' | 'completed') => {
+export const updateAppointmentStatus = async (appointmentId: string, status: 'scheduled' | 'cancelled' | 'completed') => {
   // Simulate API delay
   await new Promise(resolve => setTimeout(resolve, 500));
   
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Services import each other as top-level packages from the backend directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
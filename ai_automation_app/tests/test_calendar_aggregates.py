@@ -0,0 +1,158 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+from services.calendar_dynamodb import archive, calendar_aggregates, calendar_db
+from services.calendar_dynamodb.calendar_aggregates import CalendarAggregates
+from services.calendar_dynamodb.change_feed import ChangeEvent, INSERT, MODIFY, REMOVE
+
+DAY = date(2026, 11, 2)
+
+
+def _appointment(n, status="scheduled"):
+    return {
+        "appointment_id": f"a{n}",
+        "therapist_id": "t1",
+        "start_time": f"2026-11-02T{10 + n:02d}:00:00+00:00",
+        "end_time": f"2026-11-02T{10 + n:02d}:30:00+00:00",
+        "status": status,
+    }
+
+
+@pytest.fixture
+def scan(monkeypatch):
+    """Install the appointments the next rebuild scans, and what happens mid-scan"""
+    def install(items, during=None, fail=False):
+        async def iter_all_appointments(fields=None):
+            for item in items:
+                yield item
+            if during:
+                during()
+            if fail:
+                raise RuntimeError("scan failed")
+
+        monkeypatch.setattr(calendar_db, "iter_all_appointments", iter_all_appointments)
+
+    async def no_series():
+        return
+        yield
+    monkeypatch.setattr(calendar_db, "iter_all_series", no_series)
+    monkeypatch.setattr(archive, "archive_store", None)
+    return install
+
+
+def test_events_during_a_failed_rebuild_are_kept(scan):
+    aggregates = CalendarAggregates()
+    scan([_appointment(0)])
+    asyncio.run(aggregates.rebuild())
+    refreshed_at = aggregates.refreshed_at
+
+    created = _appointment(1)
+    scan([_appointment(0)], during=lambda: aggregates.apply(
+        ChangeEvent(INSERT, "appointment", created["appointment_id"], new_image=created)
+    ), fail=True)
+    with pytest.raises(RuntimeError):
+        asyncio.run(aggregates.rebuild())
+
+    assert aggregates.therapist_day("t1", DAY)["sessions"] == 2
+    assert aggregates.refreshed_at == refreshed_at
+    # Later events are applied directly again, not held for a rebuild
+    second = _appointment(2)
+    aggregates.apply(ChangeEvent(INSERT, "appointment", second["appointment_id"], new_image=second))
+    assert aggregates.therapist_day("t1", DAY)["sessions"] == 3
+
+
+def test_events_during_a_rebuild_land_on_the_new_state(scan):
+    aggregates = CalendarAggregates()
+    created = _appointment(1)
+    scan([_appointment(0)], during=lambda: aggregates.apply(
+        ChangeEvent(INSERT, "appointment", created["appointment_id"], new_image=created)
+    ))
+    asyncio.run(aggregates.rebuild())
+
+    assert aggregates.therapist_day("t1", DAY)["sessions"] == 2
+    assert aggregates.stats()["events"] == 1
+
+
+def test_archiving_keeps_appointments_in_the_reports(scan):
+    aggregates = CalendarAggregates()
+    archived, deleted = _appointment(0, "completed"), _appointment(1, "completed")
+    scan([archived, deleted])
+    asyncio.run(aggregates.rebuild())
+
+    aggregates.apply(ChangeEvent(REMOVE, "appointment", "a0", old_image=archived, archived=True))
+    aggregates.apply(ChangeEvent(REMOVE, "appointment", "a1", old_image=deleted))
+
+    assert aggregates.therapist_day("t1", DAY)["statuses"] == {"completed": 1}
+
+
+def test_rebuild_counts_the_archive_ledger_once(scan, tmp_path, monkeypatch):
+    store = archive.LocalArchiveStore(str(tmp_path))
+    monkeypatch.setattr(archive, "archive_store", store)
+    table = {appt["appointment_id"]: appt for appt in (_appointment(0, "completed"), _appointment(1, "no-show"))}
+
+    async def iter_all_appointments(fields=None):
+        for appt in list(table.values()):
+            yield appt
+
+    async def delete_appointments(items, archived=False):
+        # a1's delete fails, so it stays in the table and is archived again
+        for appt in items:
+            if appt["appointment_id"] != "a1":
+                table.pop(appt["appointment_id"])
+        return {"a1": "throttled"}
+
+    monkeypatch.setattr(calendar_db, "iter_all_appointments", iter_all_appointments)
+    monkeypatch.setattr(calendar_db, "delete_appointments", delete_appointments)
+    # A negative age puts the cutoff after DAY, whenever the test runs
+    asyncio.run(archive.archive_appointments(store, older_than_days=-365))
+    asyncio.run(archive.archive_appointments(store, older_than_days=-365))
+
+    aggregates = CalendarAggregates()
+    asyncio.run(aggregates.rebuild())
+
+    assert list(table) == ["a1"]
+    assert aggregates.therapist_day("t1", DAY)["statuses"] == {"completed": 1, "no-show": 1}
+
+
+def test_stale_aggregates_are_served_while_rebuilding_in_the_background(scan, monkeypatch):
+    aggregates = CalendarAggregates()
+    scan([_appointment(0)])
+    asyncio.run(aggregates.rebuild())
+
+    async def report_while_rebuilding():
+        scanned = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow_scan(fields=None):
+            scanned.set()
+            await release.wait()
+            for item in (_appointment(0), _appointment(1)):
+                yield item
+
+        monkeypatch.setattr(calendar_db, "iter_all_appointments", slow_scan)
+        aggregates.refreshed_at -= calendar_aggregates.AGGREGATES_REFRESH
+        await asyncio.wait_for(aggregates.ensure_fresh(), timeout=1)
+        await scanned.wait()
+        served = aggregates.therapist_day("t1", DAY)["sessions"]
+        release.set()
+        await aggregates._refresh
+        return served
+
+    assert asyncio.run(report_while_rebuilding()) == 1
+    assert aggregates.therapist_day("t1", DAY)["sessions"] == 2
+
+
+def test_a_new_process_starts_from_the_saved_snapshot(scan, tmp_path):
+    store = archive.LocalArchiveStore(str(tmp_path))
+    scan([_appointment(0), _appointment(1, "no-show")])
+    asyncio.run(CalendarAggregates(store).rebuild())
+
+    restarted = CalendarAggregates(store)
+    scan([], fail=True)
+    asyncio.run(restarted.ensure_fresh())
+    restarted.apply(ChangeEvent(MODIFY, "appointment", "a0", changes={"status": "completed"}))
+
+    assert restarted.therapist_day("t1", DAY)["statuses"] == {"completed": 1, "no-show": 1}
+    assert restarted._refresh is None
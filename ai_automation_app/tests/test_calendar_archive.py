@@ -0,0 +1,107 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from services.calendar_dynamodb import archive, calendar_db
+
+
+def _appointment(n, therapist_id, patient_id, start_time):
+    return {
+        "appointment_id": f"a{n}",
+        "therapist_id": therapist_id,
+        "patient_id": patient_id,
+        "start_time": start_time,
+        "end_time": start_time.replace("T10", "T11"),
+        "status": "completed",
+    }
+
+
+OLD = [
+    _appointment(1, "t1", "p1", "2024-01-10T10:00:00"),
+    _appointment(2, "t1", "p2", "2024-01-11T10:00:00"),
+    _appointment(3, "t2", "p3", "2024-01-12T10:00:00"),
+    _appointment(4, "t2", "p1", "2024-03-01T10:00:00"),
+]
+
+
+class CountingStore(archive.LocalArchiveStore):
+    """Local store that remembers which files were read and which prefixes listed"""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.read = []
+        self.listed = []
+
+    async def get(self, key):
+        self.read.append(key)
+        return await super().get(key)
+
+    async def list(self, prefix):
+        self.listed.append(prefix)
+        return await super().list(prefix)
+
+
+@pytest.fixture
+def archived_store(tmp_path, monkeypatch):
+    table = {appt["appointment_id"]: appt for appt in OLD}
+
+    async def iter_all_appointments(fields=None):
+        for appt in list(table.values()):
+            yield appt
+
+    async def delete_appointments(items, archived=False):
+        for appt in items:
+            table.pop(appt["appointment_id"])
+        return {}
+
+    async def iter_appointments_between(key_name, key_value, start, end, fields=None):
+        for appt in table.values():
+            if appt[key_name] == key_value:
+                yield appt
+
+    monkeypatch.setattr(calendar_db, "iter_all_appointments", iter_all_appointments)
+    monkeypatch.setattr(calendar_db, "delete_appointments", delete_appointments)
+    monkeypatch.setattr(calendar_db, "iter_appointments_between", iter_appointments_between)
+
+    store = CountingStore(str(tmp_path))
+    counts = asyncio.run(archive.archive_appointments(store, older_than_days=30))
+    assert counts["archived"] == len(OLD) and not table
+    store.listed.clear()
+    return store
+
+
+def test_appointments_are_filed_under_both_owners(archived_store):
+    keys = asyncio.run(archived_store.list(archive.PARTITION_ROOT))
+    partitions = sorted(key.rsplit("/", 1)[0] for key in keys)
+    assert partitions == [
+        "appointments/patient_id=p1/2024/01",
+        "appointments/patient_id=p1/2024/03",
+        "appointments/patient_id=p2/2024/01",
+        "appointments/patient_id=p3/2024/01",
+        "appointments/therapist_id=t1/2024/01",
+        "appointments/therapist_id=t2/2024/01",
+        "appointments/therapist_id=t2/2024/03",
+    ]
+
+
+def test_history_reads_only_the_owners_files_in_the_window(archived_store):
+    history = asyncio.run(archive.appointment_history(
+        "patient_id", "p1", datetime(2024, 1, 1), datetime(2024, 2, 28), store=archived_store
+    ))
+
+    assert [appt["appointment_id"] for appt in history["items"]] == ["a1"]
+    assert history["archived"] == 1
+    assert [key.rsplit("/", 1)[0] for key in archived_store.read] == ["appointments/patient_id=p1/2024/01"]
+
+
+def test_history_lists_only_the_months_in_the_window(archived_store):
+    asyncio.run(archive.appointment_history(
+        "therapist_id", "t2", datetime(2024, 2, 1), datetime(2024, 3, 31), store=archived_store
+    ))
+
+    assert sorted(archived_store.listed) == [
+        "appointments/therapist_id=t2/2024/02",
+        "appointments/therapist_id=t2/2024/03",
+    ]
+    assert [key.rsplit("/", 1)[0] for key in archived_store.read] == ["appointments/therapist_id=t2/2024/03"]
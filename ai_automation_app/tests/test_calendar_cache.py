@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from services.calendar_dynamodb import calendar_db
+
+
+def _item(status):
+    return {"appointment_id": {"S": "a1"}, "therapist_id": {"S": "t1"}, "patient_id": {"S": "p1"},
+            "start_time": {"S": "2026-11-02T10:00:00"}, "end_time": {"S": "2026-11-02T11:00:00"},
+            "status": {"S": status}}
+
+
+class RacingClient:
+    """Returns the old item, but only after a write has landed mid-read"""
+
+    def __init__(self):
+        self.reading = asyncio.Event()
+        self.written = asyncio.Event()
+
+    async def _read(self):
+        self.reading.set()
+        await self.written.wait()
+
+    async def get_item(self, **params):
+        await self._read()
+        return {"Item": _item("scheduled")}
+
+    async def query(self, **params):
+        await self._read()
+        return {"Items": [_item("scheduled")]}
+
+
+@pytest.fixture
+def racing_client(monkeypatch):
+    calendar_db._cache.clear()
+    holder = {}
+
+    async def get_client():
+        if "client" not in holder:
+            holder["client"] = RacingClient()
+        return holder["client"]
+    monkeypatch.setattr(calendar_db, "get_dynamodb_client", get_client)
+    yield holder
+    calendar_db._cache.clear()
+
+
+def _race(holder, read):
+    async def run():
+        pending = asyncio.ensure_future(read())
+        client = await calendar_db.get_dynamodb_client()
+        await client.reading.wait()
+        # update_appointment_status lands while the read is in flight
+        calendar_db._cache_written(calendar_db.deserialize_item(_item("cancelled")))
+        client.written.set()
+        return await pending
+    return asyncio.run(run())
+
+
+def test_read_racing_a_write_does_not_overwrite_the_cache(racing_client):
+    stale = _race(racing_client, lambda: calendar_db.get_appointment("a1"))
+
+    assert stale["status"] == "scheduled"
+    assert calendar_db._cache.peek(("appointment", "a1"))["status"] == "cancelled"
+
+
+def test_listing_racing_a_write_is_not_cached(racing_client):
+    _race(racing_client, lambda: calendar_db.list_appointments_by_therapist("t1"))
+
+    key = ("therapist", "t1", None, None, None, None, None)
+    assert calendar_db._cache.peek(key) is None
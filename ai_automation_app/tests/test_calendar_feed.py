@@ -0,0 +1,76 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from services.calendar_dynamodb import calendar_api, calendar_db
+
+
+def _appointment(n):
+    return {
+        "appointment_id": f"a{n}",
+        "therapist_id": "t1",
+        "patient_id": "p1",
+        "start_time": f"2026-11-{n + 1:02d}T10:00:00",
+        "end_time": f"2026-11-{n + 1:02d}T11:00:00",
+        "status": "scheduled",
+    }
+
+
+@pytest.fixture
+def feed_client(monkeypatch):
+    appointments = []
+
+    async def iter_appointments_between(key_name, key_value, start, end, fields=None):
+        for appt in appointments:
+            yield appt
+
+    monkeypatch.setattr(calendar_db, "iter_appointments_between", iter_appointments_between)
+    calendar_db._cache.clear()
+    app = FastAPI()
+    app.include_router(calendar_api.router)
+
+    def get(path, **headers):
+        async def request():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                return await client.get(path, headers=headers)
+        return asyncio.run(request())
+
+    yield appointments, get
+    calendar_db._cache.clear()
+
+
+def test_empty_feed_is_served_with_an_etag(feed_client):
+    _, get = feed_client
+    response = get("/calendar/therapist/t-empty/feed.ics")
+
+    assert response.status_code == 200
+    assert "BEGIN:VEVENT" not in response.text
+    assert response.headers["etag"]
+
+
+def test_first_uncached_response_can_be_revalidated(feed_client):
+    appointments, get = feed_client
+    appointments.extend(_appointment(n) for n in range(3))
+
+    first = get("/calendar/therapist/t1/feed.ics")
+    assert first.status_code == 200 and first.text.count("BEGIN:VEVENT") == 3
+    calendar_db._cache.clear()  # evicted before the next poll
+
+    again = get("/calendar/therapist/t1/feed.ics", **{"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+
+
+def test_large_feed_is_streamed_whole(feed_client, monkeypatch):
+    appointments, get = feed_client
+    appointments.extend(_appointment(n) for n in range(20))
+    monkeypatch.setattr(calendar_api, "FEED_BUFFER_BYTES", 500)
+
+    streamed = get("/calendar/therapist/t1/feed.ics")
+    assert streamed.status_code == 200
+    assert streamed.text.count("BEGIN:VEVENT") == 20
+    assert streamed.text.endswith("END:VCALENDAR\r\n")
+
+    cached = get("/calendar/therapist/t1/feed.ics")
+    assert cached.text == streamed.text and cached.headers["etag"]
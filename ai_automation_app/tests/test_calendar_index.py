@@ -0,0 +1,68 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from services.calendar_dynamodb import calendar_db
+
+
+class RecordingClient:
+    """Query stand-in that remembers the parameters it was called with"""
+
+    def __init__(self):
+        self.queries = []
+        self.items = []
+
+    async def query(self, **params):
+        self.queries.append(params)
+        return {'Items': [calendar_db.serialize_item(item) for item in self.items]}
+
+
+@pytest.fixture
+def recording_client(monkeypatch):
+    client = RecordingClient()
+
+    async def get_client():
+        return client
+    monkeypatch.setattr(calendar_db, "get_dynamodb_client", get_client)
+    return client
+
+
+def _window_query(client):
+    asyncio.run(calendar_db._query_index(
+        calendar_db.THERAPIST_INDEX, 'therapist_id', 't1',
+        start=datetime(2026, 1, 5), end=datetime(2026, 1, 12)
+    ))
+    return client.queries[-1]
+
+
+def test_windows_are_filtered_on_hash_only_indexes_by_default(recording_client):
+    assert calendar_db.INDEX_SORT_KEY == 'none'
+    params = _window_query(recording_client)
+    assert params['KeyConditionExpression'] == '#pk = :pk'
+    assert params['FilterExpression'] == '#sk BETWEEN :start AND :end'
+
+
+def test_windows_are_key_ranges_on_sorted_indexes(recording_client, monkeypatch):
+    monkeypatch.setattr(calendar_db, "INDEX_SORT_KEY", 'start_time')
+    params = _window_query(recording_client)
+    assert params['KeyConditionExpression'] == '#pk = :pk AND #sk BETWEEN :start AND :end'
+    assert 'FilterExpression' not in params
+
+
+def test_filtered_pages_are_sorted_and_windowed_on_parsed_times(recording_client):
+    # Returned in no particular order, one stored before start_time was canonical
+    recording_client.items = [
+        {'appointment_id': 'late', 'start_time': '2026-01-11T09:00:00'},
+        {'appointment_id': 'offset', 'start_time': '2026-01-05T01:00:00+02:00'},
+        {'appointment_id': 'early', 'start_time': '2026-01-05T09:00:00'},
+        {'appointment_id': 'after', 'start_time': '2026-01-12T09:00:00Z'},
+    ]
+    params = _window_query(recording_client)
+
+    assert params['ExpressionAttributeValues'][':start'] == {'S': '2026-01-04T10:00:00'}
+    page = asyncio.run(calendar_db._query_index(
+        calendar_db.THERAPIST_INDEX, 'therapist_id', 't1',
+        start=datetime(2026, 1, 5), end=datetime(2026, 1, 12)
+    ))
+    assert [item['appointment_id'] for item in page['items']] == ['early', 'late']
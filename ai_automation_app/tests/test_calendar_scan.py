@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from services.calendar_dynamodb import calendar_db
+
+
+class EndlessScanClient:
+    """Scan stand-in: every segment has unlimited pages; one may fail"""
+
+    def __init__(self, failing_segment=None):
+        self.failing_segment = failing_segment
+
+    async def scan(self, **params):
+        await asyncio.sleep(0)
+        segment = params['Segment']
+        if segment == self.failing_segment and 'ExclusiveStartKey' in params:
+            raise RuntimeError("segment failed")
+        page = params.get('ExclusiveStartKey', {}).get('n', {}).get('N', '0')
+        return {
+            'Items': [{'appointment_id': {'S': f"{segment}-{page}-{i}"}} for i in range(5)],
+            'LastEvaluatedKey': {'n': {'N': str(int(page) + 1)}},
+        }
+
+
+@pytest.fixture
+def scan_client(monkeypatch):
+    def install(client):
+        async def get_client():
+            return client
+        monkeypatch.setattr(calendar_db, "get_dynamodb_client", get_client)
+    return install
+
+
+def test_closing_the_scan_early_does_not_hang(scan_client):
+    scan_client(EndlessScanClient())
+
+    async def consume_a_few():
+        items = calendar_db.iter_all_appointments(total_segments=4)
+        taken = [await items.__anext__() for _ in range(3)]
+        # Let the workers fill every buffer slot before the consumer leaves
+        await asyncio.sleep(0.05)
+        await items.aclose()
+        return taken
+
+    taken = asyncio.run(asyncio.wait_for(consume_a_few(), timeout=5))
+    assert len(taken) == 3
+
+
+def test_failing_segment_raises_instead_of_hanging(scan_client):
+    scan_client(EndlessScanClient(failing_segment=2))
+
+    async def consume_all():
+        items = []
+        async for item in calendar_db.iter_all_appointments(total_segments=4):
+            items.append(item)
+            # A slow consumer leaves the buffer full when the failure surfaces
+            await asyncio.sleep(0.01)
+        return items
+
+    with pytest.raises(RuntimeError, match="segment failed"):
+        asyncio.run(asyncio.wait_for(consume_all(), timeout=5))
+
+
+def test_scan_yields_every_segment(scan_client):
+    class FiniteScanClient:
+        async def scan(self, **params):
+            page = int(params.get('ExclusiveStartKey', {}).get('n', {}).get('N', '0'))
+            response = {'Items': [{'appointment_id': {'S': f"{params['Segment']}-{page}"}}]}
+            if page < 2:
+                response['LastEvaluatedKey'] = {'n': {'N': str(page + 1)}}
+            return response
+
+    scan_client(FiniteScanClient())
+
+    async def consume_all():
+        return [item['appointment_id'] async for item in calendar_db.iter_all_appointments(total_segments=3)]
+
+    ids = asyncio.run(asyncio.wait_for(consume_all(), timeout=5))
+    assert sorted(ids) == sorted(f"{segment}-{page}" for segment in range(3) for page in range(3))
@@ -0,0 +1,121 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from botocore.exceptions import ClientError
+
+from services.calendar_dynamodb import calendar_db
+from services.calendar_dynamodb.calendar_schema import AppointmentSeries
+
+
+def _not_found(operation):
+    return ClientError({'Error': {'Code': 'ResourceNotFoundException',
+                                  'Message': 'Requested resource not found'}}, operation)
+
+
+class NoSeriesTableClient:
+    """DynamoDB stand-in for a deployment without the series table"""
+
+    async def query(self, **params):
+        if params['TableName'] == calendar_db.SERIES_TABLE_NAME:
+            raise _not_found('Query')
+        return {'Items': []}
+
+    async def get_item(self, **params):
+        raise _not_found('GetItem')
+
+    async def scan(self, **params):
+        raise _not_found('Scan')
+
+    async def batch_get_item(self, RequestItems):
+        if calendar_db.SERIES_TABLE_NAME in RequestItems:
+            raise _not_found('BatchGetItem')
+        return {'Responses': {table: [] for table in RequestItems}}
+
+
+@pytest.fixture
+def no_series_table(monkeypatch):
+    client = NoSeriesTableClient()
+
+    async def get_client():
+        return client
+    monkeypatch.setattr(calendar_db, "get_dynamodb_client", get_client)
+    return client
+
+
+def test_missing_series_table_reads_as_no_series(no_series_table):
+    async def read():
+        listed = await calendar_db._query_series('therapist_id', 't1')
+        scanned = [item async for item in calendar_db.iter_all_series()]
+        return listed, scanned, await calendar_db.get_series('s1')
+
+    assert asyncio.run(read()) == ([], [], None)
+
+
+def test_missing_series_table_leaves_occurrences_not_found(no_series_table):
+    result = asyncio.run(calendar_db.batch_get_appointments(['a1', 's1@20260105T090000Z']))
+    assert [entry['found'] for entry in result['results']] == [False, False]
+    assert [entry['error'] for entry in result['results']] == [None, None]
+
+
+def test_other_series_errors_still_raise(monkeypatch):
+    class ThrottledClient:
+        async def query(self, **params):
+            raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'slow down'}}, 'Query')
+
+    async def get_client():
+        return ThrottledClient()
+    monkeypatch.setattr(calendar_db, "get_dynamodb_client", get_client)
+
+    with pytest.raises(ClientError):
+        asyncio.run(calendar_db._query_series('therapist_id', 't1'))
+
+
+class SeriesTableClient:
+    """One weekly series in the series table; the appointments table is empty"""
+
+    def __init__(self):
+        self.series = calendar_db.build_series_item(AppointmentSeries(
+            series_id='s1', patient_id='p1', therapist_id='t1',
+            start_time=datetime(2026, 1, 5, 9), end_time=datetime(2026, 1, 5, 10),
+            recurrence={'frequency': 'weekly', 'count': 4}
+        ))
+
+    async def get_item(self, TableName, Key):
+        return {'Item': calendar_db.serialize_item(self.series)} if TableName == calendar_db.SERIES_TABLE_NAME else {}
+
+    async def query(self, TableName, **params):
+        series = [self.series] if TableName == calendar_db.SERIES_TABLE_NAME else []
+        return {'Items': [calendar_db.serialize_item(item) for item in series]}
+
+    async def update_item(self, TableName, Key, ExpressionAttributeNames, ExpressionAttributeValues, **params):
+        assert TableName == calendar_db.SERIES_TABLE_NAME
+        override = calendar_db.deserialize_item({'o': ExpressionAttributeValues[':override']})['o']
+        self.series['overrides'][ExpressionAttributeNames['#recurrence']] = override
+        return {'Attributes': calendar_db.serialize_item(self.series)}
+
+    async def transact_write_items(self, TransactItems):
+        # Nothing is stored in the appointments table
+        raise ClientError({'Error': {'Code': 'TransactionCanceledException', 'Message': 'cancelled'},
+                           'CancellationReasons': [{'Code': 'ConditionalCheckFailed'}] * len(TransactItems)},
+                          'TransactWriteItems')
+
+
+def test_bulk_status_updates_reach_series_occurrences(monkeypatch):
+    client = SeriesTableClient()
+
+    async def get_client():
+        return client
+    monkeypatch.setattr(calendar_db, "get_dynamodb_client", get_client)
+    calendar_db._interval_index.invalidate('t1')
+
+    result = asyncio.run(calendar_db.bulk_update_appointment_status([
+        {'appointment_id': 's1@20260112T090000Z', 'status': 'cancelled'},
+        {'appointment_id': 'a1', 'status': 'cancelled'},
+    ]))
+    calendar_db._interval_index.invalidate('t1')
+
+    assert [(entry['ok'], entry['error']) for entry in result['results']] == [
+        (True, None), (False, 'Appointment not found')
+    ]
+    assert client.series['overrides'] == {'20260112T090000Z': {'status': 'cancelled'}}
@@ -0,0 +1,272 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from botocore.exceptions import ClientError
+from fastapi import FastAPI
+from pydantic import ValidationError
+
+from services.calendar_dynamodb import calendar_db
+from services.calendar_dynamodb.calendar_api import router
+from services.calendar_dynamodb.calendar_db import allowed_previous_statuses
+from services.calendar_dynamodb.calendar_schema import (
+    Appointment, AppointmentStatusChange, AppointmentUpdate, STATUS_TRANSITIONS
+)
+
+APPOINTMENT = {
+    "appointment_id": "a1",
+    "patient_id": "p1",
+    "therapist_id": "t1",
+    "start_time": "2026-11-02T10:00:00",
+    "end_time": "2026-11-02T11:00:00",
+}
+
+
+@pytest.mark.parametrize("status", ["Scheduled", "pending", ""])
+def test_create_rejects_statuses_outside_the_transition_table(status):
+    with pytest.raises(ValidationError):
+        Appointment(**APPOINTMENT, status=status)
+
+
+def test_every_settable_status_can_be_reached_or_left():
+    for status in ("scheduled", "confirmed", "checked-in", "completed", "cancelled", "no-show"):
+        assert Appointment(**APPOINTMENT, status=status).status == status
+        assert allowed_previous_statuses(status)
+
+
+def test_canceled_spelling_is_stored_as_cancelled():
+    assert Appointment(**APPOINTMENT, status="canceled").status == "cancelled"
+    assert AppointmentUpdate(status="canceled").status == "cancelled"
+    assert AppointmentStatusChange(appointment_id="a1", status="canceled").status == "cancelled"
+    assert "cancelled" in STATUS_TRANSITIONS["scheduled"]
+
+
+def test_bulk_create_rejects_unknown_statuses():
+    app = FastAPI()
+    app.include_router(router)
+
+    async def post():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post("/calendar/bulk/create", json=[dict(APPOINTMENT, status="pending")])
+
+    assert asyncio.run(post()).status_code == 422
+
+
+def _stored(appointment_id, status, start="2026-11-02T10:00:00", end="2026-11-02T11:00:00"):
+    return {"appointment_id": appointment_id, "therapist_id": "t1", "patient_id": "p1",
+            "start_time": start, "end_time": end, "status": status}
+
+
+class StatusTable:
+    """
+    Appointments and schedule guard tables that enforce the write conditions
+
+    Appointments in ``lagging`` are stored but not yet in the TherapistIndex.
+    """
+
+    def __init__(self, *appointments):
+        self.items = {appt["appointment_id"]: dict(appt) for appt in appointments}
+        self.guards = {}
+        self.lagging = set()
+        self.before_transaction = None
+
+    def book_elsewhere(self, appt):
+        """Another process's booking: stored and recorded in the guard, not yet in the index"""
+        self.items[appt["appointment_id"]] = dict(appt)
+        self.lagging.add(appt["appointment_id"])
+        guard = self.guards.setdefault(appt["therapist_id"], {"version": 0, "recent": []})
+        guard["version"] += 1
+        guard["recent"].append({"kind": "appointment", "id": appt["appointment_id"],
+                                "version": guard["version"], "at": int(time.time())})
+
+    def _check(self, appointment_id, values):
+        current = self.items.get(appointment_id)
+        allowed = [value["S"] for name, value in values.items() if name.startswith(":from")]
+        if current is None or current["status"] not in allowed:
+            return calendar_db.serialize_item(current) if current else None
+        return True
+
+    def _check_guard(self, update):
+        current = self.guards.get(update["Key"]["therapist_id"]["S"], {}).get("version", 0)
+        return current == int(update["ExpressionAttributeValues"].get(":version", {"N": "0"})["N"]) or None
+
+    async def get_item(self, TableName, Key, **params):
+        if TableName == calendar_db.GUARD_TABLE_NAME:
+            guard = self.guards.get(Key["therapist_id"]["S"])
+            return {"Item": calendar_db.serialize_item(guard)} if guard else {}
+        item = self.items.get(Key["appointment_id"]["S"]) if TableName == calendar_db.TABLE_NAME else None
+        return {"Item": calendar_db.serialize_item(item)} if item else {}
+
+    async def update_item(self, TableName, Key, ExpressionAttributeValues, **params):
+        appointment_id = Key["appointment_id"]["S"]
+        check = self._check(appointment_id, ExpressionAttributeValues)
+        if check is not True:
+            error = {"Error": {"Code": "ConditionalCheckFailedException", "Message": "condition failed"}}
+            if check:
+                error["Item"] = check
+            raise ClientError(error, "UpdateItem")
+        self.items[appointment_id]["status"] = ExpressionAttributeValues[":s"]["S"]
+        return {"Attributes": calendar_db.serialize_item(self.items[appointment_id])}
+
+    async def batch_write_item(self, RequestItems):
+        for request in RequestItems[calendar_db.TABLE_NAME]:
+            item = calendar_db.deserialize_item(request["PutRequest"]["Item"])
+            self.items[item["appointment_id"]] = item
+        return {}
+
+    async def transact_write_items(self, TransactItems):
+        if self.before_transaction:
+            self.before_transaction, run = None, self.before_transaction
+            run()
+        checks = []
+        for op in TransactItems:
+            if "Put" in op:
+                checks.append(True)
+            elif op["Update"]["TableName"] == calendar_db.GUARD_TABLE_NAME:
+                checks.append(self._check_guard(op["Update"]))
+            else:
+                checks.append(self._check(op["Update"]["Key"]["appointment_id"]["S"],
+                                          op["Update"]["ExpressionAttributeValues"]))
+        if any(check is not True for check in checks):
+            reasons = [{"Code": "None"} if check is True else
+                       dict({"Code": "ConditionalCheckFailed"}, **({"Item": check} if check else {}))
+                       for check in checks]
+            raise ClientError({"Error": {"Code": "TransactionCanceledException", "Message": "cancelled"},
+                               "CancellationReasons": reasons}, "TransactWriteItems")
+        for op in TransactItems:
+            if "Put" in op:
+                item = calendar_db.deserialize_item(op["Put"]["Item"])
+                self.items[item["appointment_id"]] = item
+                continue
+            update = op["Update"]
+            values = calendar_db.deserialize_item(update["ExpressionAttributeValues"])
+            if update["TableName"] == calendar_db.GUARD_TABLE_NAME:
+                self.guards[update["Key"]["therapist_id"]["S"]] = {"version": values[":next"],
+                                                                   "recent": values[":recent"]}
+            else:
+                self.items[update["Key"]["appointment_id"]["S"]]["status"] = values[":s"]
+
+    async def query(self, TableName, **params):
+        if TableName != calendar_db.TABLE_NAME:
+            return {"Items": []}
+        therapist_id = params["ExpressionAttributeValues"][":pk"]["S"]
+        return {"Items": [calendar_db.serialize_item(appt) for appt in self.items.values()
+                          if appt["therapist_id"] == therapist_id and appt["appointment_id"] not in self.lagging]}
+
+
+@pytest.fixture
+def status_table(monkeypatch):
+    calendar_db._cache.clear()
+    calendar_db._interval_index.invalidate("t1")
+    holder = {}
+
+    async def get_client():
+        return holder["table"]
+    monkeypatch.setattr(calendar_db, "get_dynamodb_client", get_client)
+    yield holder
+    calendar_db._cache.clear()
+    calendar_db._interval_index.invalidate("t1")
+
+
+def _patch(status):
+    app = FastAPI()
+    app.include_router(router)
+
+    async def patch():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.patch("/calendar/a1/status", json={"status": status})
+    return asyncio.run(patch())
+
+
+def test_cancelled_appointment_can_be_rescheduled_into_a_free_slot(status_table):
+    status_table["table"] = StatusTable(_stored("a1", "cancelled"))
+
+    response = _patch("scheduled")
+
+    assert response.status_code == 200
+    assert status_table["table"].items["a1"]["status"] == "scheduled"
+
+
+def test_rescheduling_a_cancellation_into_a_taken_slot_conflicts(status_table):
+    status_table["table"] = StatusTable(_stored("a1", "cancelled"), _stored("a2", "scheduled"))
+
+    response = _patch("scheduled")
+
+    assert response.status_code == 409
+    assert response.json()["detail"]["conflicting_appointment_ids"] == ["a2"]
+    assert status_table["table"].items["a1"]["status"] == "cancelled"
+
+
+def test_bulk_rescheduling_checks_cancellations_for_conflicts(status_table):
+    status_table["table"] = StatusTable(
+        _stored("a1", "cancelled"), _stored("a2", "scheduled"),
+        _stored("a3", "cancelled", "2026-11-02T12:00:00", "2026-11-02T13:00:00"),
+        _stored("a4", "scheduled", "2026-11-03T10:00:00", "2026-11-03T11:00:00"),
+    )
+
+    result = asyncio.run(calendar_db.bulk_update_appointment_status([
+        {"appointment_id": "a1", "status": "scheduled"},
+        {"appointment_id": "a3", "status": "scheduled"},
+        {"appointment_id": "a4", "status": "confirmed"},
+    ]))
+
+    assert [r["ok"] for r in result["results"]] == [False, True, True]
+    assert "a2" in result["results"][0]["error"]
+    assert {appointment_id: appt["status"] for appointment_id, appt in status_table["table"].items.items()} == {
+        "a1": "cancelled", "a2": "scheduled", "a3": "scheduled", "a4": "confirmed"
+    }
+
+
+def _create(appointment_id):
+    return calendar_db.create_appointment(Appointment(**dict(APPOINTMENT, appointment_id=appointment_id)))
+
+
+def test_a_booking_made_by_another_process_conflicts(status_table):
+    table = status_table["table"] = StatusTable()
+    asyncio.run(calendar_db.get_therapist_schedule("t1"))
+
+    # Not in this process's schedule, nor yet in the TherapistIndex
+    table.book_elsewhere(_stored("a2", "scheduled"))
+
+    with pytest.raises(calendar_db.AppointmentConflictError) as conflict:
+        asyncio.run(_create("a1"))
+    assert conflict.value.conflicting_ids == ["a2"]
+    assert "a1" not in table.items
+
+
+def test_a_booking_racing_another_process_is_checked_again(status_table):
+    table = status_table["table"] = StatusTable()
+    table.before_transaction = lambda: table.book_elsewhere(_stored("a2", "scheduled"))
+
+    with pytest.raises(calendar_db.AppointmentConflictError):
+        asyncio.run(_create("a1"))
+    assert "a1" not in table.items
+
+    # A free slot goes in and moves the guard on
+    asyncio.run(calendar_db.create_appointment(Appointment(**dict(
+        APPOINTMENT, appointment_id="a3", start_time="2026-11-02T12:00:00", end_time="2026-11-02T13:00:00"
+    ))))
+    assert table.items["a3"]["status"] == "scheduled"
+    assert table.guards["t1"]["version"] == 2
+    assert [entry["id"] for entry in table.guards["t1"]["recent"]] == ["a2", "a3"]
+
+
+def test_bulk_create_checks_other_processes_and_earlier_items(status_table):
+    table = status_table["table"] = StatusTable()
+    asyncio.run(calendar_db.get_therapist_schedule("t1"))
+    table.book_elsewhere(_stored("a2", "scheduled"))
+
+    result = asyncio.run(calendar_db.bulk_create_appointments([
+        Appointment(**dict(APPOINTMENT, appointment_id="b1")),
+        Appointment(**dict(APPOINTMENT, appointment_id="b2", start_time="2026-11-02T12:00:00",
+                           end_time="2026-11-02T13:00:00")),
+        Appointment(**dict(APPOINTMENT, appointment_id="b3", start_time="2026-11-02T12:30:00",
+                           end_time="2026-11-02T13:30:00")),
+        Appointment(**dict(APPOINTMENT, appointment_id="b4", status="cancelled")),
+    ]))
+
+    assert [r["ok"] for r in result["results"]] == [False, True, False, True]
+    assert "a2" in result["results"][0]["error"] and "b2" in result["results"][2]["error"]
+    assert sorted(table.items) == ["a2", "b2", "b4"]
+    assert [entry["id"] for entry in table.guards["t1"]["recent"]] == ["a2", "b2"]
@@ -0,0 +1,181 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import JWTError, jwk, jwt
+
+import main
+from utils.cognito_jwks import JWKSCache, verify_cognito_token
+
+KEY = {"kid": "k1", "kty": "RSA", "alg": "RS256"}
+
+
+class FakeJWKSCache(JWKSCache):
+    """JWKS cache whose download is scripted instead of going to Cognito"""
+
+    def __init__(self, fetch, **kwargs):
+        super().__init__("us-east-2", "us-east-2_pool", **kwargs)
+        self.fetch = fetch
+        self.fetches = 0
+
+    def _fetch(self):
+        self.fetches += 1
+        return self.fetch()
+
+
+def test_failed_download_backs_off_even_with_an_empty_cache():
+    def unreachable():
+        raise OSError("connection timed out")
+
+    cache = FakeJWKSCache(unreachable, min_refresh_interval=60)
+
+    async def lookups():
+        return [await cache.get_key("k1") for _ in range(5)]
+
+    assert asyncio.run(lookups()) == [None] * 5
+    assert cache.fetches == 1
+
+
+def test_download_does_not_block_the_event_loop():
+    def slow():
+        time.sleep(0.2)
+        return {"k1": KEY}
+
+    cache = FakeJWKSCache(slow)
+
+    async def lookups_while_ticking():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.ensure_future(tick())
+        keys = await asyncio.gather(*(cache.get_key("k1") for _ in range(3)))
+        ticker.cancel()
+        return keys, ticks
+
+    keys, ticks = asyncio.run(lookups_while_ticking())
+    assert keys == [KEY] * 3
+    assert cache.fetches == 1
+    assert ticks >= 5
+
+
+def _rsa_key(kid):
+    private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                serialization.NoEncryption())
+    public = private.public_key().public_bytes(serialization.Encoding.PEM,
+                                               serialization.PublicFormat.SubjectPublicKeyInfo)
+    return pem, dict(jwk.construct(public, "RS256").to_dict(), kid=kid)
+
+
+SIGNING_PEM, SIGNING_JWK = _rsa_key("k1")
+OTHER_PEM, _ = _rsa_key("k1")
+CLIENT_ID = "app-client"
+
+
+@pytest.fixture
+def pool():
+    return FakeJWKSCache(lambda: {"k1": SIGNING_JWK})
+
+
+def _token(cache, pem=SIGNING_PEM, kid="k1", algorithm="RS256", **overrides):
+    now = int(time.time())
+    claims = {"sub": "u1", "username": "alice", "cognito:groups": ["therapists"], "iss": cache.issuer,
+              "token_use": "access", "client_id": CLIENT_ID, "iat": now, "exp": now + 300}
+    claims.update(overrides)
+    return jwt.encode(claims, pem, algorithm=algorithm, headers={"kid": kid})
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _hs256_token(cache):
+    """An RS256 token re-signed with HMAC, using the published public key as the secret"""
+    claims = _token(cache).split(".")[1]
+    signing_input = f'{_b64(json.dumps({"alg": "HS256", "kid": "k1"}).encode())}.{claims}'
+    secret = jwk.construct(SIGNING_JWK).to_pem()
+    return f"{signing_input}.{_b64(hmac.new(secret, signing_input.encode(), hashlib.sha256).digest())}"
+
+
+def test_valid_token_is_accepted(pool):
+    user = asyncio.run(verify_cognito_token(_token(pool), pool, CLIENT_ID))
+    assert user["sub"] == "alice"
+    assert user["groups"] == ["therapists"]
+
+
+def test_id_token_is_checked_against_its_audience(pool):
+    token = _token(pool, token_use="id", client_id=None, aud=CLIENT_ID)
+    assert asyncio.run(verify_cognito_token(token, pool, CLIENT_ID))["sub"] == "alice"
+
+
+@pytest.mark.parametrize("make_token", [
+    lambda cache: _token(cache, pem=OTHER_PEM),
+    lambda cache: _token(cache, iss="https://cognito-idp.us-east-2.amazonaws.com/other_pool"),
+    lambda cache: _token(cache, token_use="refresh"),
+    lambda cache: _token(cache, client_id="other-client"),
+    lambda cache: _token(cache, token_use="id", aud="other-client"),
+    lambda cache: _token(cache, exp=int(time.time()) - 60),
+    lambda cache: _hs256_token(cache),
+], ids=["signature", "issuer", "token-use", "client-id", "audience", "expired", "hs256"])
+def test_invalid_tokens_are_rejected(pool, make_token):
+    with pytest.raises(JWTError):
+        asyncio.run(verify_cognito_token(make_token(pool), pool, CLIENT_ID))
+
+
+def test_unsigned_tokens_are_rejected(pool):
+    header = _b64(json.dumps({"alg": "none", "kid": "k1"}).encode())
+    token = f'{header}.{_token(pool).split(".")[1]}.'
+    with pytest.raises(JWTError):
+        asyncio.run(verify_cognito_token(token, pool, CLIENT_ID))
+
+
+@pytest.fixture
+def cognito_auth(monkeypatch, pool):
+    """main.validate_token verifying against the fake pool, with Cognito's answer recorded"""
+    remote = []
+
+    def validate_with_cognito(token):
+        remote.append(token)
+        return {"sub": "remote", "groups": []}
+
+    monkeypatch.setattr(main, "USER_POOL_ID", "us-east-2_pool")
+    monkeypatch.setattr(main, "APP_CLIENT_ID", CLIENT_ID)
+    monkeypatch.setattr(main, "STAGE", "dev")
+    monkeypatch.setattr(main, "TOKEN_VERIFICATION", "jwks")
+    monkeypatch.setattr(main, "get_jwks_cache", lambda: pool)
+    monkeypatch.setattr(main, "validate_with_cognito", validate_with_cognito)
+
+    def validate(token):
+        return asyncio.run(main.validate_token(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)))
+    return validate, remote
+
+
+def test_unknown_signing_key_falls_back_to_cognito(cognito_auth, pool):
+    validate, remote = cognito_auth
+    token = _token(pool, pem=OTHER_PEM, kid="rotated")
+
+    assert validate(token)["sub"] == "remote"
+    assert remote == [token]
+
+
+def test_invalid_token_is_not_sent_to_cognito(cognito_auth, pool):
+    validate, remote = cognito_auth
+
+    assert validate(_token(pool))["sub"] == "alice"
+    with pytest.raises(HTTPException) as error:
+        validate(_token(pool, pem=OTHER_PEM))
+    assert error.value.status_code == 401
+    assert remote == []
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-2")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "test")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "test")
+
+import main
+from utils import aws_clients
+
+
+def _event(path):
+    return {
+        "resource": path,
+        "path": path,
+        "httpMethod": "GET",
+        "headers": {"host": "api.example.com"},
+        "multiValueHeaders": {},
+        "queryStringParameters": None,
+        "multiValueQueryStringParameters": None,
+        "requestContext": {"resourcePath": path, "httpMethod": "GET", "path": path,
+                           "identity": {"sourceIp": "127.0.0.1"}, "stage": "test"},
+        "body": None,
+        "isBase64Encoded": False,
+    }
+
+
+class LambdaContext:
+    function_name = "therastack-api"
+    aws_request_id = "request"
+
+
+@pytest.fixture
+def client_route():
+    """A route that uses the pooled async DynamoDB client, as the calendar routes do"""
+    @main.app.get("/test/aws-client")
+    async def use_client():
+        await aws_clients.get_async_client("dynamodb", endpoint_url="http://127.0.0.1:9")
+        return aws_clients.get_stats()
+
+    # Mangum runs every invocation on the thread's event loop, which lives
+    # as long as the Lambda execution environment
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    aws_clients.reset()
+    yield "/test/aws-client"
+    main.app.router.routes.pop()
+    loop.run_until_complete(aws_clients.close_async_clients())
+    asyncio.set_event_loop(None)
+    loop.close()
+    aws_clients.reset()
+
+
+def test_lambda_invocations_reuse_the_async_client(client_route):
+    for _ in range(3):
+        response = main.handler(_event(client_route), LambdaContext())
+        assert response["statusCode"] == 200
+
+    stats = aws_clients.get_stats()
+    assert stats["created"] == 1
+    assert stats["reused"] == 2
+
+
+def test_cold_start_does_not_import_botocore():
+    # A fresh interpreter: other tests have already imported botocore here
+    backend = os.path.dirname(main.__file__)
+    check = "import sys, main; sys.exit('botocore' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", check], cwd=backend, env=dict(os.environ, PYTHONPATH=backend))
+    assert result.returncode == 0
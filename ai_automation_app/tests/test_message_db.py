@@ -0,0 +1,135 @@
+import pytest
+
+from services.messages_dynamodb import message_db
+
+DOCTOR = {"id": "doctor9", "name": "Dr. Lee", "role": "doctor"}
+PATIENT = {"id": "patient9", "name": "Sam Park", "role": "patient"}
+ADMIN = {"id": "admin9", "name": "Admin", "role": "admin"}
+
+
+def _send(conversation, sender, content="hello"):
+    return message_db.create_message(conversation["id"], sender["id"], sender["name"], sender["role"], content)
+
+
+@pytest.fixture
+def conversation():
+    conversation = message_db.create_conversation([DOCTOR, PATIENT])
+    yield conversation
+    message_db.delete_conversation(conversation["id"])
+
+
+def _unread(conversation, user):
+    return message_db.get_unread_message_count(conversation["id"], user["id"])
+
+
+def test_unread_counts_follow_the_read_watermark(conversation):
+    sent = [_send(conversation, DOCTOR, f"m{n}") for n in range(3)]
+    assert (_unread(conversation, PATIENT), _unread(conversation, DOCTOR)) == (3, 0)
+
+    message_db.mark_message_as_read(sent[1]["id"], PATIENT["id"])
+    assert _unread(conversation, PATIENT) == 1
+    # Watermarks never move backwards
+    message_db.mark_conversation_read(conversation["id"], PATIENT["id"], sent[0]["seq"])
+    assert _unread(conversation, PATIENT) == 1
+
+    _send(conversation, DOCTOR)
+    _send(conversation, PATIENT)
+    assert _unread(conversation, PATIENT) == 2
+
+    message_db.mark_conversation_read(conversation["id"], PATIENT["id"])
+    assert _unread(conversation, PATIENT) == 0
+    assert message_db.get_read_receipts(conversation["id"])[PATIENT["id"]]["seq"] == 5
+
+
+def test_deleting_a_message_discounts_it_only_where_unread(conversation):
+    first, second = _send(conversation, DOCTOR), _send(conversation, DOCTOR)
+    message_db.mark_message_as_read(first["id"], PATIENT["id"])
+
+    message_db.delete_message(first["id"])
+    assert _unread(conversation, PATIENT) == 1
+    message_db.delete_message(second["id"])
+    message_db.delete_message(second["id"])
+    assert _unread(conversation, PATIENT) == 0
+    assert message_db.get_latest_message(conversation["id"]) is None
+    assert conversation["last_message"] is None
+
+
+def test_read_receipts_come_from_other_participants_watermarks(conversation):
+    sent = [_send(conversation, DOCTOR) for _ in range(2)]
+    # The sender's own watermark does not mark a message read
+    message_db.mark_conversation_read(conversation["id"], DOCTOR["id"])
+    message_db.mark_message_as_read(sent[0]["id"], PATIENT["id"])
+
+    receipts = message_db.with_read_receipts(message_db.get_messages_for_conversation(conversation["id"]))
+    read_at = message_db.get_read_receipts(conversation["id"])[PATIENT["id"]]["read_at"]
+    assert [message["read_at"] for message in receipts] == [read_at, None]
+    assert all(message["read_at"] is None for message in message_db.get_messages_for_conversation(conversation["id"]))
+
+
+def _follow(conversation_id, page, cursor, limit):
+    """``page`` and every page after it by ``cursor`` ("before" or "after")"""
+    pages = [page]
+    while pages[-1][f"{cursor}_cursor"]:
+        pages.append(message_db.get_message_page(conversation_id, limit=limit,
+                                                 **{cursor: pages[-1][f"{cursor}_cursor"]}))
+    return pages
+
+
+def _ids(pages):
+    return [[message["id"] for message in page["messages"]] for page in pages]
+
+
+def test_cursor_pages_neither_overlap_nor_skip(conversation):
+    sent = [_send(conversation, DOCTOR, f"m{n}")["id"] for n in range(23)]
+
+    newest = message_db.get_message_page(conversation["id"], limit=5)
+    back = _follow(conversation["id"], newest, "before", limit=5)
+    forward = _follow(conversation["id"], back[-1], "after", limit=5)
+
+    for pages in (_ids(reversed(back)), _ids(forward)):
+        assert [message_id for page in pages for message_id in page] == sent
+        assert all(0 < len(page) <= 5 for page in pages)
+
+
+def test_a_deleted_cursor_still_pages_from_its_place(conversation):
+    sent = [_send(conversation, DOCTOR)["id"] for _ in range(6)]
+    message_db.delete_message(sent[3])
+
+    older = message_db.get_message_page(conversation["id"], limit=10, before=sent[3])
+    newer = message_db.get_message_page(conversation["id"], limit=10, after=sent[3])
+
+    assert [message["id"] for message in older["messages"]] == sent[:3]
+    assert [message["id"] for message in newer["messages"]] == sent[4:]
+    with pytest.raises(LookupError):
+        message_db.get_message_page("another-conversation", before=sent[0])
+
+
+def test_direct_conversations_are_found_for_either_participant(conversation):
+    group = message_db.create_conversation([DOCTOR, PATIENT, ADMIN], title="Team", is_group=True)
+    second = message_db.create_conversation([PATIENT, DOCTOR])
+
+    assert message_db.get_conversation_with_user(PATIENT["id"], DOCTOR["id"])["id"] == conversation["id"]
+    assert message_db.get_conversation_with_user(DOCTOR["id"], ADMIN["id"]) is None
+
+    # The pair's other 1:1 conversation takes over when the first one goes
+    message_db.delete_conversation(conversation["id"])
+    assert message_db.get_conversation_with_user(DOCTOR["id"], PATIENT["id"])["id"] == second["id"]
+    message_db.delete_conversation(second["id"])
+    assert message_db.get_conversation_with_user(DOCTOR["id"], PATIENT["id"]) is None
+    message_db.delete_conversation(group["id"])
+
+
+def test_deleting_a_conversation_drops_its_messages_and_read_state(conversation):
+    sent = _send(conversation, DOCTOR)
+    message_db.mark_conversation_read(conversation["id"], PATIENT["id"])
+    _send(conversation, DOCTOR)
+
+    assert message_db.delete_conversation(conversation["id"])
+
+    assert message_db.get_conversation(conversation["id"]) is None
+    assert conversation["id"] not in [c["id"] for c in message_db.get_conversations_for_user(PATIENT["id"])]
+    assert sent["is_deleted"]
+    assert message_db.get_message_page(conversation["id"])["messages"] == []
+    assert _unread(conversation, PATIENT) == 0
+    assert message_db.get_read_receipts(conversation["id"]) == {}
+    assert not message_db.delete_conversation(conversation["id"])